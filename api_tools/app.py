@@ -1,13 +1,31 @@
-import json
 from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
 from http import HTTPStatus
-from typing import Iterable, List
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple
 
-from fastapi import FastAPI, Header, HTTPException
+from cache import get_cache
+from compression import compress_stream, negotiate
+from fastapi import FastAPI, Header, HTTPException, Query
 from fastapi.responses import StreamingResponse
-from schemas import SubdomainResponse, SubdomainSchema
+from jobs import get_job_store
+from ndjson import iter_ndjson as _iter_ndjson
+from scheduler import get_scheduler
+from schemas import (
+    JobRequest,
+    JobStatus,
+    SubdomainResponse,
+    SubdomainSchema,
+)
 from settings import get_settings
-from tasks import get_ip, run_assetfinder, run_discover_urls, run_subfinder
+from tasks import (
+    TOOL_TIMEOUT,
+    flag_wildcards,
+    get_ip,
+    iter_url_records,
+    run_assetfinder,
+    run_discover_urls,
+    run_subfinder,
+)
 
 app = FastAPI()
 settings = get_settings()
@@ -20,90 +38,256 @@ def _check_internal_token(x_internal_token: str | None):
         )
 
 
-def iter_ndjson(items: Iterable[dict]) -> Iterable[bytes]:
-    for item in items:
-        yield (json.dumps(item, ensure_ascii=False) + '\n').encode('utf-8')
+def iter_ndjson(items: Iterable[dict], batch_size: int = 1) -> Iterable[bytes]:
+    return _iter_ndjson(
+        items, batch_size=batch_size, backend=settings.NDJSON_BACKEND
+    )
 
 
-@app.post(
-    '/subdomains', status_code=HTTPStatus.OK, response_model=SubdomainResponse
-)
-def get_subdomains(domain: str):
+def collect_subdomains(
+    domain: str, force_refresh: bool = False, drop_wildcards: bool = False
+) -> Tuple[List[dict], List[str], List[str]]:
     results = []
+    partial_tools = []
+    # A tool may wait TOOL_QUEUE_TIMEOUT for a slot before its own
+    # timeout starts, so the deadline has to cover both.
+    deadline = settings.TOOL_QUEUE_TIMEOUT + TOOL_TIMEOUT
 
     with ThreadPoolExecutor(max_workers=6) as executor:
         future_to_func = {
-            executor.submit(run_subfinder, domain): 'run_subfinder',
-            executor.submit(run_assetfinder, domain): 'run_assetfinder',
+            executor.submit(
+                run_subfinder, domain, force_refresh
+            ): 'run_subfinder',
+            executor.submit(
+                run_assetfinder, domain, force_refresh
+            ): 'run_assetfinder',
         }
         try:
-            for future in as_completed(future_to_func, timeout=120):
+            for future in as_completed(future_to_func, timeout=deadline):
                 func_name = future_to_func[future]
                 try:
-                    response = future.result(timeout=120)
+                    response, partial = future.result()
                     if response:
                         results.append(response)
+                    if partial:
+                        partial_tools.append(func_name.removeprefix('run_'))
                     print(f'{func_name} result:\n\n{response}\n')
                 except Exception as exc:
                     print(f'{func_name} generated an exception: {exc}')
         except TimeoutError:
-            print(f'{func_name} take to much time')
+            # Whatever is still running is missing from the results.
+            for future, func_name in future_to_func.items():
+                if not future.done():
+                    future.cancel()
+                    partial_tools.append(func_name.removeprefix('run_'))
+                    print(f'{func_name} take to much time')
 
     list_subs_filtered = {
         tuple(sorted(host.items())) for sublist in results for host in sublist
     }
     all_subdomains = [dict(sub) for sub in list_subs_filtered]
-    subdomain_list = get_ip(all_subdomains)
+    subdomain_list, wildcard_zones = flag_wildcards(
+        domain,
+        get_ip(all_subdomains),
+        probes=settings.TOOL_WILDCARD_PROBES,
+        max_zones=settings.TOOL_WILDCARD_MAX_ZONES,
+    )
+    if drop_wildcards:
+        subdomain_list = [s for s in subdomain_list if not s['wildcard']]
+
+    return subdomain_list, wildcard_zones, sorted(partial_tools)
+
+
+def iter_host_results(
+    hosts: List[str],
+    force_refresh: bool = False,
+    max_workers: int = 10,
+    batch_size: int | None = None,
+) -> Iterator[List[dict]]:
+    batch_size = batch_size or settings.NDJSON_BATCH_SIZE
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(run_discover_urls, host, force_refresh): host
+            for host in hosts
+        }
+
+        try:
+            for future in as_completed(futures, timeout=60 * 30):
+                host = futures[future]
+                try:
+                    output, partial = future.result(timeout=180)
+                    # Records go out in batches as they are read from the
+                    # httpx spool, however many the host has.
+                    records = iter_url_records(output)
+                    while batch := [
+                        {'host': host, **r}
+                        for r in islice(records, batch_size)
+                    ]:
+                        yield batch
+                    if partial:
+                        # Marks the host as truncated; the records above
+                        # are what the tools emitted before the deadline.
+                        yield [{'host': host, 'partial': True}]
+                except TimeoutError:
+                    yield [{'host': host, 'error': 'timeout'}]
+                except Exception as exc:
+                    yield [{'host': host, 'error': str(exc)}]
+        except TimeoutError:
+            for f, host in futures.items():
+                if not f.done():
+                    f.cancel()
+                    yield [{'host': host, 'error': 'timeout'}]
+
 
+def _stream_headers(accept_encoding: str | None) -> Tuple[str | None, dict]:
+    encoding = negotiate(accept_encoding, settings.STREAM_COMPRESSION)
+    headers = {'Vary': 'Accept-Encoding'}
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return encoding, headers
+
+
+@app.post(
+    '/subdomains', status_code=HTTPStatus.OK, response_model=SubdomainResponse
+)
+def get_subdomains(
+    domain: str, force_refresh: bool = False, drop_wildcards: bool = False
+):
+    subdomain_list, wildcard_zones, partial_tools = collect_subdomains(
+        domain, force_refresh, drop_wildcards
+    )
     if not subdomain_list:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND, detail='Any subdomains founded'
         )
 
-    return {'subdomains': subdomain_list}
+    return {
+        'subdomains': subdomain_list,
+        'wildcard_zones': wildcard_zones,
+        'partial': bool(partial_tools),
+        'partial_tools': partial_tools,
+    }
+
+
+@app.get('/metrics/scheduler', status_code=HTTPStatus.OK)
+def scheduler_metrics(x_internal_token: str | None = Header(default=None)):
+    _check_internal_token(x_internal_token)
+    return get_scheduler().snapshot()
+
+
+@app.get('/metrics/cache', status_code=HTTPStatus.OK)
+def cache_metrics(x_internal_token: str | None = Header(default=None)):
+    _check_internal_token(x_internal_token)
+    return get_cache().stats()
 
 
 @app.post('/hosts/stream', status_code=HTTPStatus.OK)
 def stream_hosts_urls(
     subdomains: List[SubdomainSchema],
+    force_refresh: bool = False,
     x_internal_token: str | None = Header(default=None),
+    accept_encoding: str | None = Header(default=None),
 ):
     _check_internal_token(x_internal_token)
 
-    max_workers = 10
+    encoding, headers = _stream_headers(accept_encoding)
 
     def generator():
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {
-                executor.submit(run_discover_urls, sub.host): sub.host
-                for sub in subdomains
-            }
-
-            try:
-                for future in as_completed(futures, timeout=60 * 30):
-                    host = futures[future]
-                    try:
-                        results = future.result(timeout=180)
-                        for r in results:
-                            payload = {'host': host, **r}
-                            yield from iter_ndjson([payload])
-                    except TimeoutError:
-                        yield from iter_ndjson([{
-                            'host': host,
-                            'error': 'timeout',
-                        }])
-                    except Exception as exc:
-                        yield from iter_ndjson([{
-                            'host': host,
-                            'error': str(exc),
-                        }])
-            except TimeoutError:
-                for f, host in futures.items():
-                    if not f.done():
-                        f.cancel()
-                        yield from iter_ndjson([{
-                            'host': host,
-                            'error': 'timeout',
-                        }])
-
-    return StreamingResponse(generator(), media_type='application/x-ndjson')
+        for batch in iter_host_results(
+            [sub.host for sub in subdomains], force_refresh
+        ):
+            yield from iter_ndjson(
+                batch, batch_size=settings.NDJSON_BATCH_SIZE
+            )
+
+    return StreamingResponse(
+        compress_stream(
+            generator(), encoding, settings.STREAM_COMPRESSION_LEVEL
+        ),
+        media_type='application/x-ndjson',
+        headers=headers,
+    )
+
+
+def _job_work(request: JobRequest):
+    if request.kind == 'subdomains':
+
+        def work(emit):
+            subdomain_list, wildcard_zones, partial_tools = (
+                collect_subdomains(
+                    request.domain,
+                    request.force_refresh,
+                    request.drop_wildcards,
+                )
+            )
+            if not subdomain_list:
+                raise RuntimeError('Any subdomains founded')
+            emit(subdomain_list)
+            if wildcard_zones:
+                emit([{'wildcard_zones': wildcard_zones}])
+            if partial_tools:
+                emit([{'partial_tools': partial_tools}])
+
+        return work
+
+    def work(emit):
+        for batch in iter_host_results(
+            [sub.host for sub in request.subdomains], request.force_refresh
+        ):
+            emit(batch)
+
+    return work
+
+
+def _get_job_or_404(job_id: str):
+    job = get_job_store().get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, detail='Job not found'
+        )
+    return job
+
+
+@app.post('/jobs', status_code=HTTPStatus.ACCEPTED, response_model=JobStatus)
+def submit_job(
+    request: JobRequest,
+    x_internal_token: str | None = Header(default=None),
+):
+    _check_internal_token(x_internal_token)
+
+    if request.kind == 'subdomains' and not request.domain:
+        raise HTTPException(
+            status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+            detail='domain is required for subdomains jobs',
+        )
+
+    job = get_job_store().submit(request.kind, _job_work(request))
+    return job.public()
+
+
+@app.get('/jobs/{job_id}', status_code=HTTPStatus.OK, response_model=JobStatus)
+def get_job(job_id: str, x_internal_token: str | None = Header(default=None)):
+    _check_internal_token(x_internal_token)
+    return _get_job_or_404(job_id).public()
+
+
+@app.get('/jobs/{job_id}/stream', status_code=HTTPStatus.OK)
+def stream_job(
+    job_id: str,
+    offset: int = Query(default=0, ge=0),
+    x_internal_token: str | None = Header(default=None),
+    accept_encoding: str | None = Header(default=None),
+):
+    _check_internal_token(x_internal_token)
+    job = _get_job_or_404(job_id)
+
+    encoding, headers = _stream_headers(accept_encoding)
+    records = get_job_store().iter_records(
+        job, offset=offset, heartbeat=settings.JOBS_HEARTBEAT
+    )
+
+    return StreamingResponse(
+        compress_stream(records, encoding, settings.STREAM_COMPRESSION_LEVEL),
+        media_type='application/x-ndjson',
+        headers=headers,
+    )
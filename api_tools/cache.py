@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import IO, Dict, Optional, Sequence
+
+from settings import get_settings
+
+
+class ToolCache:
+    # Content-addressed store for raw tool output. Entries expire by mtime
+    # (per-tool TTL) and are evicted least-recently-used first, by atime,
+    # once the directory grows past max_bytes.
+
+    def __init__(
+        self,
+        root: str | Path,
+        max_bytes: int,
+        ttls: Dict[str, int],
+        default_ttl: int = 0,
+    ):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._ttls = dict(ttls)
+        self._default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+
+    def ttl_for(self, tool: str) -> int:
+        return int(self._ttls.get(tool, self._default_ttl))
+
+    def enabled_for(self, tool: str) -> bool:
+        return self.max_bytes > 0 and self.ttl_for(tool) > 0
+
+    @staticmethod
+    def key(tool: str, args: Sequence[str], target: str) -> str:
+        raw = json.dumps([tool, list(args), target], ensure_ascii=False)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def get(
+        self, tool: str, args: Sequence[str], target: str
+    ) -> Optional[IO[bytes]]:
+        # Returns the cached output as an open binary file; the caller
+        # streams it and closes it.
+        if not self.enabled_for(tool):
+            return None
+
+        path = self._path(self.key(tool, args, target))
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+
+        now = time.time()
+        if stat.st_mtime + self.ttl_for(tool) < now:
+            self._discard(path)
+            return None
+
+        try:
+            fh = path.open('rb')
+            os.utime(path, (now, stat.st_mtime))
+        except OSError:
+            return None
+
+        return fh
+
+    def put(
+        self,
+        tool: str,
+        args: Sequence[str],
+        target: str,
+        source: IO[bytes],
+        size: int,
+    ) -> None:
+        if not self.enabled_for(tool) or size > self.max_bytes:
+            return
+
+        path = self._path(self.key(tool, args, target))
+
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            old_size = path.stat().st_size if path.exists() else 0
+            fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+            with os.fdopen(fd, 'wb') as fh:
+                source.seek(0)
+                shutil.copyfileobj(source, fh)
+            os.replace(tmp, path)
+        except OSError as exc:
+            print(f'cache write failed for {tool}: {exc}')
+            return
+
+        with self._lock:
+            if self._size is not None:
+                self._size += size - old_size
+
+        self._evict()
+
+    def _discard(self, path: Path) -> None:
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except OSError:
+            return
+        with self._lock:
+            if self._size is not None:
+                self._size -= size
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        if not self.root.exists():
+            return entries
+        for path in self.root.glob('*/*'):
+            if path.name.startswith('.tmp-'):
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_atime, stat.st_size, path))
+        return entries
+
+    def _evict(self) -> None:
+        with self._lock:
+            if self._size is not None and self._size <= self.max_bytes:
+                return
+
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            if total > self.max_bytes:
+                entries.sort(key=lambda e: e[0])
+                for _, size, path in entries:
+                    if total <= self.max_bytes:
+                        break
+                    try:
+                        path.unlink()
+                    except OSError:
+                        continue
+                    total -= size
+            self._size = total
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        return {
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes,
+        }
+
+
+@lru_cache(maxsize=1)
+def get_cache() -> ToolCache:
+    settings = get_settings()
+    return ToolCache(
+        root=settings.TOOL_CACHE_DIR,
+        max_bytes=settings.TOOL_CACHE_MAX_BYTES,
+        ttls=settings.TOOL_CACHE_TTL,
+        default_ttl=settings.TOOL_CACHE_DEFAULT_TTL,
+    )
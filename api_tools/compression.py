@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import zlib
+from typing import Iterable, Iterator, Optional, Sequence
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional codec
+    zstandard = None
+
+
+class GzipStream:
+    encoding = 'gzip'
+
+    def __init__(self, level: int = 6):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        # Sync flush keeps every chunk decodable on arrival, so the reader
+        # sees records as soon as a host finishes.
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush(zlib.Z_FINISH)
+
+
+class ZstdStream:
+    encoding = 'zstd'
+
+    def __init__(self, level: int = 3):
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data) + self._obj.flush(
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+    def finish(self) -> bytes:
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def supported_encodings() -> list[str]:
+    encodings = ['gzip']
+    if zstandard is not None:
+        encodings.insert(0, 'zstd')
+    return encodings
+
+
+def _parse_accept_encoding(header: str) -> dict[str, float]:
+    accepted = {}
+    for part in header.split(','):
+        token, *params = [p.strip() for p in part.split(';')]
+        if not token:
+            continue
+        q = 1.0
+        for param in params:
+            if param.startswith('q='):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        accepted[token.lower()] = q
+    return accepted
+
+
+def negotiate(
+    accept_encoding: Optional[str], preferred: Sequence[str]
+) -> Optional[str]:
+    if not accept_encoding:
+        return None
+
+    accepted = _parse_accept_encoding(accept_encoding)
+    available = supported_encodings()
+    candidates = [
+        enc
+        for enc in preferred
+        if enc in available and accepted.get(enc, accepted.get('*', 0)) > 0
+    ]
+    if not candidates:
+        return None
+
+    return max(candidates, key=lambda enc: accepted.get(enc, 0))
+
+
+def make_compressor(encoding: str, level: Optional[int] = None):
+    if encoding == 'zstd':
+        return ZstdStream(level) if level is not None else ZstdStream()
+    if encoding == 'gzip':
+        return GzipStream(level) if level is not None else GzipStream()
+    raise ValueError(f'unsupported encoding {encoding!r}')
+
+
+def compress_stream(
+    chunks: Iterable[bytes],
+    encoding: Optional[str],
+    level: Optional[int] = None,
+) -> Iterator[bytes]:
+    if not encoding:
+        yield from chunks
+        return
+
+    compressor = make_compressor(encoding, level)
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+
+    tail = compressor.finish()
+    if tail:
+        yield tail
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+from ndjson import dumps
+from settings import get_settings
+
+INDEX_EVERY = 1000
+TERMINAL = {'done', 'failed'}
+
+Emit = Callable[[List[dict]], None]
+
+
+@dataclass
+class ToolJob:
+    id: str
+    kind: str
+    path: Path
+    status: str = 'queued'
+    records: int = 0
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    # Byte position of every INDEX_EVERY-th record, so a reader can resume
+    # from any offset without rescanning the whole file.
+    index: List[int] = field(default_factory=lambda: [0])
+    size: int = 0
+    cond: threading.Condition = field(default_factory=threading.Condition)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in TERMINAL
+
+    def public(self) -> dict:
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'records': self.records,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobStore:
+    # Background tool jobs whose output is spooled to an NDJSON file. Readers
+    # stream it from any record offset, following the file while the job is
+    # still running, so a dropped connection only costs a reconnect.
+
+    def __init__(
+        self,
+        root: str | Path,
+        max_workers: int,
+        ttl: int,
+        backend: Optional[str] = None,
+    ):
+        self.root = Path(root)
+        self.ttl = ttl
+        self.backend = backend
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='tool-job'
+        )
+        self._jobs: Dict[str, ToolJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, work: Callable[[Emit], None]) -> ToolJob:
+        self.cleanup()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        job_id = uuid.uuid4().hex
+        job = ToolJob(
+            id=job_id, kind=kind, path=self.root / f'{job_id}.ndjson'
+        )
+        job.path.touch()
+
+        with self._lock:
+            self._jobs[job_id] = job
+
+        self._executor.submit(self._run, job, work)
+        return job
+
+    def get(self, job_id: str) -> Optional[ToolJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: ToolJob, work: Callable[[Emit], None]) -> None:
+        with job.cond:
+            job.status = 'running'
+            job.started_at = time.time()
+
+        try:
+            work(lambda batch: self._append(job, batch))
+            status, error = 'done', None
+        except Exception as exc:
+            status, error = 'failed', str(exc) or type(exc).__name__
+
+        with job.cond:
+            job.status = status
+            job.error = error
+            job.finished_at = time.time()
+            job.cond.notify_all()
+
+    def _append(self, job: ToolJob, batch: List[dict]) -> None:
+        if not batch:
+            return
+
+        lines = [dumps(item, self.backend) + b'\n' for item in batch]
+        with job.path.open('ab') as fh:
+            fh.write(b''.join(lines))
+
+        with job.cond:
+            for line in lines:
+                job.records += 1
+                job.size += len(line)
+                if job.records % INDEX_EVERY == 0:
+                    job.index.append(job.size)
+            job.cond.notify_all()
+
+    def iter_records(
+        self, job: ToolJob, offset: int = 0, heartbeat: float = 15.0
+    ) -> Iterator[bytes]:
+        offset = max(0, offset)
+        with job.cond:
+            slot = min(offset // INDEX_EVERY, len(job.index) - 1)
+            position = job.index[slot]
+        sent = slot * INDEX_EVERY
+
+        with job.path.open('rb') as fh:
+            fh.seek(position)
+            while True:
+                with job.cond:
+                    if job.records <= sent and not job.finished:
+                        job.cond.wait(heartbeat)
+                    available = job.records
+                    finished = job.finished
+                    error = job.error
+
+                if available <= sent and not finished:
+                    # Keeps idle connections alive; readers skip blank lines.
+                    yield b'\n'
+                    continue
+
+                chunk = []
+                while sent < available:
+                    line = fh.readline()
+                    if sent >= offset:
+                        chunk.append(line)
+                    sent += 1
+                if chunk:
+                    yield b''.join(chunk)
+
+                if finished and sent >= available:
+                    if error:
+                        yield dumps({'job_error': error}, self.backend) + b'\n'
+                    return
+
+    def cleanup(self) -> None:
+        now = time.time()
+        with self._lock:
+            expired = [
+                job
+                for job in self._jobs.values()
+                if job.finished and job.finished_at + self.ttl < now
+            ]
+            for job in expired:
+                self._jobs.pop(job.id, None)
+
+        for job in expired:
+            job.path.unlink(missing_ok=True)
+
+
+@lru_cache(maxsize=1)
+def get_job_store() -> JobStore:
+    settings = get_settings()
+    return JobStore(
+        root=settings.JOBS_DIR,
+        max_workers=settings.JOBS_MAX_WORKERS,
+        ttl=settings.JOBS_TTL,
+        backend=settings.NDJSON_BACKEND,
+    )
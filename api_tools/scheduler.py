@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Iterator, Optional
+
+from settings import get_settings
+
+
+@dataclass
+class _Ticket:
+    seq: int
+    tool: str
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class _ToolStats:
+    running: int = 0
+    started: int = 0
+    completed: int = 0
+    timed_out: int = 0
+    wait_total: float = 0.0
+    wait_max: float = 0.0
+    queue_peak: int = 0
+
+
+class SchedulerTimeout(RuntimeError):
+    pass
+
+
+class ToolScheduler:
+    # Process-wide admission control for external tools. Every tool has its
+    # own FIFO queue and concurrency cap, and all tools share a global
+    # process budget. A global slot always goes to the oldest waiter whose
+    # tool still has room, so no request can starve the others.
+
+    def __init__(
+        self,
+        limits: Dict[str, int],
+        max_processes: int,
+        default_limit: int = 2,
+    ):
+        self._limits = {k: max(1, int(v)) for k, v in limits.items()}
+        self._default_limit = max(1, default_limit)
+        self._max_processes = max(1, max_processes)
+        self._cond = threading.Condition()
+        self._queues: Dict[str, deque[_Ticket]] = {}
+        self._stats: Dict[str, _ToolStats] = {}
+        self._running = 0
+        self._seq = itertools.count()
+
+    def limit_for(self, tool: str) -> int:
+        return self._limits.get(tool, self._default_limit)
+
+    def _tool(self, tool: str) -> tuple[deque[_Ticket], _ToolStats]:
+        queue = self._queues.setdefault(tool, deque())
+        stats = self._stats.setdefault(tool, _ToolStats())
+        return queue, stats
+
+    def _eligible(self, ticket: _Ticket) -> bool:
+        if self._running >= self._max_processes:
+            return False
+
+        for tool, queue in self._queues.items():
+            if not queue:
+                continue
+            head = queue[0]
+            if self._stats[tool].running >= self.limit_for(tool):
+                continue
+            if head.seq < ticket.seq:
+                return False
+
+        queue, stats = self._tool(ticket.tool)
+        return queue[0] is ticket and stats.running < self.limit_for(
+            ticket.tool
+        )
+
+    def acquire(self, tool: str, timeout: Optional[float] = None) -> None:
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._cond:
+            queue, stats = self._tool(tool)
+            ticket = _Ticket(seq=next(self._seq), tool=tool)
+            queue.append(ticket)
+            stats.queue_peak = max(stats.queue_peak, len(queue))
+
+            while not self._eligible(ticket):
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        queue.remove(ticket)
+                        stats.timed_out += 1
+                        self._cond.notify_all()
+                        raise SchedulerTimeout(
+                            f'{tool} waited too long for a slot'
+                        )
+                self._cond.wait(remaining)
+
+            queue.popleft()
+            waited = time.monotonic() - ticket.enqueued_at
+            stats.running += 1
+            stats.started += 1
+            stats.wait_total += waited
+            stats.wait_max = max(stats.wait_max, waited)
+            self._running += 1
+            self._cond.notify_all()
+
+    def release(self, tool: str) -> None:
+        with self._cond:
+            _, stats = self._tool(tool)
+            stats.running -= 1
+            stats.completed += 1
+            self._running -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(
+        self, tool: str, timeout: Optional[float] = None
+    ) -> Iterator[None]:
+        self.acquire(tool, timeout=timeout)
+        try:
+            yield
+        finally:
+            self.release(tool)
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            tools = {}
+            for tool in sorted(set(self._limits) | set(self._stats)):
+                queue, stats = self._tool(tool)
+                tools[tool] = {
+                    'limit': self.limit_for(tool),
+                    'running': stats.running,
+                    'queued': len(queue),
+                    'queue_peak': stats.queue_peak,
+                    'started': stats.started,
+                    'completed': stats.completed,
+                    'timed_out': stats.timed_out,
+                    'wait_avg_ms': round(
+                        stats.wait_total / stats.started * 1000, 2
+                    )
+                    if stats.started
+                    else 0.0,
+                    'wait_max_ms': round(stats.wait_max * 1000, 2),
+                }
+
+            return {
+                'max_processes': self._max_processes,
+                'running': self._running,
+                'queued': sum(len(q) for q in self._queues.values()),
+                'tools': tools,
+            }
+
+
+@lru_cache(maxsize=1)
+def get_scheduler() -> ToolScheduler:
+    settings = get_settings()
+    return ToolScheduler(
+        limits=settings.TOOL_CONCURRENCY,
+        max_processes=settings.TOOL_MAX_PROCESSES,
+        default_limit=settings.TOOL_DEFAULT_CONCURRENCY,
+    )
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Literal, Optional
 
 from pydantic import BaseModel
 
@@ -6,7 +6,30 @@ from pydantic import BaseModel
 class SubdomainSchema(BaseModel):
     host: str
     ip: str
+    wildcard: bool = False
 
 
 class SubdomainResponse(BaseModel):
     subdomains: List[SubdomainSchema]
+    wildcard_zones: List[str] = []
+    partial: bool = False
+    partial_tools: List[str] = []
+
+
+class JobRequest(BaseModel):
+    kind: Literal['hosts', 'subdomains'] = 'hosts'
+    domain: Optional[str] = None
+    subdomains: List[SubdomainSchema] = []
+    force_refresh: bool = False
+    drop_wildcards: bool = False
+
+
+class JobStatus(BaseModel):
+    id: str
+    kind: str
+    status: str
+    records: int
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
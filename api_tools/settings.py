@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from functools import lru_cache
+from typing import Dict, List, Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -15,6 +16,42 @@ class ToolSettings(BaseSettings):
     INTERNAL_TOKEN: str
     API_TOOLS_URL: str
 
+    TOOL_MAX_PROCESSES: int = 12
+    TOOL_DEFAULT_CONCURRENCY: int = 2
+    TOOL_CONCURRENCY: Dict[str, int] = {
+        'subfinder': 2,
+        'assetfinder': 2,
+        'gau': 6,
+        'httpx': 6,
+    }
+    TOOL_QUEUE_TIMEOUT: int = 60 * 10
+
+    TOOL_OUTPUT_MEMORY_BYTES: int = 8 * 1024 * 1024
+    TOOL_OUTPUT_MAX_BYTES: int = 1024 * 1024 * 1024
+    TOOL_SPOOL_DIR: Optional[str] = None
+
+    NDJSON_BACKEND: Optional[str] = None
+    NDJSON_BATCH_SIZE: int = 200
+    STREAM_COMPRESSION: List[str] = ['zstd', 'gzip']
+    STREAM_COMPRESSION_LEVEL: Optional[int] = None
+
+    TOOL_WILDCARD_PROBES: int = 2
+    TOOL_WILDCARD_MAX_ZONES: int = 200
+
+    JOBS_DIR: str = '/tmp/recon_tool_jobs'
+    JOBS_MAX_WORKERS: int = 4
+    JOBS_TTL: int = 3600
+    JOBS_HEARTBEAT: float = 15.0
+
+    TOOL_CACHE_DIR: str = '/tmp/recon_tool_cache'
+    TOOL_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    TOOL_CACHE_DEFAULT_TTL: int = 0
+    TOOL_CACHE_TTL: Dict[str, int] = {
+        'subfinder': 6 * 3600,
+        'assetfinder': 6 * 3600,
+        'gau': 12 * 3600,
+    }
+
 
 @lru_cache(maxsize=1)
 def get_settings() -> ToolSettings:
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import tempfile
+import threading
+from typing import IO, Iterator, Optional
+
+CHUNK_SIZE = 64 * 1024
+
+
+class OutputSpool:
+    # Buffer for raw tool output. Up to memory_bytes stays in RAM; beyond
+    # that SpooledTemporaryFile moves it to disk, and nothing past max_bytes
+    # is kept at all. Readers get the content back line by line, so a huge
+    # gau run never has to exist as one string.
+
+    def __init__(
+        self,
+        memory_bytes: int,
+        max_bytes: int,
+        directory: Optional[str] = None,
+    ):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.truncated = False
+        self._file = tempfile.SpooledTemporaryFile(
+            max_size=memory_bytes, mode='w+b', dir=directory
+        )
+
+    def write(self, data: bytes) -> bool:
+        if not data:
+            return True
+
+        room = self.max_bytes - self.size
+        if len(data) > room:
+            data = data[: max(room, 0)]
+            self.truncated = True
+
+        if data:
+            self._file.write(data)
+            self.size += len(data)
+
+        return not self.truncated
+
+    def fill(self, source: IO[bytes], on_limit=None) -> None:
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+            if not self.write(chunk):
+                if on_limit is not None:
+                    on_limit()
+                # Keep draining so the writer is never blocked on a full
+                # pipe while it is being killed.
+                for _ in iter(lambda: source.read(CHUNK_SIZE), b''):
+                    pass
+                return
+
+    def raw(self) -> IO[bytes]:
+        self._file.seek(0)
+        return self._file
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class TailBuffer:
+    # Keeps the last `limit` bytes written, used for stderr so a chatty
+    # tool cannot grow memory while we only need the error message.
+
+    def __init__(self, limit: int = CHUNK_SIZE):
+        self.limit = limit
+        self._data = b''
+        self._lock = threading.Lock()
+
+    def fill(self, source: IO[bytes]) -> None:
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+            with self._lock:
+                self._data = (self._data + chunk)[-self.limit :]
+
+    def text(self) -> str:
+        with self._lock:
+            return self._data.decode('utf-8', errors='replace')
+
+
+def iter_lines(
+    source: IO[bytes], drop_incomplete: bool = False
+) -> Iterator[str]:
+    source.seek(0)
+    pending = None
+    for raw in source:
+        if pending is not None:
+            yield pending
+        pending = raw.decode('utf-8', errors='replace')
+
+    if pending is None:
+        return
+    if drop_incomplete and not pending.endswith('\n'):
+        return
+    yield pending
@@ -1,10 +1,23 @@
-import json
+import io
+import os
+import secrets
+import shutil
+import signal
 import socket
 import subprocess
-from typing import Dict, List
+import threading
+from dataclasses import dataclass
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Set
 from urllib.parse import urlparse
 
 import idna
+from cache import get_cache
+from ndjson import loads
+from scheduler import get_scheduler
+from settings import get_settings
+from spool import CHUNK_SIZE, OutputSpool, TailBuffer, iter_lines
+
+TOOL_TIMEOUT = 120
 
 
 def normalize_host(raw: str) -> str:
@@ -27,106 +40,233 @@ def normalize_host(raw: str) -> str:
         return None
 
 
-def run_command(command: List[str], tool_name: str, timeout: int = 120):
-    try:
-        result = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            check=True,
-            timeout=timeout,
-        )
+def _tool_slot(tool_name: str):
+    return get_scheduler().slot(
+        tool_name, timeout=get_settings().TOOL_QUEUE_TIMEOUT
+    )
 
-        return result.stdout.strip()
 
-    except FileNotFoundError:
-        raise RuntimeError(f'{tool_name} not found')
+@dataclass
+class ToolOutput:
+    source: IO[bytes]
+    size: int
+    partial: bool = False
 
-    except subprocess.TimeoutExpired:
-        raise RuntimeError(f'{tool_name} timeout')
+    def lines(self) -> Iterator[str]:
+        # A run cut at the deadline or the size cap may end mid-record.
+        for raw in iter_lines(self.source, drop_incomplete=self.partial):
+            line = raw.strip()
+            if line:
+                yield line
 
-    except subprocess.CalledProcessError as exc:
-        raise RuntimeError(f'{tool_name} error: {exc.stderr.strip()}')
+    def copy_to(self, target: IO[bytes]) -> None:
+        self.source.seek(0)
+        shutil.copyfileobj(self.source, target, CHUNK_SIZE)
 
+    def close(self) -> None:
+        self.source.close()
 
-def run_assetfinder(domain: str):
-    output = run_command(['assetfinder', '-subs-only', domain], 'assetfinder')
+    def __enter__(self) -> 'ToolOutput':
+        return self
 
-    if not output:
-        return []
+    def __exit__(self, *exc) -> None:
+        self.close()
 
-    subdomains = [
-        {'host': sub.strip()} for sub in output.splitlines() if sub.strip()
-    ]
 
-    return subdomains
+def _kill(proc: subprocess.Popen) -> None:
+    # Tools run in their own session so helpers they spawn die with them
+    # and cannot keep the pipes open after the deadline.
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        proc.kill()
 
 
-def run_subfinder(domain: str):
-    output = run_command(
-        ['subfinder', '-d', domain, '-oJ', '-silent'], 'subfinder'
-    )
-    if not output:
-        return []
-
-    subdomains = []
-    for line in output.splitlines():
+def _feed(proc: subprocess.Popen, input: ToolOutput) -> None:
+    try:
+        input.copy_to(proc.stdin)
+    except (BrokenPipeError, ValueError, OSError):
+        pass
+    finally:
         try:
-            data = json.loads(line)
-            if 'host' in data:
-                subdomains.append({'host': data['host']})
-        except json.JSONDecodeError:
-            print(f'Invalid JSON line: {line}')
-            continue
-
-    return subdomains
-
+            proc.stdin.close()
+        except OSError:
+            pass
+
+
+def run_process(
+    command: List[str],
+    tool_name: str,
+    timeout: int,
+    input: ToolOutput | None = None,
+) -> ToolOutput:
+    settings = get_settings()
+    try:
+        proc = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE if input is not None else None,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True,
+        )
+    except FileNotFoundError:
+        raise RuntimeError(f'{tool_name} not found')
 
-def run_discover_urls(subdomain: str):
-    output_gau = run_command(
-        ['gau', subdomain, '--config', '/data/.gau.toml'], 'gau', timeout=120
+    spool = OutputSpool(
+        memory_bytes=settings.TOOL_OUTPUT_MEMORY_BYTES,
+        max_bytes=settings.TOOL_OUTPUT_MAX_BYTES,
+        directory=settings.TOOL_SPOOL_DIR,
     )
-    if not output_gau:
-        return []
+    stderr = TailBuffer()
+    threads = [
+        threading.Thread(
+            target=spool.fill, args=(proc.stdout, lambda: _kill(proc))
+        ),
+        threading.Thread(target=stderr.fill, args=(proc.stderr,)),
+    ]
+    if input is not None:
+        threads.append(threading.Thread(target=_feed, args=(proc, input)))
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
 
+    timed_out = False
     try:
-        p = subprocess.run(
-            ['httpx', '-silent', '-json'],
-            input=output_gau,
-            capture_output=True,
-            text=True,
-            check=True,
-            timeout=120,
-        )
-        output = p.stdout.strip()
-    except FileNotFoundError:
-        raise RuntimeError('httpx not found (binary missing in PATH)')
+        proc.wait(timeout=timeout)
     except subprocess.TimeoutExpired:
-        raise RuntimeError('httpx timeout')
-    except subprocess.CalledProcessError as exc:
-        raise RuntimeError(f'httpx error: {exc.stderr.strip()}')
+        timed_out = True
+        _kill(proc)
+        proc.wait()
+
+    for thread in threads:
+        thread.join()
+    proc.stdout.close()
+    proc.stderr.close()
+
+    if timed_out:
+        print(f'{tool_name} timeout after {timeout}s, keeping partial output')
+    elif spool.truncated:
+        print(
+            f'{tool_name} output reached {spool.max_bytes} bytes, '
+            'keeping partial output'
+        )
+    elif proc.returncode:
+        spool.close()
+        raise RuntimeError(f'{tool_name} error: {stderr.text().strip()}')
 
-    if not output:
-        return []
+    return ToolOutput(
+        spool.raw(), spool.size, partial=timed_out or spool.truncated
+    )
 
-    hosts = []
-    for line in output.splitlines():
-        try:
-            data = json.loads(line)
+
+def run_command(
+    command: List[str],
+    tool_name: str,
+    timeout: int = TOOL_TIMEOUT,
+    *,
+    target: str | None = None,
+    force_refresh: bool = False,
+) -> ToolOutput:
+    cache = get_cache()
+    if target and not force_refresh:
+        cached = cache.get(tool_name, command, target)
+        if cached is not None:
+            return ToolOutput(cached, os.fstat(cached.fileno()).st_size)
+
+    with _tool_slot(tool_name):
+        output = run_process(command, tool_name, timeout)
+
+    # A truncated run would hide the missing records until the TTL expires.
+    if target and not output.partial:
+        cache.put(tool_name, command, target, output.source, output.size)
+
+    return output
+
+
+def run_assetfinder(domain: str, force_refresh: bool = False):
+    with run_command(
+        ['assetfinder', '-subs-only', domain],
+        'assetfinder',
+        target=domain,
+        force_refresh=force_refresh,
+    ) as output:
+        subdomains = [{'host': sub} for sub in output.lines()]
+
+    return subdomains, output.partial
+
+
+def run_subfinder(domain: str, force_refresh: bool = False):
+    backend = get_settings().NDJSON_BACKEND
+    subdomains = []
+    with run_command(
+        ['subfinder', '-d', domain, '-oJ', '-silent'],
+        'subfinder',
+        target=domain,
+        force_refresh=force_refresh,
+    ) as output:
+        for line in output.lines():
+            try:
+                data = loads(line, backend)
+                if 'host' in data:
+                    subdomains.append({'host': data['host']})
+            except ValueError:
+                print(f'Invalid JSON line: {line}')
+                continue
+
+    return subdomains, output.partial
+
+
+def run_discover_urls(subdomain: str, force_refresh: bool = False):
+    # Returns the open httpx output; iter_url_records reads it lazily so
+    # the records of a host are never held in memory together.
+    with run_command(
+        ['gau', subdomain, '--config', '/data/.gau.toml'],
+        'gau',
+        timeout=120,
+        target=subdomain,
+        force_refresh=force_refresh,
+    ) as output_gau:
+        if not output_gau.size:
+            return ToolOutput(io.BytesIO(), 0), output_gau.partial
+
+        # gau output is piped from its spool file, never loaded whole.
+        with _tool_slot('httpx'):
+            output = run_process(
+                ['httpx', '-silent', '-json'],
+                'httpx',
+                timeout=120,
+                input=output_gau,
+            )
+
+    return output, output_gau.partial or output.partial
+
+
+def iter_url_records(output: ToolOutput) -> Iterator[dict]:
+    backend = get_settings().NDJSON_BACKEND
+    with output:
+        for line in output.lines():
+            try:
+                data = loads(line, backend)
+            except ValueError:
+                print(f'Invalid JSON line: {line}')
+                continue
             if 'url' in data:
-                hosts.append({
+                yield {
                     'url': data['url'],
-                    'title': data['title'] if 'title' in data else 'unknown',
+                    'title': data.get('title', 'unknown'),
                     'hostname': data['host'],
                     'port': int(data['port']),
-                    'tech': data['tech'] if 'tech' in data else ['unknown'],
+                    'tech': data.get('tech', ['unknown']),
                     'status_code': data['status_code'],
-                })
-        except json.JSONDecodeError:
-            print(f'Invalid JSON line: {line}')
-            continue
+                }
 
-    return hosts
+
+def resolve_host(host: str) -> List[str]:
+    try:
+        _, _, addresses = socket.gethostbyname_ex(host)
+    except (socket.gaierror, socket.herror, UnicodeError):
+        return []
+    return sorted(set(addresses))
 
 
 def get_ip(lists_subdomains: List[Dict[str, str]]):
@@ -136,11 +276,79 @@ def get_ip(lists_subdomains: List[Dict[str, str]]):
         if not host:
             continue
 
-        try:
-            ip = socket.gethostbyname(host)
-        except socket.gaierror:
-            ip = '0.0.0.0'
+        addresses = resolve_host(host)
+        ip = addresses[0] if addresses else '0.0.0.0'
 
-        list_ips.append({**subdomain, 'ip': ip})
+        list_ips.append({**subdomain, 'ip': ip, 'ips': addresses})
 
     return list_ips
+
+
+def _parent_zone(host: str) -> Optional[str]:
+    return host.split('.', 1)[1] if '.' in host else None
+
+
+def _in_domain(host: str, domain: str) -> bool:
+    return host == domain or host.endswith(f'.{domain}')
+
+
+def detect_wildcards(
+    domain: str,
+    hosts: Iterable[str],
+    probes: int = 2,
+    max_zones: int = 200,
+) -> Dict[str, Set[str]]:
+    # A zone is a wildcard when every random label under it resolves. The
+    # union of those answers is what the catch-all record hands out.
+    zones = [domain]
+    seen = {domain}
+    for host in hosts:
+        parent = _parent_zone(host)
+        if not parent or parent in seen or not _in_domain(parent, domain):
+            continue
+        if len(zones) >= max_zones:
+            break
+        seen.add(parent)
+        zones.append(parent)
+
+    wildcards: Dict[str, Set[str]] = {}
+    for zone in zones:
+        answers: Set[str] = set()
+        for _ in range(probes):
+            addresses = resolve_host(f'{secrets.token_hex(8)}.{zone}')
+            if not addresses:
+                break
+            answers.update(addresses)
+        else:
+            wildcards[zone] = answers
+
+    return wildcards
+
+
+def flag_wildcards(
+    domain: str,
+    subdomains: List[Dict],
+    probes: int = 2,
+    max_zones: int = 200,
+) -> tuple[List[Dict], List[str]]:
+    domain = normalize_host(domain) or domain
+    hosts = {
+        sub['host']: normalize_host(sub['host']) or sub['host']
+        for sub in subdomains
+    }
+    wildcards = detect_wildcards(
+        domain, hosts.values(), probes=probes, max_zones=max_zones
+    )
+
+    flagged = []
+    for sub in subdomains:
+        addresses = set(sub.get('ips') or [])
+        zone = _parent_zone(hosts[sub['host']])
+        while zone and zone not in wildcards and _in_domain(zone, domain):
+            zone = _parent_zone(zone)
+        answers = wildcards.get(zone) if zone else None
+
+        is_wildcard = bool(addresses and answers and addresses <= answers)
+        flagged.append({**sub, 'wildcard': is_wildcard})
+
+    return flagged, sorted(wildcards)
@@ -3,11 +3,15 @@ from __future__ import annotations
 from typing import Annotated
 
 from fastapi import Depends
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from auto_recon_api.db.session import get_db
+from auto_recon_api.db.session import get_db, get_sessionmaker
 from auto_recon_api.models import User
 from auto_recon_api.security import get_current_user
 
 DbSession = Annotated[AsyncSession, Depends(get_db)]
+# For response bodies that outlive the request session (exports).
+SessionFactory = Annotated[
+    async_sessionmaker[AsyncSession], Depends(get_sessionmaker)
+]
 CurrentUser = Annotated[User, Depends(get_current_user)]
@@ -2,29 +2,60 @@ from __future__ import annotations
 
 from http import HTTPStatus
 from typing import Annotated
+from uuid import uuid4
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
 from redis import Redis
+from redis.exceptions import RedisError
 from rq import Queue
-from sqlalchemy import and_, func, or_, select
+from rq.job import Dependency
+from sqlalchemy import func, select, tuple_
 from sqlalchemy.exc import IntegrityError
 
-from auto_recon_api.api.deps import CurrentUser, DbSession
+from auto_recon_api.api.deps import CurrentUser, DbSession, SessionFactory
+from auto_recon_api.core.config import get_settings
+from auto_recon_api.core.export import export_headers, export_stream
 from auto_recon_api.core.pagination import decode_cursor, encode_cursor
-from auto_recon_api.models import DiscoveredURL, Domain, DomainRun
+from auto_recon_api.core.search import search_clause
+from auto_recon_api.models import (
+    DiscoveredURL,
+    Domain,
+    DomainRun,
+    DomainStatusCount,
+    DomainUrlFacet,
+)
 from auto_recon_api.schemas import (
+    DomainFacets,
     DomainListItem,
     DomainListResponse,
     DomainResponseCreated,
+    DomainStatusSummary,
+    DomainSummary,
     EnterDomainSchema,
+    ExportOptions,
+    FacetCount,
+    FacetFilter,
     FilterDomain,
     Message,
+    SnapshotOptions,
+    UrlFilters,
     UrlItem,
     UrlListFilters,
     UrlListResponse,
+    UrlScanOptions,
+)
+from auto_recon_api.tasks.snapshots import (
+    SNAPSHOT_TABLES,
+    build_domain_snapshot,
+    snapshot_path,
+)
+from auto_recon_api.tasks.urls import chunks, scan_urls_for_domain
+from auto_recon_api.workers.subdomains import (
+    finalize_subdomain_fanout,
+    run_find_subdomains,
+    subdomain_job_timeout,
 )
-from auto_recon_api.tasks.urls import scan_urls_for_domain
-from auto_recon_api.workers.subdomains import run_find_subdomains
 
 redis_conn = Redis(host='redis', port=6379)
 subdomains_queue = Queue('subdomains', connection=redis_conn)
@@ -32,13 +63,21 @@ urls_queue = Queue('urls', connection=redis_conn)
 router = APIRouter(prefix='/domains', tags=['domains'])
 Filter = Annotated[FilterDomain, Depends()]
 FilterUrl = Annotated[UrlListFilters, Depends()]
+FilterUrlExport = Annotated[UrlFilters, Depends()]
+Export = Annotated[ExportOptions, Depends()]
+ScanOptions = Annotated[UrlScanOptions, Depends()]
+Snapshot = Annotated[SnapshotOptions, Depends()]
+Facets = Annotated[FacetFilter, Depends()]
 
 
 @router.post(
     '/', response_model=DomainResponseCreated, status_code=HTTPStatus.CREATED
 )
 async def add_domains(
-    domains: EnterDomainSchema, session: DbSession, user: CurrentUser
+    domains: EnterDomainSchema,
+    session: DbSession,
+    user: CurrentUser,
+    force_refresh: bool = False,
 ):
     domain_names = set(domains.domains)
     if not domain_names:
@@ -75,20 +114,11 @@ async def add_domains(
 
             await session.flush()
 
-            for domain in new_domains:
-                await session.refresh(domain)
-
             domain_ids = [domain.id for domain in new_domains]
 
-            job = subdomains_queue.enqueue(
-                run_find_subdomains,
-                domain_ids,
-                retry=0,
-                job_timeout=1200,
-                result_ttl=86400,
-                ttl=86400,
-            )
-            job_id = job.id
+            job_id = enqueue_subdomain_jobs(domain_ids, force_refresh)
+            for domain in new_domains:
+                domain.latest_job_id = job_id
 
             session.add_all(
                 [
@@ -98,6 +128,12 @@ async def add_domains(
                 ]
             )
 
+            # Setting latest_job_id is an UPDATE, which expires the
+            # server-side updated_at; reload it before the response.
+            await session.flush()
+            for domain in new_domains:
+                await session.refresh(domain)
+
         await session.commit()
 
     except IntegrityError as error:
@@ -129,9 +165,80 @@ async def add_domains(
     )
 
 
+@router.post('/{domain_id}/rescan', status_code=HTTPStatus.ACCEPTED)
+async def rescan_domain(
+    domain_id: int,
+    session: DbSession,
+    user: CurrentUser,
+    force_refresh: bool = False,
+):
+    domain = await session.scalar(
+        select(Domain).where(Domain.id == domain_id, Domain.user_id == user.id)
+    )
+    if not domain:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, detail='Domain not found'
+        )
+
+    # The run is committed before the job is queued, so the worker always
+    # finds it and records the hosts this scan saw under it.
+    job_id = str(uuid4())
+    previous_status = domain.status
+    run = DomainRun(domain_id=domain.id, job_id=job_id, status='queued')
+    session.add(run)
+    domain.status = 'queued'
+    domain.latest_job_id = job_id
+    await session.commit()
+
+    try:
+        enqueue_subdomain_recon(domain.id, force_refresh, job_id=job_id)
+    except RedisError:
+        run.status = 'failed'
+        run.error_message = 'Could not queue the scan'
+        domain.status = previous_status
+        await session.commit()
+        raise HTTPException(
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            detail='Could not queue the scan',
+        )
+
+    return {'data': {'job_id': job_id, 'domain_id': domain.id}}
+
+
 @router.post('/{domain_id}/urls/scan', status_code=HTTPStatus.ACCEPTED)
 async def scan_domain_urls(
-    domain_id: int, session: DbSession, user: CurrentUser
+    domain_id: int,
+    session: DbSession,
+    user: CurrentUser,
+    options: ScanOptions,
+):
+    domain = await session.scalar(
+        select(Domain).where(Domain.id == domain_id, Domain.user_id == user.id)
+    )
+    if not domain:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, detail='Domain not found'
+        )
+
+    job = urls_queue.enqueue(
+        scan_urls_for_domain,
+        domain_id,
+        user.id,
+        options.force_refresh,
+        options.include_wildcards,
+        options.check_liveness,
+        job_timeout=60 * 60,
+    )
+
+    return {'data': {'job_id': job.id, 'domain_id': domain.id}}
+
+
+@router.post('/{domain_id}/snapshots', status_code=HTTPStatus.ACCEPTED)
+async def create_domain_snapshot(
+    domain_id: int,
+    session: DbSession,
+    user: CurrentUser,
+    options: Snapshot,
 ):
     domain = await session.scalar(
         select(Domain).where(Domain.id == domain_id, Domain.user_id == user.id)
@@ -142,12 +249,183 @@ async def scan_domain_urls(
         )
 
     job = urls_queue.enqueue(
-        scan_urls_for_domain, domain_id, user.id, job_timeout=60 * 60
+        build_domain_snapshot,
+        domain_id,
+        options.format,
+        job_timeout=60 * 60,
     )
 
     return {'data': {'job_id': job.id, 'domain_id': domain.id}}
 
 
+@router.get('/{domain_id}/snapshots/{table}', status_code=HTTPStatus.OK)
+async def download_domain_snapshot(
+    domain_id: int,
+    table: str,
+    session: DbSession,
+    user: CurrentUser,
+    options: Snapshot,
+) -> FileResponse:
+    name = await session.scalar(
+        select(Domain.name).where(
+            Domain.id == domain_id, Domain.user_id == user.id
+        )
+    )
+    if name is None:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, detail='Domain not found'
+        )
+
+    path = snapshot_path(domain_id, table, options.format)
+    if table not in SNAPSHOT_TABLES or not path.is_file():
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, detail='Snapshot not found'
+        )
+
+    # FileResponse answers Range requests, so large files can be fetched
+    # in parts or resumed.
+    return FileResponse(
+        path,
+        media_type='application/octet-stream',
+        filename=f'{name}-{table}.{options.format}',
+    )
+
+
+async def _status_total(
+    session, user_id: int, status: str | None = None
+) -> int:
+    stmt = select(func.coalesce(func.sum(DomainStatusCount.count), 0)).where(
+        DomainStatusCount.user_id == user_id
+    )
+    if status:
+        stmt = stmt.where(DomainStatusCount.status == status)
+    return int(await session.scalar(stmt) or 0)
+
+
+@router.get(
+    '/summary', response_model=DomainStatusSummary, status_code=HTTPStatus.OK
+)
+async def get_domains_summary(session: DbSession, user: CurrentUser):
+    rows = await session.execute(
+        select(DomainStatusCount.status, DomainStatusCount.count).where(
+            DomainStatusCount.user_id == user.id,
+            DomainStatusCount.count > 0,
+        )
+    )
+    by_status = dict(rows.all())
+
+    return DomainStatusSummary(
+        total=sum(by_status.values()), by_status=by_status
+    )
+
+
+@router.get(
+    '/{domain_id}/summary',
+    response_model=DomainSummary,
+    status_code=HTTPStatus.OK,
+)
+async def get_domain_summary(
+    domain_id: int, session: DbSession, user: CurrentUser
+):
+    domain = await session.scalar(
+        select(Domain).where(Domain.id == domain_id, Domain.user_id == user.id)
+    )
+    if not domain:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, detail='Domain not found'
+        )
+
+    return DomainSummary(
+        id=domain.id,
+        name=domain.name,
+        status=domain.status,
+        subdomain_count=domain.subdomain_count,
+        url_count=domain.url_count,
+        updated_at=domain.updated_at,
+    )
+
+
+@router.get(
+    '/{domain_id}/facets',
+    response_model=DomainFacets,
+    status_code=HTTPStatus.OK,
+)
+async def get_domain_facets(
+    domain_id: int, session: DbSession, user: CurrentUser, filters: Facets
+):
+    url_count = await session.scalar(
+        select(Domain.url_count).where(
+            Domain.id == domain_id, Domain.user_id == user.id
+        )
+    )
+    if url_count is None:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, detail='Domain not found'
+        )
+
+    # Top values per facet, read from the rollup kept by _flush_urls.
+    where = [DomainUrlFacet.domain_id == domain_id, DomainUrlFacet.count > 0]
+    if filters.facet:
+        where.append(DomainUrlFacet.facet == filters.facet)
+
+    ranked = (
+        select(
+            DomainUrlFacet.facet,
+            DomainUrlFacet.value,
+            DomainUrlFacet.count,
+            func.row_number()
+            .over(
+                partition_by=DomainUrlFacet.facet,
+                order_by=(
+                    DomainUrlFacet.count.desc(),
+                    DomainUrlFacet.value,
+                ),
+            )
+            .label('rank'),
+        )
+        .where(*where)
+        .subquery()
+    )
+    rows = await session.execute(
+        select(ranked.c.facet, ranked.c.value, ranked.c.count)
+        .where(ranked.c.rank <= filters.limit)
+        .order_by(ranked.c.facet, ranked.c.rank)
+    )
+
+    facets: dict[str, list[FacetCount]] = {}
+    for facet, value, count in rows.all():
+        facets.setdefault(facet, []).append(
+            FacetCount(value=value, count=count)
+        )
+
+    return DomainFacets(
+        domain_id=domain_id, url_count=url_count, facets=facets
+    )
+
+
+def _domain_page_query(where_clauses: list, filters: FilterDomain):
+    # The job id is read from Domain.latest_job_id, so a page touches only
+    # the domain table.
+    query = (
+        select(Domain)
+        .where(*where_clauses)
+        .order_by(Domain.updated_at.desc(), Domain.id.desc())
+        .limit(filters.limit + 1)
+    )
+    if not filters.cursor:
+        query = query.offset(filters.offset)
+    return query
+
+
+def _search(column, q: str):
+    try:
+        return search_clause(column, q)
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=HTTPStatus.UNPROCESSABLE_ENTITY, detail=str(exc)
+        )
+
+
 @router.get('/', response_model=DomainListResponse, status_code=HTTPStatus.OK)
 async def get_domains(
     session: DbSession, user: CurrentUser, filters: Filter
@@ -155,36 +433,40 @@ async def get_domains(
     where_clauses = [Domain.user_id == user.id]
 
     if filters.q:
-        where_clauses.append(Domain.name.ilike(f'%{filters.q}%'))
+        where_clauses.append(_search(Domain.name, filters.q))
 
     if filters.status:
         where_clauses.append(Domain.status == filters.status)
 
-    base_ids = select(Domain.id).where(*where_clauses).subquery()
-    total = await session.scalar(select(func.count()).select_from(base_ids))
-    total = int(total or 0)
+    total = None
+    if filters.include_total:
+        base_ids = select(Domain.id).where(*where_clauses).subquery()
+        total = await session.scalar(
+            select(func.count()).select_from(base_ids)
+        )
+        total = int(total or 0)
+    elif not filters.q:
+        total = await _status_total(session, user.id, filters.status)
 
-    latest_job_id = (
-        select(DomainRun.job_id)
-        .where(DomainRun.domain_id == Domain.id)
-        .order_by(DomainRun.created_at.desc())
-        .limit(1)
-        .scalar_subquery()
-    )
+    if filters.cursor:
+        try:
+            c_ts, c_id = decode_cursor(filters.cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=HTTPStatus.BAD_REQUEST, detail='Invalid cursor'
+            )
 
-    query = (
-        select(
-            Domain, latest_job_id.label('job_id')
+        # A row comparison seeks on (user_id, updated_at, id).
+        where_clauses.append(
+            tuple_(Domain.updated_at, Domain.id) < (c_ts, c_id)
         )
-        .where(*where_clauses)
-        .order_by(Domain.updated_at.desc())
-        .offset(filters.offset)
-        .limit(filters.limit)
-    )
 
-    result = await session.execute(query)
+    result = await session.scalars(_domain_page_query(where_clauses, filters))
     rows = result.all()
 
+    has_more = len(rows) > filters.limit
+    rows = rows[: filters.limit]
+
     items = [
         DomainListItem(
             id=domain.id,
@@ -192,19 +474,67 @@ async def get_domains(
             status=domain.status,
             created_at=domain.created_at,
             updated_at=domain.updated_at,
-            job_id=job_id,
+            job_id=domain.latest_job_id,
+            subdomain_count=domain.subdomain_count,
+            url_count=domain.url_count,
         )
-        for domain, job_id in rows
+        for domain in rows
     ]
 
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        next_cursor = encode_cursor(last.updated_at, last.id)
+
     return DomainListResponse(
         total=total,
         offset=filters.offset,
         limit=filters.limit,
+        next_cursor=next_cursor,
         items=items,
     )
 
 
+def _url_filter_clauses(domain_id: int, filters: UrlFilters) -> list:
+    where = [DiscoveredURL.domain_id == domain_id]
+
+    if filters.host:
+        where.append(DiscoveredURL.host == filters.host)
+
+    if filters.status_code is not None:
+        where.append(DiscoveredURL.status_code == filters.status_code)
+
+    if filters.q:
+        where.append(_search(DiscoveredURL.url, filters.q))
+
+    if filters.ext:
+        where.append(DiscoveredURL.ext == filters.ext)
+
+    if filters.param:
+        where.append(DiscoveredURL.query_keys.contains([filters.param]))
+
+    # Both @> (all) and && (any) are answered by the GIN index on
+    # (domain_id, tech_names).
+    names = filters.tech_names()
+    if names and filters.tech_match == 'all':
+        where.append(DiscoveredURL.tech_names.contains(names))
+    elif names:
+        where.append(DiscoveredURL.tech_names.overlap(names))
+
+    return where
+
+
+def _url_page_query(where: list, filters: UrlListFilters):
+    # Matches ix_discovered_urls_domain_created_id and its host /
+    # status_code variants, so a page is an index range scan.
+    return (
+        select(DiscoveredURL)
+        .where(*where)
+        .order_by(DiscoveredURL.created_at.desc(), DiscoveredURL.id.desc())
+        .limit(filters.limit + 1)
+    )
+
+
 @router.get(
     '/{domain_id}/urls',
     response_model=UrlListResponse,
@@ -226,20 +556,7 @@ async def list_domain_urls(
             status_code=HTTPStatus.NOT_FOUND, detail='Domain not found'
         )
 
-    where = [DiscoveredURL.domain_id == domain_id]
-
-    if filters.host:
-        where.append(DiscoveredURL.host == filters.host)
-
-    if filters.status_code is not None:
-        where.append(DiscoveredURL.status_code == filters.status_code)
-
-    if filters.q:
-        where.append(DiscoveredURL.url.ilike(f'%{filters.q}%'))
-
-    if filters.ext:
-        pattern = rf'\.{filters.ext}(\?|$)'
-        where.append(DiscoveredURL.url.op('~*')(pattern))
+    where = _url_filter_clauses(domain_id, filters)
 
     if filters.cursor:
         try:
@@ -249,21 +566,13 @@ async def list_domain_urls(
                 status_code=HTTPStatus.BAD_REQUEST, detail='Invalid cursor'
             )
 
+        # Row comparison, so the cursor is a single bound on the
+        # (..., created_at, id) indexes rather than an OR of two ranges.
         where.append(
-            or_(
-                DiscoveredURL.created_at < c_ts,
-                and_(
-                    DiscoveredURL.created_at == c_ts, DiscoveredURL.id < c_id
-                ),
-            )
+            tuple_(DiscoveredURL.created_at, DiscoveredURL.id) < (c_ts, c_id)
         )
 
-    query = (
-        select(DiscoveredURL)
-        .where(*where)
-        .order_by(DiscoveredURL.created_at.desc(), DiscoveredURL.id.desc())
-        .limit(filters.limit + 1)
-    )
+    query = _url_page_query(where, filters)
 
     res = await session.execute(query)
     rows = res.scalars().all()
@@ -281,6 +590,10 @@ async def list_domain_urls(
             status_code=r.status_code,
             title=r.title,
             tech=r.tech,
+            scheme=r.scheme,
+            path=r.path,
+            ext=r.ext,
+            query_keys=r.query_keys,
             created_at=r.created_at,
         )
         for r in rows
@@ -294,6 +607,67 @@ async def list_domain_urls(
     return UrlListResponse(next_cursor=next_cursor, items=items)
 
 
+EXPORT_URL_COLUMNS = (
+    DiscoveredURL.id,
+    DiscoveredURL.url,
+    DiscoveredURL.host,
+    DiscoveredURL.hostname,
+    DiscoveredURL.port,
+    DiscoveredURL.status_code,
+    DiscoveredURL.title,
+    DiscoveredURL.tech,
+    DiscoveredURL.scheme,
+    DiscoveredURL.path,
+    DiscoveredURL.ext,
+    DiscoveredURL.query_keys,
+    DiscoveredURL.created_at,
+)
+
+
+@router.get('/{domain_id}/urls/export', status_code=HTTPStatus.OK)
+async def export_domain_urls(  # noqa: PLR0913, PLR0917
+    domain_id: int,
+    session: DbSession,
+    sessions: SessionFactory,
+    user: CurrentUser,
+    filters: FilterUrlExport,
+    options: Export,
+) -> StreamingResponse:
+    name = await session.scalar(
+        select(Domain.name).where(
+            Domain.id == domain_id, Domain.user_id == user.id
+        )
+    )
+    if name is None:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, detail='Domain not found'
+        )
+
+    # Same filters and order as list_domain_urls, read in one pass.
+    query = (
+        select(*EXPORT_URL_COLUMNS)
+        .where(*_url_filter_clauses(domain_id, filters))
+        .order_by(DiscoveredURL.created_at.desc(), DiscoveredURL.id.desc())
+    )
+
+    settings = get_settings()
+    media_type, headers = export_headers(
+        f'{name}-urls', options.format, options.gzip
+    )
+    return StreamingResponse(
+        export_stream(
+            sessions,
+            query,
+            options.format,
+            compress=options.gzip,
+            batch_size=settings.EXPORT_BATCH_SIZE,
+            backend=settings.NDJSON_BACKEND,
+        ),
+        media_type=media_type,
+        headers=headers,
+    )
+
+
 @router.delete(
     '/{domain_id}', response_model=Message, status_code=HTTPStatus.OK
 )
@@ -311,11 +685,71 @@ async def delete_domain(domain_id: int, user: CurrentUser, session: DbSession):
     return {'message': 'Domain deleted'}
 
 
-def enqueue_subdomain_recon(domain_id: int) -> str:
+def enqueue_subdomain_jobs(
+    domain_ids: list[int], force_refresh: bool = False
+) -> str:
+    # force_refresh skips results shared by other users' scans and the
+    # recon_tool cache.
+    group_size = get_settings().SUBDOMAINS_FANOUT_GROUP_SIZE
+    if group_size <= 0 or len(domain_ids) <= group_size:
+        job = subdomains_queue.enqueue(
+            run_find_subdomains,
+            domain_ids,
+            force_refresh=force_refresh,
+            retry=0,
+            job_timeout=subdomain_job_timeout(len(domain_ids)),
+            result_ttl=86400,
+            ttl=86400,
+        )
+        return job.id
+
+    # One child job per group so the batch spreads across every
+    # worker_subdomains replica; the parent only aggregates their progress
+    # and is the id handed back to the client.
+    parent_id = str(uuid4())
+    children = subdomains_queue.enqueue_many([
+        Queue.prepare_data(
+            run_find_subdomains,
+            args=(group,),
+            kwargs={'run_job_id': parent_id, 'force_refresh': force_refresh},
+            timeout=subdomain_job_timeout(len(group)),
+            result_ttl=86400,
+            ttl=86400,
+        )
+        for group in chunks(domain_ids, group_size)
+    ])
+    subdomains_queue.enqueue(
+        finalize_subdomain_fanout,
+        job_id=parent_id,
+        depends_on=Dependency(jobs=children, allow_failure=True),
+        meta={
+            'domain_ids': domain_ids,
+            'total': len(domain_ids),
+            'child_job_ids': [child.id for child in children],
+        },
+        job_timeout=300,
+        result_ttl=86400,
+        ttl=86400,
+    )
+    return parent_id
+
+
+def enqueue_subdomain_recon(
+    domain_id: int,
+    force_refresh: bool = False,
+    job_id: str | None = None,
+) -> str:
+    # job_id, when given, is both the RQ job id and the DomainRun job id
+    # the worker records the scan under.
     job = subdomains_queue.enqueue(
         run_find_subdomains,
         [domain_id],
+        run_job_id=job_id,
+        force_refresh=force_refresh,
+        job_id=job_id,
         retry=0,
-        job_timeout=1200,
+        job_timeout=subdomain_job_timeout(1),
+        result_ttl=86400,
+        ttl=86400,
     )
     return job.id
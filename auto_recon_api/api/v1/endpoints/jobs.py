@@ -18,9 +18,12 @@ from auto_recon_api.schemas import (
     JobResponse,
     UrlJobMeta,
 )
+from auto_recon_api.workers.subdomains import aggregate_child_meta
 
 router = APIRouter(prefix='/jobs', tags=['jobs'])
 
+STARTED_STATUSES = {'started', 'finished', 'failed'}
+
 redis_conn = Redis(host='redis', port=6379)
 
 
@@ -53,6 +56,17 @@ async def get_job(
     progress = None
 
     if job_type == 'subdomains':
+        child_ids = meta_raw.get('child_job_ids')
+        if child_ids:
+            children = Job.fetch_many(child_ids, connection=redis_conn)
+            meta_raw = aggregate_child_meta(meta_raw, children)
+            child_statuses = {
+                c.get_status(refresh=False) for c in children if c
+            }
+            # The parent stays deferred until every child has ended.
+            if status == 'deferred' and child_statuses & STARTED_STATUSES:
+                status = 'started'
+
         meta = JobMeta.model_validate(meta_raw)
 
         total = int(meta.total or 0)
@@ -123,6 +137,11 @@ async def get_job(
             seen=seen,
             inserted=inserted,
             errors=errors,
+            partial_hosts=int(meta_raw.get('partial_hosts') or 0),
+            skipped_unresolved=int(meta_raw.get('skipped_unresolved') or 0),
+            skipped_unreachable=int(
+                meta_raw.get('skipped_unreachable') or 0
+            ),
             last_error=meta_raw.get('last_error'),
         )
 
@@ -2,16 +2,55 @@ from http import HTTPStatus
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import func, select
+from fastapi.responses import StreamingResponse
+from sqlalchemy import exists, func, select
+from sqlalchemy.orm import aliased
 
-from auto_recon_api.api.deps import CurrentUser, DbSession
-from auto_recon_api.models import Domain, Subdomain
-from auto_recon_api.schemas import FilterPage, SubdomainResponse
+from auto_recon_api.api.deps import CurrentUser, DbSession, SessionFactory
+from auto_recon_api.core.config import get_settings
+from auto_recon_api.core.export import export_headers, export_stream
+from auto_recon_api.core.pagination import decode_id_cursor, encode_id_cursor
+from auto_recon_api.models import Domain, DomainRun, Subdomain, SubdomainRun
+from auto_recon_api.schemas import (
+    ExportOptions,
+    FilterPage,
+    SubdomainDiffFilter,
+    SubdomainDiffResponse,
+    SubdomainResponse,
+)
 
 router = APIRouter(
     prefix='/domains/{domain_id}/subdomains', tags=['subdomains']
 )
 Filter = Annotated[FilterPage, Depends()]
+DiffFilter = Annotated[SubdomainDiffFilter, Depends()]
+Export = Annotated[ExportOptions, Depends()]
+
+EXPORT_COLUMNS = (
+    Subdomain.id,
+    Subdomain.host,
+    Subdomain.ip,
+    Subdomain.is_wildcard,
+    Subdomain.created_at,
+    Subdomain.updated_at,
+    Subdomain.first_seen,
+    Subdomain.last_seen,
+    Subdomain.first_run_id,
+    Subdomain.last_run_id,
+)
+
+
+def _subdomain_page_query(where: list, filters: FilterPage):
+    # Seeks on (domain_id, id); a cursor page costs the same as page 1.
+    query = (
+        select(Subdomain)
+        .where(*where)
+        .order_by(Subdomain.id.desc())
+        .limit(filters.limit + 1)
+    )
+    if not filters.cursor:
+        query = query.offset(filters.offset)
+    return query
 
 
 @router.get('/', response_model=SubdomainResponse, status_code=HTTPStatus.OK)
@@ -20,6 +59,144 @@ async def get_subdomains(
     session: DbSession,
     user: CurrentUser,
     filters: Filter,
+):
+    # subdomain_count is maintained at ingest; an exact count(*) is only
+    # run when asked for.
+    total = await session.scalar(
+        select(Domain.subdomain_count).where(
+            Domain.id == domain_id, Domain.user_id == user.id
+        )
+    )
+    if total is None:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, detail='Domain not found'
+        )
+
+    if filters.include_total:
+        total = await session.scalar(
+            select(func.count(Subdomain.id)).where(
+                Subdomain.domain_id == domain_id
+            )
+        )
+        total = int(total or 0)
+
+    where = [Subdomain.domain_id == domain_id]
+    if filters.cursor:
+        try:
+            where.append(Subdomain.id < decode_id_cursor(filters.cursor))
+        except ValueError:
+            raise HTTPException(
+                status_code=HTTPStatus.BAD_REQUEST, detail='Invalid cursor'
+            )
+
+    result = await session.execute(_subdomain_page_query(where, filters))
+    subdomains = result.scalars().all()
+
+    has_more = len(subdomains) > filters.limit
+    subdomains = subdomains[: filters.limit]
+
+    next_cursor = None
+    if has_more and subdomains:
+        next_cursor = encode_id_cursor(subdomains[-1].id)
+
+    return SubdomainResponse(
+        total=total,
+        offset=filters.offset,
+        limit=filters.limit,
+        next_cursor=next_cursor,
+        subdomains=subdomains,
+    )
+
+
+async def _latest_done_run(
+    session, domain_id: int, before: int | None = None
+) -> int | None:
+    # Partial runs (a tool timed out) are skipped: the hosts that tool
+    # would have reported would all show up as removed.
+    stmt = select(func.max(DomainRun.id)).where(
+        DomainRun.domain_id == domain_id,
+        DomainRun.status == 'done',
+        DomainRun.error_message.is_(None),
+    )
+    if before is not None:
+        stmt = stmt.where(DomainRun.id < before)
+    return await session.scalar(stmt)
+
+
+async def _resolve_diff_runs(
+    session, domain_id: int, filters: SubdomainDiffFilter
+) -> tuple[int, int]:
+    to_run = filters.to_run
+    if to_run is None:
+        to_run = await _latest_done_run(session, domain_id)
+
+    from_run = filters.from_run
+    if from_run is None and to_run is not None:
+        from_run = await _latest_done_run(session, domain_id, before=to_run)
+
+    if from_run is None or to_run is None:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND,
+            detail='Not enough runs to compare',
+        )
+
+    statuses = dict(
+        (
+            await session.execute(
+                select(DomainRun.id, DomainRun.status).where(
+                    DomainRun.domain_id == domain_id,
+                    DomainRun.id.in_([from_run, to_run]),
+                )
+            )
+        ).all()
+    )
+    if len(statuses) != len({from_run, to_run}):
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, detail='Run not found'
+        )
+    # A run that did not finish reported only some of its hosts.
+    if any(status != 'done' for status in statuses.values()):
+        raise HTTPException(
+            status_code=HTTPStatus.CONFLICT,
+            detail='Only finished runs can be compared',
+        )
+    if from_run >= to_run:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail='from_run must be older than to_run',
+        )
+
+    return from_run, to_run
+
+
+def _only_in_run(domain_id: int, run_id: int, other_run_id: int):
+    # Hosts reported by run_id and not by other_run_id.
+    other = aliased(SubdomainRun)
+    return (
+        select(Subdomain)
+        .join(SubdomainRun, SubdomainRun.subdomain_id == Subdomain.id)
+        .where(
+            Subdomain.domain_id == domain_id,
+            SubdomainRun.run_id == run_id,
+            ~exists().where(
+                other.subdomain_id == Subdomain.id,
+                other.run_id == other_run_id,
+            ),
+        )
+        .order_by(Subdomain.id)
+    )
+
+
+@router.get(
+    '/diff',
+    response_model=SubdomainDiffResponse,
+    status_code=HTTPStatus.OK,
+)
+async def diff_subdomains(
+    domain_id: int,
+    session: DbSession,
+    user: CurrentUser,
+    filters: DiffFilter,
 ):
     domain_exists = await session.scalar(
         select(Domain.id).where(
@@ -31,26 +208,63 @@ async def get_subdomains(
             status_code=HTTPStatus.NOT_FOUND, detail='Domain not found'
         )
 
-    base_ids = (
-        select(Subdomain.id)
-        .where(Subdomain.domain_id == domain_id)
-        .subquery()
+    from_run, to_run = await _resolve_diff_runs(session, domain_id, filters)
+
+    # Both sides read subdomain_runs by primary key (run_id, ...), so a
+    # host that skipped runs or came back is compared by the two runs
+    # alone.
+    added = await session.scalars(
+        _only_in_run(domain_id, to_run, from_run).limit(filters.limit)
+    )
+    removed = await session.scalars(
+        _only_in_run(domain_id, from_run, to_run).limit(filters.limit)
     )
-    total = await session.scalar(select(func.count()).select_from(base_ids))
-    total = int(total or 0)
 
-    result = await session.execute(
-        select(Subdomain)
+    return SubdomainDiffResponse(
+        from_run_id=from_run,
+        to_run_id=to_run,
+        added=added.all(),
+        removed=removed.all(),
+    )
+
+
+@router.get('/export', status_code=HTTPStatus.OK)
+async def export_subdomains(
+    domain_id: int,
+    session: DbSession,
+    sessions: SessionFactory,
+    user: CurrentUser,
+    options: Export,
+) -> StreamingResponse:
+    name = await session.scalar(
+        select(Domain.name).where(
+            Domain.id == domain_id, Domain.user_id == user.id
+        )
+    )
+    if name is None:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, detail='Domain not found'
+        )
+
+    query = (
+        select(*EXPORT_COLUMNS)
         .where(Subdomain.domain_id == domain_id)
         .order_by(Subdomain.id.desc())
-        .offset(filters.offset)
-        .limit(filters.limit)
     )
-    subdomains = result.scalars().all()
 
-    return SubdomainResponse(
-        total=total,
-        offset=filters.offset,
-        limit=filters.limit,
-        subdomains=subdomains,
+    settings = get_settings()
+    media_type, headers = export_headers(
+        f'{name}-subdomains', options.format, options.gzip
+    )
+    return StreamingResponse(
+        export_stream(
+            sessions,
+            query,
+            options.format,
+            compress=options.gzip,
+            batch_size=settings.EXPORT_BATCH_SIZE,
+            backend=settings.NDJSON_BACKEND,
+        ),
+        media_type=media_type,
+        headers=headers,
     )
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from functools import lru_cache
-from typing import List
+from typing import List, Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -21,12 +21,53 @@ class Settings(BaseSettings):
     SUBDOMAIN_URL: str
     INTERNAL_TOKEN: str
     API_TOOLS_URL: str
+    REDIS_URL: str = 'redis://redis:6379/0'
+
+    RECON_TOOL_URLS: str = ''
+    RECON_TOOL_MAX_FAILURES: int = 3
+    RECON_TOOL_EJECT_SECONDS: float = 30.0
+    RECON_TOOL_LOAD_SLACK: int = 2
+
+    RECON_RETRY_ATTEMPTS: int = 3
+    RECON_RETRY_BASE_DELAY: float = 2.0
+    RECON_RETRY_MAX_DELAY: float = 30.0
+    RECON_BREAKER_THRESHOLD: int = 5
+    RECON_BREAKER_WINDOW: int = 60
+    RECON_BREAKER_COOLDOWN: float = 30.0
+    RECON_BREAKER_MAX_WAIT: float = 600.0
+
+    NDJSON_BACKEND: Optional[str] = None
+    TOOLS_STREAM_ENCODING: str = 'gzip'
+    TOOLS_USE_JOBS: bool = False
+    TOOLS_JOB_MAX_RECONNECTS: int = 5
+    TOOLS_JOB_BACKOFF: float = 1.0
+    TOOLS_JOB_READ_TIMEOUT: float = 120.0
+
+    SUBDOMAINS_FANOUT_GROUP_SIZE: int = 0
+
+    URL_LIVENESS_CHECK: bool = False
+    LIVENESS_PORTS: List[int] = [80, 443, 8080, 8443]
+    LIVENESS_TIMEOUT: float = 3.0
+    LIVENESS_CONCURRENCY: int = 100
+    LIVENESS_TTL: int = 3600
+
+    EXPORT_BATCH_SIZE: int = 5000
+    SNAPSHOT_DIR: str = 'snapshots'
+    SNAPSHOT_BATCH_SIZE: int = 50_000
+
+    RECON_SHARE_TTL: int = 6 * 3600
+    RECON_SHARE_LOCK_TIMEOUT: int = 300
 
     CORS_ORIGINS: str = 'http://localhost:3000,http://localhost:5173'
 
     def cors_origins_list(self) -> List[str]:
         return [o.strip() for o in self.CORS_ORIGINS.split(',') if o.strip()]
 
+    def recon_tool_urls_list(self) -> List[str]:
+        return [
+            u.strip() for u in self.RECON_TOOL_URLS.split(',') if u.strip()
+        ]
+
 
 @lru_cache(maxsize=1)
 def get_settings() -> Settings:
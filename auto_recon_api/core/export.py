@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterator, Optional, Sequence
+
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from auto_recon_api.core.ndjson import get_backend
+
+MEDIA_TYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+GZIP_MEDIA_TYPE = 'application/gzip'
+GZIP_LEVEL = 6
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+async def iter_batches(
+    session_factory: async_sessionmaker[AsyncSession],
+    query: Select,
+    batch_size: int,
+) -> AsyncIterator[Sequence[Any]]:
+    # Server-side cursor: only one batch of rows is held at a time. The
+    # session is opened here, not taken from the request, because the
+    # body is sent after request dependencies have been closed.
+    async with session_factory() as session:
+        result = await session.stream(
+            query.execution_options(yield_per=batch_size)
+        )
+        async for partition in result.partitions():
+            yield partition
+
+
+async def encode_ndjson(
+    batches: AsyncIterator[Sequence[Any]],
+    columns: Sequence[str],
+    backend: Optional[str] = None,
+) -> AsyncIterator[bytes]:
+    encode = get_backend(backend).dumps
+    async for rows in batches:
+        lines = [
+            encode({
+                name: _json_value(value) for name, value in zip(columns, row)
+            })
+            for row in rows
+        ]
+        lines.append(b'')
+        yield b'\n'.join(lines)
+
+
+async def encode_csv(
+    batches: AsyncIterator[Sequence[Any]], columns: Sequence[str]
+) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+
+    async for rows in batches:
+        writer.writerows([_csv_value(v) for v in row] for row in rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+async def gzip_chunks(
+    chunks: AsyncIterator[bytes], level: int = GZIP_LEVEL
+) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(  # noqa: PLR0913
+    session_factory: async_sessionmaker[AsyncSession],
+    query: Select,
+    fmt: str,
+    *,
+    compress: bool = False,
+    batch_size: int = 5000,
+    backend: Optional[str] = None,
+) -> AsyncIterator[bytes]:
+    columns = [c.name for c in query.selected_columns]
+    batches = iter_batches(session_factory, query, batch_size)
+
+    if fmt == 'csv':
+        body = encode_csv(batches, columns)
+    else:
+        body = encode_ndjson(batches, columns, backend)
+
+    if compress:
+        body = gzip_chunks(body)
+    return body
+
+
+def export_headers(name: str, fmt: str, compress: bool) -> tuple[str, dict]:
+    filename = f'{name}.{fmt}'
+    media_type = MEDIA_TYPES[fmt]
+    if compress:
+        filename += '.gz'
+        media_type = GZIP_MEDIA_TYPE
+    return media_type, {
+        'Content-Disposition': f'attachment; filename="{filename}"'
+    }
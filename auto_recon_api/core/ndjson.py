@@ -0,0 +1,104 @@
+# Shared by auto_recon_api/core/ndjson.py and api_tools/ndjson.py; keep
+# both copies byte-for-byte identical. api_tools is built into its own
+# image and cannot import auto_recon_api; tests/test_core_ndjson.py
+# fails if they drift.
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - optional speedup
+    msgspec = None
+
+PREFERENCE = ('orjson', 'msgspec', 'json')
+
+
+@dataclass(frozen=True)
+class JsonBackend:
+    name: str
+    dumps: Callable[[Any], bytes]
+    loads: Callable[[bytes | str], Any]
+
+
+def _json_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+def _available() -> Dict[str, JsonBackend]:
+    backends = {'json': JsonBackend('json', _json_dumps, json.loads)}
+
+    if orjson is not None:
+        backends['orjson'] = JsonBackend('orjson', orjson.dumps, orjson.loads)
+
+    if msgspec is not None:
+        encoder = msgspec.json.Encoder()
+        decoder = msgspec.json.Decoder()
+
+        def _msgspec_loads(data: bytes | str) -> Any:
+            try:
+                return decoder.decode(data)
+            except msgspec.DecodeError as exc:
+                raise ValueError(str(exc)) from exc
+
+        backends['msgspec'] = JsonBackend(
+            'msgspec', encoder.encode, _msgspec_loads
+        )
+
+    return backends
+
+
+def available_backends() -> list[str]:
+    backends = _available()
+    return [name for name in PREFERENCE if name in backends]
+
+
+@lru_cache(maxsize=None)
+def get_backend(name: Optional[str] = None) -> JsonBackend:
+    backends = _available()
+    if name:
+        if name not in backends:
+            raise RuntimeError(f'JSON backend {name!r} is not installed')
+        return backends[name]
+
+    for candidate in PREFERENCE:
+        if candidate in backends:
+            return backends[candidate]
+
+    return backends['json']
+
+
+def dumps(obj: Any, backend: Optional[str] = None) -> bytes:
+    return get_backend(backend).dumps(obj)
+
+
+def loads(data: bytes | str, backend: Optional[str] = None) -> Any:
+    return get_backend(backend).loads(data)
+
+
+def iter_ndjson(
+    items: Iterable[dict],
+    batch_size: int = 1,
+    backend: Optional[str] = None,
+) -> Iterator[bytes]:
+    encode = get_backend(backend).dumps
+    batch: list[bytes] = []
+
+    for item in items:
+        batch.append(encode(item))
+        if len(batch) >= batch_size:
+            batch.append(b'')
+            yield b'\n'.join(batch)
+            batch = []
+
+    if batch:
+        batch.append(b'')
+        yield b'\n'.join(batch)
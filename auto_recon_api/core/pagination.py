@@ -15,3 +15,14 @@ def decode_cursor(cursor: str) -> tuple[datetime, int]:
     if ts.tzinfo is not None:
         ts = ts.replace(tzinfo=None)
     return ts, int(id_str)
+
+
+def encode_id_cursor(_id: int) -> str:
+    return str(_id)
+
+
+def decode_id_cursor(cursor: str) -> int:
+    _id = int(cursor)
+    if _id <= 0:
+        raise ValueError('cursor id must be positive')
+    return _id
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from http import HTTPStatus
+from typing import Any, AsyncIterator, Callable, List, Optional
+
+import httpx
+
+from auto_recon_api.core.config import get_settings
+from auto_recon_api.core.ndjson import loads
+
+log = logging.getLogger(__name__)
+
+
+class ReconToolJobError(RuntimeError):
+    pass
+
+
+@dataclass
+class ToolEndpoint:
+    url: str
+    outstanding: int = 0
+    failures: int = 0
+    ejected_until: float = 0.0
+
+
+def _score(url: str, key: str) -> int:
+    digest = hashlib.blake2b(f'{url}|{key}'.encode(), digest_size=8)
+    return int.from_bytes(digest.digest(), 'big')
+
+
+def _is_endpoint_failure(exc: BaseException) -> bool:
+    if isinstance(exc, httpx.TransportError):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= HTTPStatus.INTERNAL_SERVER_ERROR
+    return False
+
+
+class ToolRouter:
+    # Client-side routing across recon_tool instances. Each key (a domain
+    # name) prefers the same endpoint through rendezvous hashing, so the
+    # tool caches on that instance stay warm; it only moves to the next
+    # endpoint in its ranking when the preferred one has more than `slack`
+    # requests in flight above the least loaded one. Endpoints that fail
+    # `max_failures` times in a row are ejected for `eject_seconds`.
+
+    def __init__(  # noqa: PLR0913
+        self,
+        urls: List[str],
+        *,
+        max_failures: int = 3,
+        eject_seconds: float = 30.0,
+        slack: int = 2,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if not urls:
+            raise ValueError('ToolRouter needs at least one endpoint')
+        self.endpoints = [ToolEndpoint(url.rstrip('/')) for url in urls]
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self.slack = slack
+        self._clock = clock
+
+    def healthy(self) -> List[ToolEndpoint]:
+        now = self._clock()
+        return [ep for ep in self.endpoints if ep.ejected_until <= now]
+
+    def pick(self, key: Optional[str] = None) -> ToolEndpoint:
+        # With every endpoint ejected, keep trying all of them rather than
+        # failing the scan outright.
+        candidates = self.healthy() or self.endpoints
+        least = min(ep.outstanding for ep in candidates)
+
+        if key is None:
+            return min(candidates, key=lambda ep: ep.outstanding)
+
+        ranked = sorted(
+            candidates, key=lambda ep: _score(ep.url, key), reverse=True
+        )
+        for ep in ranked:
+            if ep.outstanding <= least + self.slack:
+                return ep
+        return ranked[0]
+
+    @staticmethod
+    def mark_success(endpoint: ToolEndpoint) -> None:
+        endpoint.failures = 0
+        endpoint.ejected_until = 0.0
+
+    def mark_failure(self, endpoint: ToolEndpoint) -> None:
+        endpoint.failures += 1
+        if endpoint.failures >= self.max_failures:
+            endpoint.ejected_until = self._clock() + self.eject_seconds
+            log.warning(
+                f'Ejecting recon_tool endpoint {endpoint.url} for '
+                f'{self.eject_seconds}s after {endpoint.failures} failures'
+            )
+
+    @asynccontextmanager
+    async def use(self, key: Optional[str] = None) -> AsyncIterator[str]:
+        endpoint = self.pick(key)
+        endpoint.outstanding += 1
+        try:
+            yield endpoint.url
+        except Exception as exc:
+            if _is_endpoint_failure(exc):
+                self.mark_failure(endpoint)
+            else:
+                self.mark_success(endpoint)
+            raise
+        else:
+            self.mark_success(endpoint)
+        finally:
+            endpoint.outstanding -= 1
+
+
+@lru_cache(maxsize=1)
+def get_tool_router() -> Optional[ToolRouter]:
+    settings = get_settings()
+    urls = settings.recon_tool_urls_list()
+    if not urls:
+        return None
+    return ToolRouter(
+        urls,
+        max_failures=settings.RECON_TOOL_MAX_FAILURES,
+        eject_seconds=settings.RECON_TOOL_EJECT_SECONDS,
+        slack=settings.RECON_TOOL_LOAD_SLACK,
+    )
+
+
+async def submit_job(
+    client: httpx.AsyncClient,
+    base_url: str,
+    payload: dict,
+    *,
+    headers: Optional[dict] = None,
+) -> str:
+    response = await client.post(
+        f'{base_url}/jobs', json=payload, headers=headers
+    )
+    response.raise_for_status()
+    return response.json()['id']
+
+
+async def iter_job_records(  # noqa: PLR0913, PLR0917
+    client: httpx.AsyncClient,
+    base_url: str,
+    payload: dict,
+    *,
+    headers: Optional[dict] = None,
+    max_reconnects: int = 5,
+    backoff: float = 1.0,
+    backend: Optional[str] = None,
+) -> AsyncIterator[dict[str, Any]]:
+    # Submits a recon_tool job and reads its NDJSON output. The job keeps
+    # running on recon_tool if the connection drops, so a reconnect resumes
+    # from the last record seen instead of recomputing everything.
+    job_id = await submit_job(client, base_url, payload, headers=headers)
+    offset = 0
+    failures = 0
+
+    while True:
+        try:
+            async with client.stream(
+                'GET',
+                f'{base_url}/jobs/{job_id}/stream',
+                headers=headers,
+                params={'offset': offset},
+            ) as r:
+                r.raise_for_status()
+
+                async for line in r.aiter_lines():
+                    if not line.strip():
+                        continue
+
+                    obj = loads(line, backend)
+                    if 'job_error' in obj:
+                        raise ReconToolJobError(obj['job_error'])
+
+                    offset += 1
+                    failures = 0
+                    yield obj
+            return
+        except httpx.TransportError as exc:
+            failures += 1
+            if failures > max_reconnects:
+                raise
+
+            delay = backoff * 2 ** (failures - 1)
+            log.warning(
+                f'recon_tool job {job_id} stream dropped at offset '
+                f'{offset} ({type(exc).__name__}), retrying in {delay}s'
+            )
+            await asyncio.sleep(delay)
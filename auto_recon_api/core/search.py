@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from sqlalchemy import ColumnElement
+from sqlalchemy.orm import InstrumentedAttribute
+
+# pg_trgm extracts no trigram from a shorter pattern, so the index on the
+# column could not answer the ILIKE and the query would scan the rows.
+MIN_QUERY_LENGTH = 3
+
+
+def escape_like(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_clause(
+    column: InstrumentedAttribute, q: str
+) -> ColumnElement[bool]:
+    # Plain ILIKE on the raw column (no lower()), so the planner can use
+    # the gin_trgm_ops index on it.
+    if len(q) < MIN_QUERY_LENGTH:
+        raise ValueError(f'q must have at least {MIN_QUERY_LENGTH} characters')
+    return column.ilike(f'%{escape_like(q)}%', escape='\\')
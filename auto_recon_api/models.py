@@ -2,6 +2,9 @@ from datetime import datetime, timezone
 from typing import List, Optional
 
 from sqlalchemy import (
+    DDL,
+    BigInteger,
+    Boolean,
     DateTime,
     ForeignKey,
     Index,
@@ -9,13 +12,26 @@ from sqlalchemy import (
     String,
     Text,
     UniqueConstraint,
+    event,
+    false,
     func,
 )
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.orm import Mapped, mapped_column, registry, relationship
 
 table_registry = registry()
 
+# Trigram search indexes need pg_trgm, and btree_gin lets them lead with
+# the owning user_id / domain_id column.
+for _extension in ('pg_trgm', 'btree_gin'):
+    event.listen(
+        table_registry.metadata,
+        'before_create',
+        DDL(f'CREATE EXTENSION IF NOT EXISTS {_extension}').execute_if(
+            dialect='postgresql'
+        ),
+    )
+
 
 def _utcnow() -> datetime:
     return datetime.now(timezone.utc)
@@ -52,6 +68,15 @@ class Domain:
     __tablename__ = 'domain'
     __table_args__ = (
         UniqueConstraint('user_id', 'name', name='uq_user_domain'),
+        # Keyset order of get_domains.
+        Index('ix_domain_user_updated_id', 'user_id', 'updated_at', 'id'),
+        Index(
+            'ix_domain_user_name_trgm',
+            'user_id',
+            'name',
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'},
+        ),
     )
 
     id: Mapped[int] = mapped_column(init=False, primary_key=True)
@@ -93,12 +118,109 @@ class Domain:
 
     status: Mapped[str] = mapped_column(default='pending')
 
+    # Job id of the newest DomainRun, set wherever a run is created so
+    # listings do not have to look it up in domain_runs.
+    latest_job_id: Mapped[Optional[str]] = mapped_column(
+        String(64), default=None
+    )
+
+    # Kept current by the worker ingest paths in the same transaction as
+    # the rows they count.
+    subdomain_count: Mapped[int] = mapped_column(
+        Integer, default=0, server_default='0'
+    )
+    url_count: Mapped[int] = mapped_column(
+        Integer, default=0, server_default='0'
+    )
+
+
+@table_registry.mapped_as_dataclass
+class DomainStatusCount:
+    # Domains per user and status, maintained by triggers on `domain` so
+    # every status change (API, workers, cascades) is counted.
+    __tablename__ = 'domain_status_counts'
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey('users.id', ondelete='CASCADE'), primary_key=True
+    )
+    status: Mapped[str] = mapped_column(String(16), primary_key=True)
+    count: Mapped[int] = mapped_column(
+        Integer, default=0, server_default='0'
+    )
+
+
+DOMAIN_STATUS_COUNTS_DDL = (
+    """
+    CREATE OR REPLACE FUNCTION domain_status_counts_sync()
+    RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE domain_status_counts SET count = count - 1
+            WHERE user_id = OLD.user_id AND status = OLD.status;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO domain_status_counts (user_id, status, count)
+            VALUES (NEW.user_id, NEW.status, 1)
+            ON CONFLICT (user_id, status)
+            DO UPDATE SET count = domain_status_counts.count + 1;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER trg_domain_status_counts
+    AFTER INSERT OR DELETE ON domain
+    FOR EACH ROW EXECUTE FUNCTION domain_status_counts_sync()
+    """,
+    """
+    CREATE TRIGGER trg_domain_status_counts_update
+    AFTER UPDATE OF status, user_id ON domain
+    FOR EACH ROW
+    WHEN (
+        OLD.status IS DISTINCT FROM NEW.status
+        OR OLD.user_id IS DISTINCT FROM NEW.user_id
+    )
+    EXECUTE FUNCTION domain_status_counts_sync()
+    """,
+)
+
+for _statement in DOMAIN_STATUS_COUNTS_DDL:
+    event.listen(
+        Domain.__table__,
+        'after_create',
+        DDL(_statement).execute_if(dialect='postgresql'),
+    )
+
+
+URL_FACETS = ('status_code', 'host', 'port', 'tech', 'ext')
+
+
+@table_registry.mapped_as_dataclass
+class DomainUrlFacet:
+    # Discovered URLs per domain and facet value (see URL_FACETS), bumped
+    # by tasks.urls._flush_urls in the same transaction as the insert.
+    __tablename__ = 'domain_url_facets'
+
+    domain_id: Mapped[int] = mapped_column(
+        ForeignKey('domain.id', ondelete='CASCADE'), primary_key=True
+    )
+    facet: Mapped[str] = mapped_column(String(16), primary_key=True)
+    value: Mapped[str] = mapped_column(Text, primary_key=True)
+    count: Mapped[int] = mapped_column(
+        BigInteger, default=0, server_default='0'
+    )
+
 
 @table_registry.mapped_as_dataclass
 class Subdomain:
     __tablename__ = 'subdomain'
     __table_args__ = (
         UniqueConstraint('host', 'domain_id', name='uq_host_per_domain'),
+        Index('ix_subdomain_domain_first_run', 'domain_id', 'first_run_id'),
+        Index('ix_subdomain_domain_last_run', 'domain_id', 'last_run_id'),
+        # Keyset order of get_subdomains.
+        Index('ix_subdomain_domain_id', 'domain_id', 'id'),
     )
 
     id: Mapped[int] = mapped_column(primary_key=True, init=False)
@@ -119,10 +241,36 @@ class Subdomain:
         'Domain', back_populates='subdomains', init=False
     )
 
+    is_wildcard: Mapped[bool] = mapped_column(
+        Boolean, default=False, server_default=false()
+    )
+
+    # first_* is set on insert, last_* moves forward on every rescan.
+    # Which runs actually reported the host is kept in subdomain_runs.
+    first_seen: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        init=False,
+    )
+    last_seen: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        init=False,
+    )
+    first_run_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey('domain_runs.id', ondelete='SET NULL'), default=None
+    )
+    last_run_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey('domain_runs.id', ondelete='SET NULL'), default=None
+    )
+
 
 @table_registry.mapped_as_dataclass
 class DomainRun:
     __tablename__ = 'domain_runs'
+    __table_args__ = (
+        Index('ix_domain_runs_domain_created', 'domain_id', 'created_at'),
+    )
 
     id: Mapped[int] = mapped_column(
         Integer, primary_key=True, autoincrement=True, init=False
@@ -168,12 +316,75 @@ class DomainRun:
     )
 
 
+@table_registry.mapped_as_dataclass
+class SubdomainRun:
+    # One row per host reported by a run. A host missing from a run has
+    # no row for it, so gaps and reappearances are kept.
+    __tablename__ = 'subdomain_runs'
+    __table_args__ = (
+        Index('ix_subdomain_runs_subdomain', 'subdomain_id'),
+    )
+
+    run_id: Mapped[int] = mapped_column(
+        ForeignKey('domain_runs.id', ondelete='CASCADE'), primary_key=True
+    )
+    subdomain_id: Mapped[int] = mapped_column(
+        ForeignKey('subdomain.id', ondelete='CASCADE'), primary_key=True
+    )
+
+
 @table_registry.mapped_as_dataclass
 class DiscoveredURL:
     __tablename__ = 'discovered_urls'
     __table_args__ = (
         UniqueConstraint('domain_id', 'url_hash', name='uq_domain_urlhash'),
         Index('ix_discovered_urls_domain_host', 'domain_id', 'host'),
+        # Keyset order of list_domain_urls, alone and behind its equality
+        # filters.
+        Index(
+            'ix_discovered_urls_domain_created_id',
+            'domain_id',
+            'created_at',
+            'id',
+        ),
+        Index(
+            'ix_discovered_urls_domain_host_created_id',
+            'domain_id',
+            'host',
+            'created_at',
+            'id',
+        ),
+        Index(
+            'ix_discovered_urls_domain_status_created_id',
+            'domain_id',
+            'status_code',
+            'created_at',
+            'id',
+        ),
+        Index(
+            'ix_discovered_urls_domain_search_trgm',
+            'domain_id',
+            'url',
+            'host',
+            postgresql_using='gin',
+            postgresql_ops={
+                'url': 'gin_trgm_ops',
+                'host': 'gin_trgm_ops',
+            },
+        ),
+        Index('ix_discovered_urls_domain_ext', 'domain_id', 'ext'),
+        Index(
+            'ix_discovered_urls_domain_query_keys',
+            'domain_id',
+            'query_keys',
+            postgresql_using='gin',
+        ),
+        Index(
+            'ix_discovered_urls_domain_tech_names',
+            'domain_id',
+            'tech_names',
+            postgresql_using='gin',
+        ),
     )
 
     id: Mapped[int] = mapped_column(
@@ -199,6 +410,18 @@ class DiscoveredURL:
     title: Mapped[Optional[str]] = mapped_column(Text, default=None)
     tech: Mapped[Optional[list]] = mapped_column(JSONB, default=None)
 
+    # Parsed from url at ingest (tasks.urls.url_fields).
+    scheme: Mapped[Optional[str]] = mapped_column(String(16), default=None)
+    path: Mapped[Optional[str]] = mapped_column(Text, default=None)
+    ext: Mapped[Optional[str]] = mapped_column(String(16), default=None)
+    query_keys: Mapped[Optional[list]] = mapped_column(
+        ARRAY(Text), default=None
+    )
+    # Lowercased, version-less names from tech (tasks.urls.tech_names).
+    tech_names: Mapped[Optional[list]] = mapped_column(
+        ARRAY(Text), default=None
+    )
+
     created_at: Mapped[datetime] = mapped_column(
         server_default=func.now(), init=False
     )
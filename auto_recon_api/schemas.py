@@ -50,15 +50,51 @@ class DomainListItem(BaseModel):
     created_at: datetime
     updated_at: datetime
     job_id: Optional[str] = None
+    subdomain_count: int = 0
+    url_count: int = 0
 
 
 class DomainListResponse(BaseModel):
-    total: int
+    total: Optional[int] = None
     offset: int
     limit: int
+    next_cursor: Optional[str] = None
     items: List[DomainListItem] = Field(default_factory=list)
 
 
+class DomainSummary(BaseModel):
+    id: int
+    name: str
+    status: str
+    subdomain_count: int = 0
+    url_count: int = 0
+    updated_at: datetime
+
+
+class DomainStatusSummary(BaseModel):
+    total: int = 0
+    by_status: Dict[str, int] = Field(default_factory=dict)
+
+
+UrlFacet = Literal['status_code', 'host', 'port', 'tech', 'ext']
+
+
+class FacetFilter(BaseModel):
+    facet: Optional[UrlFacet] = None
+    limit: int = Field(default=10, ge=1, le=100)
+
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+
+class DomainFacets(BaseModel):
+    domain_id: int
+    url_count: int = 0
+    facets: Dict[str, List[FacetCount]] = Field(default_factory=dict)
+
+
 class DomainResponseCreated(BaseModel):
     job_id: Optional[str] = None
     added: List[DomainListItem]
@@ -76,20 +112,49 @@ class SubdomainSchema(BaseModel):
     domain_id: int
     host: str
     ip: str
+    is_wildcard: bool = False
     created_at: datetime
     updated_at: datetime
+    first_seen: Optional[datetime] = None
+    last_seen: Optional[datetime] = None
+    first_run_id: Optional[int] = None
+    last_run_id: Optional[int] = None
 
 
 class SubdomainResponse(BaseModel):
-    total: int
+    total: Optional[int] = None
     offset: int
     limit: int
+    next_cursor: Optional[str] = None
     subdomains: List[SubdomainSchema] = Field(default_factory=list)
 
 
+class SubdomainDiffFilter(BaseModel):
+    from_run: Optional[int] = None
+    to_run: Optional[int] = None
+    limit: int = Field(default=1000, ge=1, le=10000)
+
+
+class SubdomainDiffResponse(BaseModel):
+    from_run_id: int
+    to_run_id: int
+    added: List[SubdomainSchema] = Field(default_factory=list)
+    removed: List[SubdomainSchema] = Field(default_factory=list)
+
+
 class FilterPage(BaseModel):
     offset: int = Field(ge=0, default=0)
     limit: int = Field(default=10, ge=1, le=200)
+    # With a cursor the offset is ignored; counting the whole set is
+    # opt-in because it costs as much as reading it.
+    cursor: Optional[str] = None
+    include_total: bool = False
+
+
+class UrlScanOptions(BaseModel):
+    force_refresh: bool = False
+    include_wildcards: bool = False
+    check_liveness: Optional[bool] = None
 
 
 class FilterDomain(FilterPage):
@@ -118,6 +183,9 @@ class UrlJobMeta(BaseModel):
     seen: int = 0
     inserted: int = 0
     errors: int = 0
+    partial_hosts: int = 0
+    skipped_unresolved: int = 0
+    skipped_unreachable: int = 0
     last_error: Optional[str] = None
 
 
@@ -129,6 +197,8 @@ class JobMeta(BaseModel):
 
     done_domain_ids: List[int] = Field(default_factory=list)
     failed_domain_ids: List[int] = Field(default_factory=list)
+    partial_domain_ids: List[int] = Field(default_factory=list)
+    child_job_ids: List[str] = Field(default_factory=list)
 
     current_domain_id: Optional[int] = None
     current_domain: Optional[str] = None
@@ -192,6 +262,10 @@ class UrlItem(BaseModel):
     status_code: Optional[int] = None
     title: Optional[str] = None
     tech: Optional[list] = None
+    scheme: Optional[str] = None
+    path: Optional[str] = None
+    ext: Optional[str] = None
+    query_keys: Optional[List[str]] = None
     created_at: datetime
 
 
@@ -200,14 +274,16 @@ class UrlListResponse(BaseModel):
     items: List[UrlItem]
 
 
-class UrlListFilters(BaseModel):
-    cursor: Optional[str] = None
-    limit: int = Field(default=50, ge=1, le=200)
-
+class UrlFilters(BaseModel):
     q: Optional[str] = None
     host: Optional[str] = None
     status_code: Optional[int] = None
     ext: Optional[str] = None
+    param: Optional[str] = None
+    # Comma separated names, compared lowercased and without a version
+    # ("WordPress:6.4.2" is "wordpress"), as stored in `tech_names`.
+    tech: Optional[str] = None
+    tech_match: Literal['any', 'all'] = 'any'
 
     @field_validator('q')
     @classmethod
@@ -226,6 +302,14 @@ class UrlListFilters(BaseModel):
         v = v.lstrip('.')
         return v or None
 
+    @field_validator('param')
+    @classmethod
+    def _norm_param(cls, v: Optional[str]) -> Optional[str]:
+        if v is None:
+            return None
+        v = v.strip().lower()
+        return v or None
+
     @field_validator('host')
     @classmethod
     def _strip_host(cls, v: Optional[str]) -> Optional[str]:
@@ -233,3 +317,30 @@ class UrlListFilters(BaseModel):
             return None
         v = v.strip().lower()
         return v or None
+
+    @field_validator('tech')
+    @classmethod
+    def _norm_tech(cls, v: Optional[str]) -> Optional[str]:
+        if v is None:
+            return None
+        names = dict.fromkeys(
+            t.split(':', 1)[0].strip().lower() for t in v.split(',')
+        )
+        return ','.join(t for t in names if t) or None
+
+    def tech_names(self) -> list[str]:
+        return self.tech.split(',') if self.tech else []
+
+
+class UrlListFilters(UrlFilters):
+    cursor: Optional[str] = None
+    limit: int = Field(default=50, ge=1, le=200)
+
+
+class ExportOptions(BaseModel):
+    format: Literal['ndjson', 'csv'] = 'ndjson'
+    gzip: bool = False
+
+
+class SnapshotOptions(BaseModel):
+    format: Literal['parquet', 'arrow'] = 'parquet'
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import socket
+from typing import Iterable, Sequence
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from auto_recon_api.core.config import get_settings
+
+KEY_PREFIX = 'recon:liveness'
+UNRESOLVED_IPS = {'', '0.0.0.0'}
+
+
+class LivenessChecker:
+    # Cheap DNS + TCP check run before a URL scan, so gau and httpx are
+    # not spent on hosts that cannot answer on any web port. Results are
+    # cached per host in Redis for `ttl` seconds when a client is given.
+
+    def __init__(  # noqa: PLR0913
+        self,
+        redis: Redis | None,
+        *,
+        ports: Sequence[int],
+        timeout: float,
+        concurrency: int,
+        ttl: int,
+    ):
+        self.redis = redis
+        self.ports = list(ports)
+        self.timeout = timeout
+        self.ttl = ttl
+        self.concurrency = max(1, concurrency)
+
+    @staticmethod
+    def _key(host: str) -> str:
+        return f'{KEY_PREFIX}:{host.lower()}'
+
+    async def _port_open(self, address: str, port: int) -> bool:
+        try:
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(address, port), self.timeout
+            )
+        except (OSError, asyncio.TimeoutError):
+            return False
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return True
+
+    async def probe(self, host: str) -> bool:
+        loop = asyncio.get_running_loop()
+        try:
+            infos = await asyncio.wait_for(
+                loop.getaddrinfo(host, None, type=socket.SOCK_STREAM),
+                self.timeout,
+            )
+        except (OSError, UnicodeError, asyncio.TimeoutError):
+            return False
+
+        # Every resolved address is tried in order: on a dual-stack host
+        # the first one is often IPv6, which a v4-only worker cannot reach.
+        for address in dict.fromkeys(info[4][0] for info in infos):
+            results = await asyncio.gather(*[
+                self._port_open(address, port) for port in self.ports
+            ])
+            if any(results):
+                return True
+        return False
+
+    async def _probe_all(self, hosts: list[str]) -> dict[str, bool]:
+        # A fixed pool of workers drains a queue, so at most `concurrency`
+        # probes (and coroutines) exist at once however many hosts there
+        # are.
+        queue: asyncio.Queue[str] = asyncio.Queue()
+        for host in hosts:
+            queue.put_nowait(host)
+        results: dict[str, bool] = {}
+
+        async def worker() -> None:
+            while not queue.empty():
+                host = queue.get_nowait()
+                results[host] = await self.probe(host)
+
+        await asyncio.gather(*[
+            worker() for _ in range(min(self.concurrency, len(hosts)))
+        ])
+        return {host: results[host] for host in hosts}
+
+    async def _load(self, hosts: list[str]) -> dict[str, bool]:
+        if self.redis is None or not hosts:
+            return {}
+        try:
+            values = await self.redis.mget([self._key(h) for h in hosts])
+        except RedisError:
+            return {}
+        return {
+            host: value in {b'1', '1'}
+            for host, value in zip(hosts, values)
+            if value is not None
+        }
+
+    async def _store(self, results: dict[str, bool]) -> None:
+        if self.redis is None or not results:
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for host, alive in results.items():
+                    value = '1' if alive else '0'
+                    pipe.set(self._key(host), value, ex=self.ttl)
+                await pipe.execute()
+        except RedisError:
+            pass
+
+    async def split(self, hosts: Iterable[str]) -> tuple[list[str], list[str]]:
+        hosts = list(dict.fromkeys(hosts))
+        known = await self._load(hosts)
+
+        pending = [h for h in hosts if h not in known]
+        probed = await self._probe_all(pending)
+        await self._store(probed)
+
+        status = {**known, **probed}
+        alive = [h for h in hosts if status[h]]
+        dead = [h for h in hosts if not status[h]]
+        return alive, dead
+
+    async def aclose(self) -> None:
+        if self.redis is not None:
+            await self.redis.aclose()
+
+
+def open_liveness_checker() -> LivenessChecker:
+    settings = get_settings()
+    redis = None
+    if os.getenv('TESTING') != '1' and settings.LIVENESS_TTL > 0:
+        redis = Redis.from_url(settings.REDIS_URL)
+
+    return LivenessChecker(
+        redis,
+        ports=settings.LIVENESS_PORTS,
+        timeout=settings.LIVENESS_TIMEOUT,
+        concurrency=settings.LIVENESS_CONCURRENCY,
+        ttl=settings.LIVENESS_TTL,
+    )
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from rq import get_current_job
+from sqlalchemy import select
+
+from auto_recon_api.core.export import iter_batches
+from auto_recon_api.database import SessionLocal
+from auto_recon_api.models import DiscoveredURL, Subdomain
+from auto_recon_api.settings import get_settings
+
+settings = get_settings()
+
+SNAPSHOT_FORMATS = ('parquet', 'arrow')
+SNAPSHOT_TABLES = ('urls', 'subdomains')
+COMPRESSION = 'zstd'
+
+
+def snapshot_path(domain_id: int, table: str, fmt: str) -> Path:
+    return Path(settings.SNAPSHOT_DIR) / str(domain_id) / f'{table}.{fmt}'
+
+
+def _tables() -> dict:
+    # Column order of each select matches its Arrow schema; tech is kept
+    # as its JSON text since its shape differs from tool to tool.
+    ts = pa.timestamp('us', tz='UTC')
+    urls = (
+        select(
+            DiscoveredURL.id,
+            DiscoveredURL.url,
+            DiscoveredURL.host,
+            DiscoveredURL.hostname,
+            DiscoveredURL.port,
+            DiscoveredURL.status_code,
+            DiscoveredURL.title,
+            DiscoveredURL.tech,
+            DiscoveredURL.scheme,
+            DiscoveredURL.path,
+            DiscoveredURL.ext,
+            DiscoveredURL.query_keys,
+            DiscoveredURL.created_at,
+        ),
+        pa.schema([
+            ('id', pa.int64()),
+            ('url', pa.string()),
+            ('host', pa.string()),
+            ('hostname', pa.string()),
+            ('port', pa.int32()),
+            ('status_code', pa.int32()),
+            ('title', pa.string()),
+            ('tech', pa.string()),
+            ('scheme', pa.string()),
+            ('path', pa.string()),
+            ('ext', pa.string()),
+            ('query_keys', pa.list_(pa.string())),
+            ('created_at', ts),
+        ]),
+        DiscoveredURL.domain_id,
+        DiscoveredURL.id,
+    )
+    subdomains = (
+        select(
+            Subdomain.id,
+            Subdomain.host,
+            Subdomain.ip,
+            Subdomain.is_wildcard,
+            Subdomain.created_at,
+            Subdomain.updated_at,
+            Subdomain.first_seen,
+            Subdomain.last_seen,
+            Subdomain.first_run_id,
+            Subdomain.last_run_id,
+        ),
+        pa.schema([
+            ('id', pa.int64()),
+            ('host', pa.string()),
+            ('ip', pa.string()),
+            ('is_wildcard', pa.bool_()),
+            ('created_at', ts),
+            ('updated_at', ts),
+            ('first_seen', ts),
+            ('last_seen', ts),
+            ('first_run_id', pa.int64()),
+            ('last_run_id', pa.int64()),
+        ]),
+        Subdomain.domain_id,
+        Subdomain.id,
+    )
+    return {'urls': urls, 'subdomains': subdomains}
+
+
+def _record_batch(rows, schema):
+    columns = list(zip(*rows))
+    if 'tech' in schema.names:
+        i = schema.get_field_index('tech')
+        columns[i] = [
+            None if v is None else json.dumps(v, ensure_ascii=False)
+            for v in columns[i]
+        ]
+    return pa.record_batch(
+        [
+            pa.array(values, type=field.type)
+            for values, field in zip(columns, schema)
+        ],
+        schema=schema,
+    )
+
+
+class _Writer:
+    # One interface over the Parquet and Arrow IPC writers; each batch
+    # becomes a Parquet row group or an IPC record batch.
+
+    def __init__(self, path: Path, schema, fmt: str):
+        if fmt == 'parquet':
+            self._writer = pq.ParquetWriter(
+                path, schema, compression=COMPRESSION
+            )
+        else:
+            self._writer = pa.ipc.new_file(
+                str(path),
+                schema,
+                options=pa.ipc.IpcWriteOptions(compression=COMPRESSION),
+            )
+
+    def write(self, batch) -> None:
+        self._writer.write_batch(batch)
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+async def write_snapshot(  # noqa: PLR0913, PLR0917
+    sessionmaker,
+    query,
+    schema,
+    path: Path,
+    fmt: str,
+    batch_size: int,
+) -> int:
+    # Written to a temporary file and moved into place, so a download
+    # never sees a half written file. The name is unique per call, so
+    # two jobs for the same snapshot never write to the same file.
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp', delete=False
+    ) as handle:
+        tmp = Path(handle.name)
+    writer = _Writer(tmp, schema, fmt)
+    rows = 0
+    try:
+        async for partition in iter_batches(sessionmaker, query, batch_size):
+            writer.write(_record_batch(partition, schema))
+            rows += len(partition)
+    except BaseException:
+        writer.close()
+        tmp.unlink(missing_ok=True)
+        raise
+
+    writer.close()
+    os.replace(tmp, path)
+    return rows
+
+
+async def _build_domain_snapshot(domain_id: int, fmt: str, job) -> dict:
+    written = {}
+    for table, (query, schema, domain_col, order_col) in _tables().items():
+        if job:
+            job.meta['phase'] = f'writing_{table}'
+            job.save_meta()
+
+        written[table] = await write_snapshot(
+            SessionLocal,
+            query.where(domain_col == domain_id).order_by(order_col),
+            schema,
+            snapshot_path(domain_id, table, fmt),
+            fmt,
+            settings.SNAPSHOT_BATCH_SIZE,
+        )
+
+        if job:
+            job.meta['seen'] = sum(written.values())
+            job.meta['inserted'] = job.meta['seen']
+            job.save_meta()
+
+    return written
+
+
+def build_domain_snapshot(domain_id: int, fmt: str = 'parquet') -> dict:
+    job = get_current_job()
+    if job:
+        job.meta['phase'] = 'starting'
+        job.meta['format'] = fmt
+        job.save_meta()
+
+    try:
+        rows = asyncio.run(_build_domain_snapshot(domain_id, fmt, job))
+    except Exception as exc:
+        if job:
+            job.meta['phase'] = 'failed'
+            job.meta['last_error'] = str(exc)
+            job.save_meta()
+        raise
+
+    if job:
+        job.meta['phase'] = 'finished'
+        job.save_meta()
+
+    return {'format': fmt, 'rows': rows}
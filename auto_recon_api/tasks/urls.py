@@ -2,22 +2,34 @@ from __future__ import annotations
 
 import asyncio
 import hashlib
-import json
+from collections import Counter
 from urllib.parse import urlsplit, urlunsplit
 
 import httpx
 from rq import get_current_job
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.dialects.postgresql import insert
 
+from auto_recon_api.core.ndjson import loads
+from auto_recon_api.core.recon_tool import get_tool_router, iter_job_records
 from auto_recon_api.database import SessionLocal
-from auto_recon_api.models import DiscoveredURL, Subdomain
+from auto_recon_api.models import (
+    DiscoveredURL,
+    Domain,
+    DomainUrlFacet,
+    Subdomain,
+)
 from auto_recon_api.settings import get_settings
+from auto_recon_api.tasks.liveness import (
+    UNRESOLVED_IPS,
+    open_liveness_checker,
+)
 
 settings = get_settings()
 
 HOSTS_PER_REQUEST = 200
 BATCH_SIZE = 2000
+MAX_EXT = 16
 
 
 def normalize_url(url: str) -> str:
@@ -40,6 +52,48 @@ def normalize_url(url: str) -> str:
     return normalized
 
 
+def url_fields(normalized: str) -> dict:
+    # Structured columns stored next to the URL so ext/param filters are
+    # index lookups. The migration backfill mirrors these rules in SQL.
+    parts = urlsplit(normalized)
+    path = parts.path or '/'
+
+    ext = None
+    last = path.rsplit('/', 1)[-1]
+    if '.' in last:
+        suffix = last.rsplit('.', 1)[-1].lower()
+        if suffix.isascii() and suffix.isalnum() and len(suffix) <= MAX_EXT:
+            ext = suffix
+
+    keys = {
+        pair.split('=', 1)[0].lower()
+        for pair in parts.query.split('&')
+        if pair.split('=', 1)[0]
+    }
+
+    return {
+        'scheme': parts.scheme or None,
+        'path': path,
+        'ext': ext,
+        'query_keys': sorted(keys),
+    }
+
+
+def tech_names(tech) -> list[str]:
+    # httpx reports versioned names ("WordPress:6.4.2"); filters and facets
+    # use the bare, lowercased name so every version of a product matches.
+    # The migration backfill mirrors these rules in SQL.
+    if not isinstance(tech, list):
+        return []
+    names = {
+        str(t).split(':', 1)[0].strip().lower()
+        for t in tech
+        if t is not None
+    }
+    names.discard('')
+    return sorted(names)
+
+
 def url_hash(u: str) -> str:
     return hashlib.sha256(u.encode('utf-8')).hexdigest()
 
@@ -66,7 +120,13 @@ def _meta_update(job, **kwargs):
     job.save_meta()
 
 
-def scan_urls_for_domain(domain_id: int, user_id: int) -> dict:
+def scan_urls_for_domain(
+    domain_id: int,
+    user_id: int,
+    force_refresh: bool = False,
+    include_wildcards: bool = False,
+    check_liveness: bool | None = None,
+) -> dict:
     job = get_current_job()
     if job:
         job.meta['phase'] = 'starting'
@@ -76,7 +136,15 @@ def scan_urls_for_domain(domain_id: int, user_id: int) -> dict:
         job.save_meta()
 
     try:
-        asyncio.run(_scan_urls_for_domain(domain_id, job))
+        asyncio.run(
+            _scan_urls_for_domain(
+                domain_id,
+                job,
+                force_refresh,
+                include_wildcards,
+                check_liveness,
+            )
+        )
         if job:
             job.meta['phase'] = 'finished'
             job.save_meta()
@@ -97,16 +165,134 @@ def scan_urls_for_domain(domain_id: int, user_id: int) -> dict:
     return {'seen': 0, 'inserted': 0, 'errors': 0}
 
 
-async def _scan_urls_for_domain(domain_id: int, job) -> None:
+async def _iter_endpoint_records(
+    client: httpx.AsyncClient,
+    base_url: str,
+    hosts: list[str],
+    force_refresh: bool,
+):
+    payload = [{'host': h, 'ip': ''} for h in hosts]
+    headers = {
+        'X-Internal-Token': settings.INTERNAL_TOKEN,
+        'Accept-Encoding': settings.TOOLS_STREAM_ENCODING,
+    }
+
+    if settings.TOOLS_USE_JOBS:
+        async for obj in iter_job_records(
+            client,
+            base_url,
+            {
+                'kind': 'hosts',
+                'subdomains': payload,
+                'force_refresh': force_refresh,
+            },
+            headers=headers,
+            max_reconnects=settings.TOOLS_JOB_MAX_RECONNECTS,
+            backoff=settings.TOOLS_JOB_BACKOFF,
+            backend=settings.NDJSON_BACKEND,
+        ):
+            yield obj
+        return
+
+    async with client.stream(
+        'POST',
+        f'{base_url}/hosts/stream',
+        headers=headers,
+        params={'force_refresh': force_refresh},
+        json=payload,
+    ) as r:
+        r.raise_for_status()
+
+        async for line in r.aiter_lines():
+            if not line:
+                continue
+
+            yield loads(line, settings.NDJSON_BACKEND)
+
+
+async def _iter_host_records(
+    client: httpx.AsyncClient,
+    hosts: list[str],
+    force_refresh: bool,
+    route_key: str | None = None,
+):
+    router = get_tool_router()
+    if router is None:
+        async for obj in _iter_endpoint_records(
+            client, settings.API_TOOLS_URL, hosts, force_refresh
+        ):
+            yield obj
+        return
+
+    async with router.use(route_key) as base_url:
+        async for obj in _iter_endpoint_records(
+            client, base_url, hosts, force_refresh
+        ):
+            yield obj
+
+
+async def _filter_live_hosts(rows, job) -> list[str]:
+    # Hosts recon could not resolve are dropped outright; the rest must
+    # accept a TCP connection on a web port to be worth a gau + httpx run.
+    resolved = [host for host, ip in rows if ip not in UNRESOLVED_IPS]
+    unresolved = len(rows) - len(resolved)
+
+    _meta_update(job, phase='liveness')
+    checker = open_liveness_checker()
+    try:
+        alive, dead = await checker.split(resolved)
+    finally:
+        await checker.aclose()
+
+    _meta_update(
+        job,
+        skipped_unresolved=unresolved,
+        skipped_unreachable=len(dead),
+    )
+    print(
+        f'[urls] liveness: {len(alive)} alive, {unresolved} unresolved, '
+        f'{len(dead)} unreachable'
+    )
+    return alive
+
+
+async def _scan_urls_for_domain(
+    domain_id: int,
+    job,
+    force_refresh: bool = False,
+    include_wildcards: bool = False,
+    check_liveness: bool | None = None,
+) -> None:
+    if check_liveness is None:
+        check_liveness = settings.URL_LIVENESS_CHECK
+
     seen_local = 0
+    partial_hosts = 0
     inserted_local = 0
 
+    where = [Subdomain.domain_id == domain_id]
+    if not include_wildcards:
+        where.append(Subdomain.is_wildcard.is_(False))
+
     async with SessionLocal() as session:
-        hosts = (
-            await session.execute(
-                select(Subdomain.host).where(Subdomain.domain_id == domain_id)
-            )
-        ).scalars().all()
+        # recon_tool instances are picked by domain name, as the subdomain
+        # worker does, so a name keeps hitting the same warm tool cache.
+        domain_name = await session.scalar(
+            select(Domain.name).where(Domain.id == domain_id)
+        )
+        if check_liveness:
+            rows = (
+                await session.execute(
+                    select(Subdomain.host, Subdomain.ip).where(*where)
+                )
+            ).all()
+        else:
+            hosts = (
+                await session.execute(select(Subdomain.host).where(*where))
+            ).scalars().all()
+
+    if check_liveness:
+        hosts = await _filter_live_hosts(rows, job)
 
     if not hosts:
         if job:
@@ -121,65 +307,69 @@ async def _scan_urls_for_domain(domain_id: int, job) -> None:
         job.meta['total_hosts'] = len(hosts)
         job.save_meta()
 
-    async with httpx.AsyncClient(timeout=None) as client:
+    timeout = None
+    if settings.TOOLS_USE_JOBS:
+        # Job streams send heartbeats, so a bounded read timeout is safe and
+        # a dead connection is noticed and resumed instead of hanging.
+        timeout = httpx.Timeout(10.0, read=settings.TOOLS_JOB_READ_TIMEOUT)
+
+    async with httpx.AsyncClient(timeout=timeout) as client:
         for host_chunk in chunks(list(hosts), HOSTS_PER_REQUEST):
-            payload = [{'host': h, 'ip': ''} for h in host_chunk]
             buffer: list[dict] = []
 
-            async with client.stream(
-                'POST',
-                f'{settings.API_TOOLS_URL}/hosts/stream',
-                headers={'X-Internal-Token': settings.INTERNAL_TOKEN},
-                json=payload,
-            ) as r:
-                r.raise_for_status()
-
-                async for line in r.aiter_lines():
-                    if not line:
-                        continue
-
-                    obj = json.loads(line)
-                    raw_url = obj.get('url')
-                    if not raw_url:
-                        continue
-
-                    norm = normalize_url(raw_url)
-
-                    buffer.append(
-                        {
-                            'domain_id': domain_id,
-                            'host': obj.get('host'),
-                            'url': norm,
-                            'url_hash': url_hash(norm),
-                            'hostname': obj.get('hostname'),
-                            'port': obj.get('port'),
-                            'status_code': obj.get('status_code'),
-                            'title': obj.get('title'),
-                            'tech': obj.get('tech'),
-                        }
-                    )
+            async for obj in _iter_host_records(
+                client, host_chunk, force_refresh, route_key=domain_name
+            ):
+                if obj.get('partial'):
+                    partial_hosts += 1
+                    if job:
+                        job.meta['partial_hosts'] = partial_hosts
+                        job.save_meta()
+                    continue
+
+                raw_url = obj.get('url')
+                if not raw_url:
+                    continue
+
+                norm = normalize_url(raw_url)
+
+                buffer.append(
+                    {
+                        'domain_id': domain_id,
+                        'host': obj.get('host'),
+                        'url': norm,
+                        'url_hash': url_hash(norm),
+                        **url_fields(norm),
+                        'hostname': obj.get('hostname'),
+                        'port': obj.get('port'),
+                        'status_code': obj.get('status_code'),
+                        'title': obj.get('title'),
+                        'tech': obj.get('tech'),
+                        'tech_names': tech_names(obj.get('tech')),
+                    }
+                )
 
-                    seen_local += 1
+                seen_local += 1
 
-                    if len(buffer) >= BATCH_SIZE:
-                        if job:
-                            job.meta['phase'] = 'flushing'
-                            job.save_meta()
+                if len(buffer) >= BATCH_SIZE:
+                    if job:
+                        job.meta['phase'] = 'flushing'
+                        job.save_meta()
 
-                        inserted_now = await _flush_urls(SessionLocal, buffer)
-                        inserted_local += inserted_now
-                        buffer.clear()
+                    inserted_now = await _flush_urls(SessionLocal, buffer)
+                    inserted_local += inserted_now
+                    buffer.clear()
 
-                        if job:
-                            job.meta['phase'] = 'running'
-                            job.meta['seen'] = seen_local
-                            job.meta['inserted'] = inserted_local
-                            job.save_meta()
+                    if job:
+                        job.meta['phase'] = 'running'
+                        job.meta['seen'] = seen_local
+                        job.meta['inserted'] = inserted_local
+                        job.save_meta()
 
-                        print(
-                            f'[urls] domain={domain_id} \
-                            seen={seen_local} inserted={inserted_local}'
-                        )
+                    print(
+                        f'[urls] domain={domain_id} \
+                        seen={seen_local} inserted={inserted_local}'
+                    )
 
             if buffer:
                 if job:
@@ -208,12 +398,63 @@ async def _scan_urls_for_domain(domain_id: int, job) -> None:
         job.save_meta()
 
 
-async def _flush_urls(sessionmaker, rows: list[dict]) -> None:
+def facet_counts(rows) -> Counter:
+    # rows are (domain_id, host, port, status_code, ext, tech_names) of
+    # the URLs just inserted; NULL values are not counted.
+    counts: Counter = Counter()
+    for domain_id, host, port, status_code, ext, names in rows:
+        for facet, value in (
+            ('status_code', status_code),
+            ('host', host),
+            ('port', port),
+            ('ext', ext),
+        ):
+            if value is not None:
+                counts[domain_id, facet, str(value)] += 1
+        for name in names or ():
+            counts[domain_id, 'tech', name] += 1
+    return counts
+
+
+async def _bump_facets(session, counts: Counter) -> None:
+    if not counts:
+        return
+    # Sorted so concurrent flushes lock rollup rows in the same order.
+    stmt = insert(DomainUrlFacet).values([
+        {'domain_id': d, 'facet': f, 'value': v, 'count': n}
+        for (d, f, v), n in sorted(counts.items())
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['domain_id', 'facet', 'value'],
+        set_={'count': DomainUrlFacet.count + stmt.excluded.count},
+    )
+    await session.execute(stmt)
+
+
+async def _flush_urls(sessionmaker, rows: list[dict]) -> int:
     async with sessionmaker() as session:
         stmt = insert(DiscoveredURL.__table__).values(rows)
         stmt = stmt.on_conflict_do_nothing(constraint='uq_domain_urlhash')
-        stmt = stmt.returning(DiscoveredURL.id)
+        stmt = stmt.returning(
+            DiscoveredURL.domain_id,
+            DiscoveredURL.host,
+            DiscoveredURL.port,
+            DiscoveredURL.status_code,
+            DiscoveredURL.ext,
+            DiscoveredURL.tech_names,
+        )
         res = await session.execute(stmt)
+        returned = res.fetchall()
+        inserted = Counter(row[0] for row in returned)
+
+        # Same transaction as the insert, so url_count and the facet
+        # rollups never drift from the rows actually stored.
+        for domain_id, count in inserted.items():
+            await session.execute(
+                update(Domain)
+                .where(Domain.id == domain_id)
+                .values(url_count=Domain.url_count + count)
+            )
+        await _bump_facets(session, facet_counts(returned))
         await session.commit()
-        inserted = len(res.fetchall())
-        return inserted
+        return sum(inserted.values())
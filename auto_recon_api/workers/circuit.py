@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from typing import Callable
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from auto_recon_api.core.config import get_settings
+
+log = logging.getLogger(__name__)
+
+KEY_PREFIX = 'recon:breaker'
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class CircuitBreaker:
+    # Shared view of recon_tool health. Transient failures from every
+    # worker are counted in Redis; after `threshold` of them within
+    # `window` seconds the circuit opens for `cooldown` seconds and workers
+    # hold domains back instead of failing them one after another. Once the
+    # cooldown ends a single failure reopens it (half-open), a success
+    # closes it. Without Redis, or while Redis errors, the same state is
+    # kept in process.
+
+    def __init__(  # noqa: PLR0913
+        self,
+        redis: Redis | None,
+        *,
+        threshold: int,
+        window: int,
+        cooldown: float,
+        name: str = 'recon_tool',
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.redis = redis
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self._failures_key = f'{KEY_PREFIX}:{name}:failures'
+        self._open_key = f'{KEY_PREFIX}:{name}:open'
+        self._clock = clock
+        self._failures = 0
+        self._failures_until = 0.0
+        self._open_until = 0.0
+
+    def _local_remaining(self) -> float:
+        return max(self._open_until - self._clock(), 0.0)
+
+    def _local_failure(self) -> bool:
+        now = self._clock()
+        if self._failures_until <= now:
+            self._failures = 0
+        self._failures += 1
+        self._failures_until = now + self.window
+        if self._failures < self.threshold:
+            return False
+
+        self._open_until = now + self.cooldown
+        self._failures = self.threshold - 1
+        self._failures_until = self._open_until + self.window
+        return True
+
+    async def remaining(self) -> float:
+        if self.redis is None:
+            return self._local_remaining()
+        try:
+            ttl = await self.redis.pttl(self._open_key)
+        except RedisError as exc:
+            log.warning(f'circuit breaker read failed: {exc}')
+            return self._local_remaining()
+        return max(ttl, 0) / 1000
+
+    async def record_failure(self) -> None:
+        opened = self._local_failure()
+        if self.redis is not None:
+            try:
+                async with self.redis.pipeline(transaction=True) as pipe:
+                    pipe.incr(self._failures_key)
+                    pipe.expire(self._failures_key, self.window)
+                    failures, _ = await pipe.execute()
+
+                opened = failures >= self.threshold
+                if opened:
+                    async with self.redis.pipeline(transaction=True) as pipe:
+                        pipe.set(
+                            self._open_key,
+                            '1',
+                            px=int(self.cooldown * 1000),
+                        )
+                        pipe.set(
+                            self._failures_key,
+                            self.threshold - 1,
+                            ex=int(self.cooldown) + self.window,
+                        )
+                        await pipe.execute()
+            except RedisError as exc:
+                log.warning(f'circuit breaker write failed: {exc}')
+
+        if opened:
+            log.warning(
+                f'recon_tool circuit open for {self.cooldown}s after '
+                f'{self.threshold} failures'
+            )
+
+    async def record_success(self) -> None:
+        self._failures = 0
+        self._open_until = 0.0
+        if self.redis is None:
+            return
+        try:
+            await self.redis.delete(self._failures_key, self._open_key)
+        except RedisError as exc:
+            log.warning(f'circuit breaker reset failed: {exc}')
+
+    async def wait_closed(self, max_wait: float) -> None:
+        waited = 0.0
+        while (remaining := await self.remaining()) > 0:
+            if waited >= max_wait:
+                raise CircuitOpenError(
+                    f'recon_tool unhealthy, circuit still open after '
+                    f'{waited:.0f}s'
+                )
+            delay = min(remaining, max_wait - waited)
+            await asyncio.sleep(delay)
+            waited += delay
+
+    async def aclose(self) -> None:
+        if self.redis is not None:
+            await self.redis.aclose()
+
+
+def open_circuit_breaker() -> CircuitBreaker | None:
+    settings = get_settings()
+    if settings.RECON_BREAKER_THRESHOLD <= 0:
+        return None
+
+    redis = None
+    if os.getenv('TESTING') != '1':
+        redis = Redis.from_url(settings.REDIS_URL)
+
+    return CircuitBreaker(
+        redis,
+        threshold=settings.RECON_BREAKER_THRESHOLD,
+        window=settings.RECON_BREAKER_WINDOW,
+        cooldown=settings.RECON_BREAKER_COOLDOWN,
+    )
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+from typing import Awaitable, Callable
+
+from redis.asyncio import Redis
+from redis.exceptions import LockError, RedisError
+
+from auto_recon_api.core.config import get_settings
+
+log = logging.getLogger(__name__)
+
+KEY_PREFIX = 'recon:subdomains'
+
+
+class ReconShare:
+    # Subdomain enumeration results shared across users, keyed by domain
+    # name. A Redis lock per name makes concurrent requests single-flight:
+    # the first caller runs recon_tool and the others wait for its result.
+    # The lock is renewed while the producer runs, so `lock_timeout` only
+    # bounds how long a crashed worker keeps it; `wait_timeout` should
+    # cover a whole producer run (see run_budget).
+
+    def __init__(
+        self,
+        redis: Redis,
+        ttl: int,
+        lock_timeout: float,
+        wait_timeout: float,
+    ):
+        self.redis = redis
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+
+    @staticmethod
+    def _key(name: str) -> str:
+        return f'{KEY_PREFIX}:{name.strip().lower()}'
+
+    async def _load(self, name: str) -> dict | None:
+        try:
+            raw = await self.redis.get(self._key(name))
+        except RedisError as exc:
+            log.warning(f'recon share read failed for {name}: {exc}')
+            return None
+        if not raw:
+            return None
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
+
+    async def _store(self, name: str, data: dict) -> None:
+        # Truncated results would hide the missing hosts from everyone
+        # reusing them until the TTL expires.
+        if not data.get('subdomains') or data.get('partial'):
+            return
+        try:
+            await self.redis.set(
+                self._key(name), json.dumps(data), ex=self.ttl
+            )
+        except RedisError as exc:
+            log.warning(f'recon share write failed for {name}: {exc}')
+
+    async def _renew(self, name: str, lock) -> None:
+        while True:
+            await asyncio.sleep(self.lock_timeout / 3)
+            try:
+                await lock.reacquire()
+            except (LockError, RedisError) as exc:
+                log.warning(f'recon share lock lost for {name}: {exc}')
+                return
+
+    async def get_or_run(
+        self,
+        name: str,
+        producer: Callable[[], Awaitable[dict]],
+        force: bool = False,
+    ) -> tuple[dict, bool]:
+        # force skips any shared result and the lock; the fresh result
+        # still replaces the shared one.
+        if force:
+            data = await producer()
+            await self._store(name, data)
+            return data, False
+
+        data = await self._load(name)
+        if data is not None:
+            return data, True
+
+        lock = self.redis.lock(
+            f'{self._key(name)}:lock',
+            timeout=self.lock_timeout,
+            blocking_timeout=self.wait_timeout,
+        )
+        try:
+            acquired = await lock.acquire()
+        except RedisError as exc:
+            log.warning(f'recon share lock failed for {name}: {exc}')
+            acquired = False
+
+        renewal = None
+        try:
+            if acquired:
+                data = await self._load(name)
+                if data is not None:
+                    return data, True
+                renewal = asyncio.create_task(self._renew(name, lock))
+
+            data = await producer()
+            await self._store(name, data)
+            return data, False
+        finally:
+            if renewal is not None:
+                renewal.cancel()
+            if acquired:
+                try:
+                    await lock.release()
+                except (LockError, RedisError):
+                    pass
+
+    async def aclose(self) -> None:
+        await self.redis.aclose()
+
+
+def run_budget(settings, read_timeout: float) -> float:
+    # Worst case of one producer run: every attempt waits out the read
+    # timeout and the longest backoff, and the circuit breaker may hold
+    # the domain for its whole max wait on top.
+    attempts = max(1, settings.RECON_RETRY_ATTEMPTS)
+    return (
+        attempts * (read_timeout + settings.RECON_RETRY_MAX_DELAY)
+        + settings.RECON_BREAKER_MAX_WAIT
+    )
+
+
+def open_recon_share(read_timeout: float) -> ReconShare | None:
+    settings = get_settings()
+    if os.getenv('TESTING') == '1' or settings.RECON_SHARE_TTL <= 0:
+        return None
+
+    return ReconShare(
+        Redis.from_url(settings.REDIS_URL),
+        ttl=settings.RECON_SHARE_TTL,
+        lock_timeout=settings.RECON_SHARE_LOCK_TIMEOUT,
+        wait_timeout=run_budget(settings, read_timeout),
+    )
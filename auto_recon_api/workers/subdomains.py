@@ -2,21 +2,64 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import random
+from collections import Counter
 from datetime import datetime, timezone
 from http import HTTPStatus
-from typing import Iterable
+from typing import AsyncIterator, Awaitable, Callable, Iterable
 
 import httpx
 from fastapi import HTTPException
 from rq import get_current_job
-from sqlalchemy import select
+from rq.job import Job
+from sqlalchemy import Boolean, func, literal_column, select, update
+from sqlalchemy.dialects.postgresql import insert
 
 from auto_recon_api.core.config import get_settings
+from auto_recon_api.core.recon_tool import (
+    ReconToolJobError,
+    get_tool_router,
+    iter_job_records,
+)
 from auto_recon_api.db.session import get_sessionmaker
-from auto_recon_api.models import Domain, DomainRun, Subdomain
+from auto_recon_api.models import Domain, DomainRun, Subdomain, SubdomainRun
+from auto_recon_api.workers.circuit import (
+    CircuitBreaker,
+    CircuitOpenError,
+    open_circuit_breaker,
+)
+from auto_recon_api.workers.recon_share import (
+    ReconShare,
+    open_recon_share,
+    run_budget,
+)
 
 log = logging.getLogger(__name__)
 
+PREFETCH_BATCH_SIZE = 500
+UPSERT_BATCH_SIZE = 1000
+RECON_CONCURRENCY = 3
+READ_TIMEOUT = 240.0
+IS_INSERT = literal_column('(xmax = 0)', Boolean)
+FANOUT_LIST_KEYS = (
+    'done_domain_ids',
+    'failed_domain_ids',
+    'partial_domain_ids',
+)
+# Checked in order, so the specific httpx errors win over their bases.
+ERROR_CATEGORIES = (
+    (httpx.TimeoutException, 'timeout'),
+    (httpx.ConnectError, 'connect'),
+    (httpx.TransportError, 'network'),
+    (httpx.RequestError, 'request'),
+    (ReconToolJobError, 'job'),
+    (CircuitOpenError, 'circuit_open'),
+    (HTTPException, 'bad_response'),
+)
+# Failures that say recon_tool itself is unhealthy: worth another attempt,
+# and counted by the circuit breaker. The rest fail the domain right away.
+TRANSIENT_ERRORS = {'timeout', 'connect', 'network', 'server'}
+
 
 def _short_err(exc: Exception, limit: int = 300) -> str:
     return f'{type(exc).__name__}: {exc}'[:limit]
@@ -32,11 +75,71 @@ def _normalize_domain_error(exc: Exception) -> str:
         status = exc.response.status_code if exc.response else '?'
         body = (exc.response.text or '')[:200] if exc.response else ''
         return f'HTTP {status} from recon_tool: {body}'
+    if isinstance(exc, ReconToolJobError):
+        return f'recon_tool job failed: {exc}'
     if isinstance(exc, httpx.RequestError):
         return f'RequestError: {exc}'
     return _short_err(exc)
 
 
+def _classify_domain_error(exc: Exception) -> str:
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code if exc.response else 0
+        if (
+            status >= HTTPStatus.INTERNAL_SERVER_ERROR
+            or status == HTTPStatus.TOO_MANY_REQUESTS
+        ):
+            return 'server'
+        return 'client'
+
+    for types, category in ERROR_CATEGORIES:
+        if isinstance(exc, types):
+            return category
+    return 'internal'
+
+
+async def _call_with_retries(  # noqa: PLR0913
+    call: Callable[[], Awaitable[dict]],
+    *,
+    attempts: int,
+    base_delay: float,
+    max_delay: float,
+    breaker: CircuitBreaker | None = None,
+    max_wait: float = 0.0,
+) -> dict:
+    # Full jitter keeps the domains that failed together during a
+    # recon_tool restart from coming back in lockstep.
+    attempt = 0
+    while True:
+        attempt += 1
+        if breaker is not None:
+            await breaker.wait_closed(max_wait)
+
+        try:
+            result = await call()
+        except Exception as exc:
+            category = _classify_domain_error(exc)
+            if category not in TRANSIENT_ERRORS:
+                raise
+            if breaker is not None:
+                await breaker.record_failure()
+            if attempt >= attempts:
+                raise
+
+            delay = random.uniform(
+                0, min(max_delay, base_delay * 2 ** (attempt - 1))
+            )
+            log.warning(
+                f'recon_tool call failed ({category}), attempt '
+                f'{attempt}/{attempts}, retrying in {delay:.1f}s'
+            )
+            await asyncio.sleep(delay)
+        else:
+            if breaker is not None:
+                await breaker.record_success()
+            return result
+
+
 def _utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
@@ -91,6 +194,12 @@ def _job_mark_done(job, domain_id: int) -> None:
     _job_touch(job)
 
 
+def _job_mark_partial(job, domain_id: int) -> None:
+    if not job:
+        return
+    job.meta.setdefault('partial_domain_ids', []).append(domain_id)
+
+
 def _job_mark_failed(job, domain_id: int, message: str) -> None:
     if not job:
         return
@@ -103,29 +212,170 @@ def _job_mark_failed(job, domain_id: int, message: str) -> None:
     _job_touch(job)
 
 
-async def _process_one_domain(
+def _subdomain_rows(
+    domain_id: int, subdomains: list[dict], run_id: int | None
+) -> list[dict]:
+    # Keyed by host: one INSERT .. ON CONFLICT cannot touch a row twice.
+    rows = {}
+    for sub in subdomains:
+        rows[sub['host']] = {
+            'host': sub['host'],
+            'ip': sub.get('ip', '0.0.0.0'),
+            'domain_id': domain_id,
+            'is_wildcard': bool(sub.get('wildcard')),
+            'first_run_id': run_id,
+            'last_run_id': run_id,
+        }
+    return list(rows.values())
+
+
+async def _upsert_subdomains(session, rows: list[dict]) -> int:
+    table = Subdomain.__table__
+    inserted = Counter()
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        stmt = insert(table).values(rows[start : start + UPSERT_BATCH_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            constraint='uq_host_per_domain',
+            set_={
+                'ip': stmt.excluded.ip,
+                'is_wildcard': stmt.excluded.is_wildcard,
+                'last_seen': func.now(),
+                'updated_at': func.now(),
+                # Runs without a DomainRun keep the last known run id.
+                'last_run_id': func.coalesce(
+                    stmt.excluded.last_run_id, table.c.last_run_id
+                ),
+            },
+        )
+        # xmax is 0 only on rows this statement inserted, so the counter
+        # moves by new hosts and not by every host seen again.
+        stmt = stmt.returning(
+            table.c.id, table.c.domain_id, table.c.last_run_id, IS_INSERT
+        )
+        result = await session.execute(stmt)
+        seen = []
+        for subdomain_id, domain_id, run_id, is_new in result.all():
+            if is_new:
+                inserted[domain_id] += 1
+            if run_id is not None:
+                seen.append({'run_id': run_id, 'subdomain_id': subdomain_id})
+
+        if seen:
+            await session.execute(
+                insert(SubdomainRun.__table__)
+                .values(seen)
+                .on_conflict_do_nothing()
+            )
+
+    for domain_id, count in inserted.items():
+        await session.execute(
+            update(Domain)
+            .where(Domain.id == domain_id)
+            .values(subdomain_count=Domain.subdomain_count + count)
+        )
+    return sum(inserted.values())
+
+
+async def _fetch_subdomains_job(
+    client, settings, base_url: str, name: str, force_refresh: bool = False
+) -> dict:
+    data = {'subdomains': [], 'wildcard_zones': [], 'partial_tools': []}
+    async for record in iter_job_records(
+        client,
+        base_url,
+        {'kind': 'subdomains', 'domain': name, 'force_refresh': force_refresh},
+        headers={'X-Internal-Token': settings.INTERNAL_TOKEN},
+        max_reconnects=settings.TOOLS_JOB_MAX_RECONNECTS,
+        backoff=settings.TOOLS_JOB_BACKOFF,
+        backend=settings.NDJSON_BACKEND,
+    ):
+        if 'wildcard_zones' in record:
+            data['wildcard_zones'].extend(record['wildcard_zones'])
+        elif 'partial_tools' in record:
+            data['partial_tools'].extend(record['partial_tools'])
+            data['partial'] = True
+        else:
+            data['subdomains'].append(record)
+    return data
+
+
+async def _process_one_domain(  # noqa: PLR0913
     *,
     domain_id: int,
     job_id: int | None,
     client: httpx.AsyncClient,
     semaphore: asyncio.Semaphore,
-) -> None:
+    share: ReconShare | None = None,
+    domain_name: str | None = None,
+    breaker: CircuitBreaker | None = None,
+    force_refresh: bool = False,
+) -> list[str]:
     settings = get_settings()
     Session = get_sessionmaker()
 
+    async def request_subdomains(base_url: str, url: str, name: str) -> dict:
+        if settings.TOOLS_USE_JOBS:
+            return await _fetch_subdomains_job(
+                client, settings, base_url, name, force_refresh
+            )
+
+        response = await client.post(
+            url,
+            params={'domain': name, 'force_refresh': force_refresh},
+        )
+        response.raise_for_status()
+
+        try:
+            return response.json()
+        except ValueError as exc:
+            raise HTTPException(
+                status_code=HTTPStatus.BAD_GATEWAY,
+                detail='Invalid JSON response from subdomain service'
+            ) from exc
+
+    async def request_once(name: str) -> dict:
+        router = get_tool_router()
+        if router is None:
+            return await request_subdomains(
+                settings.API_TOOLS_URL, settings.SUBDOMAIN_URL, name
+            )
+
+        async with router.use(name) as base_url:
+            return await request_subdomains(
+                base_url, f'{base_url}/subdomains', name
+            )
+
+    async def fetch_subdomains(name: str) -> dict:
+        return await _call_with_retries(
+            lambda: request_once(name),
+            attempts=settings.RECON_RETRY_ATTEMPTS,
+            base_delay=settings.RECON_RETRY_BASE_DELAY,
+            max_delay=settings.RECON_RETRY_MAX_DELAY,
+            breaker=breaker,
+            max_wait=settings.RECON_BREAKER_MAX_WAIT,
+        )
+
     async with semaphore:
         async with Session() as session:
-            domain_name = None
+            run_id = None
             try:
                 async with session.begin():
-                    domain_obj = await session.scalar(
-                        select(Domain).where(Domain.id == domain_id)
-                    )
-                    if not domain_obj:
-                        return
+                    if domain_name is not None:
+                        # Name already prefetched by find_subdomains.
+                        await session.execute(
+                            update(Domain)
+                            .where(Domain.id == domain_id)
+                            .values(status='running')
+                        )
+                    else:
+                        domain_obj = await session.scalar(
+                            select(Domain).where(Domain.id == domain_id)
+                        )
+                        if not domain_obj:
+                            return []
 
-                    domain_name = domain_obj.name
-                    domain_obj.status = 'running'
+                        domain_name = domain_obj.name
+                        domain_obj.status = 'running'
 
                     if job_id:
                         run = await session.scalar(
@@ -138,35 +388,39 @@ async def _process_one_domain(
                             .limit(1)
                         )
                         if run:
+                            run_id = run.id
                             run.status = 'running'
                             run.started_at = run.started_at or _utcnow()
                             run.error_message = None
 
-                response = await client.post(
-                    settings.SUBDOMAIN_URL,
-                    params={'domain': domain_name},
-                )
-                response.raise_for_status()
-
-                try:
-                    data = response.json()
-                except ValueError as exc:
-                    raise HTTPException(
-                        status_code=HTTPStatus.BAD_GATEWAY,
-                        detail='Invalid JSON response from subdomain service'
-                    ) from exc
+                if share is None:
+                    data = await fetch_subdomains(domain_name)
+                else:
+                    data, shared = await share.get_or_run(
+                        domain_name,
+                        lambda: fetch_subdomains(domain_name),
+                        force=force_refresh,
+                    )
+                    if shared:
+                        log.info(
+                            f'Reusing shared recon result for {domain_name}',
+                            extra={'domain_id': domain_id},
+                        )
 
                 subdomains = data.get('subdomains', [])
+                partial_tools = data.get('partial_tools') or []
+                if partial_tools:
+                    log.warning(
+                        f'Partial recon for {domain_name}: '
+                        f'{", ".join(partial_tools)} timed out',
+                        extra={'domain_id': domain_id},
+                    )
 
                 async with session.begin():
-                    for sub in subdomains:
-                        session.add(
-                            Subdomain(
-                                host=sub['host'],
-                                ip=sub.get('ip', '0.0.0.0'),
-                                domain_id=domain_id,
-                            )
-                        )
+                    await _upsert_subdomains(
+                        session,
+                        _subdomain_rows(domain_id, subdomains, run_id),
+                    )
 
                     domain_obj = await session.scalar(
                         select(Domain).where(Domain.id == domain_id)
@@ -187,13 +441,24 @@ async def _process_one_domain(
                         if run:
                             run.status = 'done'
                             run.ended_at = _utcnow()
-                            run.error_message = None
+                            run.error_message = (
+                                f'partial: {", ".join(partial_tools)} '
+                                'timed out'
+                                if partial_tools
+                                else None
+                            )
+
+                return partial_tools
 
             except Exception as exc:
                 msg = _normalize_domain_error(exc)
                 log.exception(
                     f'Recon failed: {msg}',
-                    extra={'domain_id': domain_id, 'domain': domain_name},
+                    extra={
+                        'domain_id': domain_id,
+                        'domain': domain_name,
+                        'category': _classify_domain_error(exc),
+                    },
                 )
                 try:
                     async with session.begin():
@@ -226,35 +491,111 @@ async def _process_one_domain(
                 raise RuntimeError(f'{domain_id}: {msg}') from exc
 
 
-async def find_subdomains(domain_ids: list[int], concurrency: int = 3) -> None:
-    job = get_current_job()
-    job_id = job.id if job else None
-    _init_job_meta(job, domain_ids)
-
-    timeout = httpx.Timeout(connect=10.0, read=240.0, write=30.0, pool=10.0)
-    semaphore = asyncio.Semaphore(concurrency)
+async def _iter_domain_batches(
+    domain_ids: list[int], batch_size: int = PREFETCH_BATCH_SIZE
+) -> AsyncIterator[list[tuple[int, str | None]]]:
+    # One query per batch of ids instead of one lookup per domain. Ids
+    # with no row come back with a None name.
+    Session = get_sessionmaker()
+    ids = sorted(set(domain_ids))
 
-    async def runner(domain_id: int) -> tuple[int, str | None]:
-        try:
-            await _process_one_domain(
-                domain_id=domain_id,
-                job_id=job_id,
-                client=client,
-                semaphore=semaphore,
+    for start in range(0, len(ids), batch_size):
+        chunk = ids[start : start + batch_size]
+        async with Session() as session:
+            rows = await session.execute(
+                select(Domain.id, Domain.name)
+                .where(Domain.id.in_(chunk))
+                .order_by(Domain.id)
             )
-            return domain_id, None
-        except Exception as exc:
-            return domain_id, str(exc)
+            names = dict(rows.all())
+        yield [(domain_id, names.get(domain_id)) for domain_id in chunk]
+
+
+def _read_timeout(settings) -> float:
+    if settings.TOOLS_USE_JOBS:
+        return settings.TOOLS_JOB_READ_TIMEOUT
+    return READ_TIMEOUT
 
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        tasks = [asyncio.create_task(runner(did)) for did in domain_ids]
 
-        for finished in asyncio.as_completed(tasks):
-            domain_id, err = await finished
-            if err is None:
+def subdomain_job_timeout(domain_count: int) -> int:
+    # Consumers take their domains one after another, and with sharing on
+    # a domain may wait a whole run for another worker's result before
+    # running recon itself, so RQ never kills a job that is still inside
+    # those limits.
+    settings = get_settings()
+    per_domain = run_budget(settings, _read_timeout(settings))
+    if settings.RECON_SHARE_TTL > 0:
+        per_domain *= 2
+    rounds = max(1, -(-domain_count // RECON_CONCURRENCY))
+    return int(rounds * per_domain)
+
+
+async def find_subdomains(
+    domain_ids: list[int],
+    concurrency: int = RECON_CONCURRENCY,
+    run_job_id: str | None = None,
+    force_refresh: bool = False,
+) -> None:
+    job = get_current_job()
+    # Fan-out children record their DomainRuns under the parent job id.
+    job_id = run_job_id or (job.id if job else None)
+    _init_job_meta(job, domain_ids)
+
+    settings = get_settings()
+    read = _read_timeout(settings)
+    timeout = httpx.Timeout(connect=10.0, read=read, write=30.0, pool=10.0)
+    semaphore = asyncio.Semaphore(concurrency)
+    share = open_recon_share(read)
+    breaker = open_circuit_breaker()
+
+    # Only `concurrency` consumers exist at any time and the queue holds a
+    # couple of items per consumer, so memory does not grow with the batch.
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+
+    async def producer() -> None:
+        async for batch in _iter_domain_batches(domain_ids):
+            for item in batch:
+                await queue.put(item)
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def consumer() -> None:
+        while (item := await queue.get()) is not None:
+            domain_id, domain_name = item
+            if domain_name is None:
                 _job_mark_done(job, domain_id)
-            else:
-                _job_mark_failed(job, domain_id, err)
+                continue
+
+            try:
+                partial_tools = await _process_one_domain(
+                    domain_id=domain_id,
+                    job_id=job_id,
+                    client=client,
+                    semaphore=semaphore,
+                    share=share,
+                    domain_name=domain_name,
+                    breaker=breaker,
+                    force_refresh=force_refresh,
+                )
+            except Exception as exc:
+                _job_mark_failed(job, domain_id, str(exc))
+                continue
+
+            if partial_tools:
+                _job_mark_partial(job, domain_id)
+            _job_mark_done(job, domain_id)
+
+    try:
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            async with asyncio.TaskGroup() as group:
+                group.create_task(producer())
+                for _ in range(concurrency):
+                    group.create_task(consumer())
+    finally:
+        if share is not None:
+            await share.aclose()
+        if breaker is not None:
+            await breaker.aclose()
 
     if job:
         job.meta['finished_at'] = _utcnow().isoformat()
@@ -262,5 +603,86 @@ async def find_subdomains(domain_ids: list[int], concurrency: int = 3) -> None:
         job.save_meta()
 
 
-def run_find_subdomains(domain_ids: Iterable[int]) -> None:
-    asyncio.run(find_subdomains(list(domain_ids)))
+def run_find_subdomains(
+    domain_ids: Iterable[int],
+    run_job_id: str | None = None,
+    force_refresh: bool = False,
+) -> None:
+    asyncio.run(
+        find_subdomains(
+            list(domain_ids),
+            run_job_id=run_job_id,
+            force_refresh=force_refresh,
+        )
+    )
+
+
+def aggregate_child_meta(meta: dict, children: Iterable[Job | None]) -> dict:
+    merged = {
+        **meta,
+        'done': 0,
+        'failed': 0,
+        'errors_by_domain': {},
+        'current_domain_id': None,
+        'current_domain': None,
+    }
+    for key in FANOUT_LIST_KEYS:
+        merged[key] = []
+
+    for child in children:
+        if child is None:
+            continue
+        child_meta = child.meta or {}
+
+        merged['done'] += int(child_meta.get('done') or 0)
+        merged['failed'] += int(child_meta.get('failed') or 0)
+        for key in FANOUT_LIST_KEYS:
+            merged[key].extend(child_meta.get(key) or [])
+        merged['errors_by_domain'].update(
+            child_meta.get('errors_by_domain') or {}
+        )
+
+        # A child killed by its job timeout never marks its remaining
+        # domains, so count them as failed here.
+        if child.get_status(refresh=False) == 'failed':
+            child_domains = child.args[0] if child.args else []
+            settled = set(child_meta.get('done_domain_ids') or []) | set(
+                child_meta.get('failed_domain_ids') or []
+            )
+            for domain_id in child_domains:
+                if domain_id in settled:
+                    continue
+                merged['failed'] += 1
+                merged['failed_domain_ids'].append(domain_id)
+                merged['errors_by_domain'][str(domain_id)] = (
+                    f'job {child.id} failed'
+                )
+
+        if child_meta.get('current_domain_id') is not None:
+            merged['current_domain_id'] = child_meta['current_domain_id']
+            merged['current_domain'] = child_meta.get('current_domain')
+        if child_meta.get('last_error'):
+            merged['last_error'] = child_meta['last_error']
+        if child_meta.get('updated_at'):
+            merged['updated_at'] = max(
+                merged.get('updated_at') or '', child_meta['updated_at']
+            )
+
+    return merged
+
+
+def finalize_subdomain_fanout() -> dict:
+    # Runs once every child job has ended (dependency with
+    # allow_failure) and freezes the aggregated progress on the parent.
+    job = get_current_job()
+    if not job:
+        return {}
+
+    children = Job.fetch_many(
+        job.meta.get('child_job_ids') or [], connection=job.connection
+    )
+    job.meta = aggregate_child_meta(job.meta, children)
+    job.meta['finished_at'] = _utcnow().isoformat()
+    job.save_meta()
+
+    return {'done': job.meta['done'], 'failed': job.meta['failed']}
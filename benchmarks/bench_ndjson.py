@@ -0,0 +1,71 @@
+"""Records/sec of each NDJSON backend on /hosts/stream-shaped records.
+
+Usage: python -m benchmarks.bench_ndjson [--records N] [--batch N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from auto_recon_api.core.ndjson import available_backends, get_backend
+
+SAMPLE = {
+    'host': 'rh.businesscorp.com.br',
+    'url': 'https://rh.businesscorp.com.br/uploads/files/report.pdf?id=1',
+    'title': 'Portal RH - BusinessCorp',
+    'hostname': 'rh.businesscorp.com.br',
+    'port': 443,
+    'tech': ['Nginx:1.24.0', 'PHP:8.2', 'WordPress'],
+    'status_code': 200,
+}
+
+
+def _records(n: int) -> list[dict]:
+    return [{**SAMPLE, 'url': f'{SAMPLE["url"]}&page={i}'} for i in range(n)]
+
+
+def bench(
+    backend: str, records: list[dict], batch: int
+) -> tuple[float, float]:
+    codec = get_backend(backend)
+
+    start = time.perf_counter()
+    chunks = []
+    buffer: list[bytes] = []
+    for record in records:
+        buffer.append(codec.dumps(record))
+        if len(buffer) >= batch:
+            buffer.append(b'')
+            chunks.append(b'\n'.join(buffer))
+            buffer = []
+    if buffer:
+        buffer.append(b'')
+        chunks.append(b'\n'.join(buffer))
+    encode_s = time.perf_counter() - start
+
+    lines = b''.join(chunks).splitlines()
+    start = time.perf_counter()
+    for line in lines:
+        codec.loads(line)
+    decode_s = time.perf_counter() - start
+
+    return len(records) / encode_s, len(records) / decode_s
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--records', type=int, default=200_000)
+    parser.add_argument('--batch', type=int, default=200)
+    args = parser.parse_args()
+
+    records = _records(args.records)
+    print(f'{args.records} records, batch={args.batch}')
+    print(f'{"backend":<10}{"encode rec/s":>16}{"decode rec/s":>16}')
+    for backend in available_backends():
+        enc, dec = bench(backend, records, args.batch)
+        print(f'{backend:<10}{enc:>16,.0f}{dec:>16,.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Bytes on the wire and CPU per record for /hosts/stream encodings.
+
+Usage: python -m benchmarks.bench_stream_compression [--records N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+import zlib
+
+from api_tools.compression import compress_stream, supported_encodings
+from auto_recon_api.core.ndjson import iter_ndjson
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+TECH = [
+    ['Nginx:1.24.0', 'PHP:8.2', 'WordPress'],
+    ['Apache HTTP Server', 'jQuery'],
+    ['Cloudflare', 'React', 'Next.js'],
+]
+
+
+def _records(n: int) -> list[dict]:
+    rng = random.Random(42)
+    hosts = [f'app{i}.businesscorp.com.br' for i in range(20)]
+    out = []
+    for i in range(n):
+        host = rng.choice(hosts)
+        out.append({
+            'host': host,
+            'url': f'https://{host}/path/{rng.randrange(10**6)}?page={i}',
+            'title': f'{host.split(".")[0].upper()} - BusinessCorp',
+            'hostname': host,
+            'port': 443,
+            'tech': rng.choice(TECH),
+            'status_code': rng.choice([200, 200, 200, 301, 403]),
+        })
+    return out
+
+
+def _decompressor(encoding: str | None):
+    if encoding == 'gzip':
+        return zlib.decompressobj(16 + zlib.MAX_WBITS).decompress
+    if encoding == 'zstd':
+        return zstandard.ZstdDecompressor().decompressobj().decompress
+    return lambda chunk: chunk
+
+
+def bench(records: list[dict], batch: int, encoding: str | None) -> dict:
+    chunks = list(iter_ndjson(records, batch_size=batch))
+    raw = sum(len(c) for c in chunks)
+
+    start = time.perf_counter()
+    wire = list(compress_stream(chunks, encoding))
+    compress_s = time.perf_counter() - start
+
+    decompress = _decompressor(encoding)
+    start = time.perf_counter()
+    for chunk in wire:
+        decompress(chunk)
+    decompress_s = time.perf_counter() - start
+
+    sent = sum(len(c) for c in wire)
+    n = len(records)
+    return {
+        'bytes': sent,
+        'ratio': raw / sent,
+        'compress_us': compress_s / n * 1e6,
+        'decompress_us': decompress_s / n * 1e6,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--records', type=int, default=200_000)
+    parser.add_argument('--batch', type=int, default=200)
+    args = parser.parse_args()
+
+    records = _records(args.records)
+    print(f'{args.records} records, batch={args.batch}')
+    print(
+        f'{"encoding":<10}{"bytes":>14}{"ratio":>8}'
+        f'{"comp us/rec":>14}{"decomp us/rec":>16}'
+    )
+    for encoding in [None, *supported_encodings()]:
+        r = bench(records, args.batch, encoding)
+        print(
+            f'{encoding or "identity":<10}{r["bytes"]:>14,}'
+            f'{r["ratio"]:>8.1f}{r["compress_us"]:>14.2f}'
+            f'{r["decompress_us"]:>16.2f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
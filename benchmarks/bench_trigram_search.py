@@ -0,0 +1,118 @@
+"""Latency of the URL/domain `q` search with and without trigram indexes.
+
+Seeds a scratch copy of discovered_urls (same indexes) in its own schema
+and times the list endpoint's query shape with bitmap scans disabled
+(the pre-pg_trgm plan) and enabled.
+
+Usage: python -m benchmarks.bench_trigram_search [--rows N] [--keep]
+Needs DATABASE_URL pointing at a migrated database.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from auto_recon_api.core.config import get_settings
+
+SCHEMA = 'bench_trgm'
+HOSTS = 5000
+LIMIT = 50
+
+QUERIES = [
+    ('substring', "url ILIKE '%c4ca4238a0%'"),
+    ('host part', "url ILIKE '%app4242.%'"),
+    ('no match', "url ILIKE '%zzzqqq%'"),
+    ('short (prefix)', "host ILIKE 'ap%'"),
+]
+
+
+async def _seed(conn, rows: int) -> None:
+    await conn.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+    await conn.execute(text(f'CREATE SCHEMA {SCHEMA}'))
+    await conn.execute(
+        text(
+            f'CREATE TABLE {SCHEMA}.discovered_urls '
+            '(LIKE public.discovered_urls INCLUDING ALL)'
+        )
+    )
+    await conn.execute(
+        text(
+            f"""
+            INSERT INTO {SCHEMA}.discovered_urls
+                (domain_id, url, url_hash, host, created_at)
+            SELECT
+                1,
+                'https://app' || (i % {HOSTS}) || '.businesscorp.com.br/'
+                    || md5(i::text) || '/index.php?id=' || i,
+                md5(i::text),
+                'app' || (i % {HOSTS}) || '.businesscorp.com.br',
+                now() - make_interval(secs => i)
+            FROM generate_series(1, :rows) AS i
+            """
+        ),
+        {'rows': rows},
+    )
+    await conn.execute(text(f'ANALYZE {SCHEMA}.discovered_urls'))
+
+
+async def _time(conn, where: str, bitmap: bool, repeat: int) -> float:
+    sql = text(
+        f'SELECT id FROM {SCHEMA}.discovered_urls '
+        f'WHERE domain_id = 1 AND {where} '
+        f'ORDER BY created_at DESC, id DESC LIMIT {LIMIT}'
+    )
+    toggle = 'on' if bitmap else 'off'
+    setting = text(f'SET LOCAL enable_bitmapscan = {toggle}')
+    samples = []
+    for _ in range(repeat):
+        async with conn.begin():
+            await conn.execute(setting)
+            start = time.perf_counter()
+            await conn.execute(sql)
+            samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+async def main_async(rows: int, repeat: int, keep: bool) -> None:
+    engine = create_async_engine(get_settings().DATABASE_URL)
+    try:
+        async with engine.begin() as conn:
+            start = time.perf_counter()
+            await _seed(conn, rows)
+            elapsed = time.perf_counter() - start
+            print(f'seeded {rows:,} rows in {elapsed:.0f}s')
+
+        async with engine.connect() as conn:
+            print(f'{"query":<16}{"seq ms":>12}{"trgm ms":>12}')
+            for name, where in QUERIES:
+                seq = await _time(conn, where, bitmap=False, repeat=repeat)
+                trgm = await _time(conn, where, bitmap=True, repeat=repeat)
+                print(f'{name:<16}{seq:>12.1f}{trgm:>12.1f}')
+
+        if not keep:
+            async with engine.begin() as conn:
+                await conn.execute(
+                    text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+                )
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--keep', action='store_true')
+    args = parser.parse_args()
+
+    asyncio.run(main_async(args.rows, args.repeat, args.keep))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""add subdomain seen tracking
+
+Revision ID: 4d2f8e61a0b3
+Revises: 9c1e4a7b2d10
+Create Date: 2026-10-19 14:05:12.482913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4d2f8e61a0b3'
+down_revision: Union[str, Sequence[str], None] = '9c1e4a7b2d10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'subdomain',
+        sa.Column(
+            'first_seen',
+            sa.DateTime(timezone=True),
+            server_default=sa.text('now()'),
+            nullable=False,
+        ),
+    )
+    op.add_column(
+        'subdomain',
+        sa.Column(
+            'last_seen',
+            sa.DateTime(timezone=True),
+            server_default=sa.text('now()'),
+            nullable=False,
+        ),
+    )
+    op.add_column(
+        'subdomain', sa.Column('first_run_id', sa.Integer(), nullable=True)
+    )
+    op.add_column(
+        'subdomain', sa.Column('last_run_id', sa.Integer(), nullable=True)
+    )
+    op.create_foreign_key(
+        'subdomain_first_run_id_fkey',
+        'subdomain',
+        'domain_runs',
+        ['first_run_id'],
+        ['id'],
+        ondelete='SET NULL',
+    )
+    op.create_foreign_key(
+        'subdomain_last_run_id_fkey',
+        'subdomain',
+        'domain_runs',
+        ['last_run_id'],
+        ['id'],
+        ondelete='SET NULL',
+    )
+
+    # Existing rows have no run history; their timestamps are the best
+    # approximation available.
+    op.execute(
+        'UPDATE subdomain SET first_seen = created_at, '
+        'last_seen = updated_at'
+    )
+
+    op.create_index(
+        'ix_subdomain_domain_first_run',
+        'subdomain',
+        ['domain_id', 'first_run_id'],
+        unique=False,
+    )
+    op.create_index(
+        'ix_subdomain_domain_last_run',
+        'subdomain',
+        ['domain_id', 'last_run_id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_subdomain_domain_last_run', table_name='subdomain')
+    op.drop_index('ix_subdomain_domain_first_run', table_name='subdomain')
+    op.drop_constraint(
+        'subdomain_last_run_id_fkey', 'subdomain', type_='foreignkey'
+    )
+    op.drop_constraint(
+        'subdomain_first_run_id_fkey', 'subdomain', type_='foreignkey'
+    )
+    op.drop_column('subdomain', 'last_run_id')
+    op.drop_column('subdomain', 'first_run_id')
+    op.drop_column('subdomain', 'last_seen')
+    op.drop_column('subdomain', 'first_seen')
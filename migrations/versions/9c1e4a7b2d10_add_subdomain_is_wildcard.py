@@ -0,0 +1,36 @@
+"""add subdomain is_wildcard
+
+Revision ID: 9c1e4a7b2d10
+Revises: 379fbba3bf18
+Create Date: 2026-10-19 09:12:41.118203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c1e4a7b2d10'
+down_revision: Union[str, Sequence[str], None] = '379fbba3bf18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'subdomain',
+        sa.Column(
+            'is_wildcard',
+            sa.Boolean(),
+            server_default=sa.false(),
+            nullable=False,
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('subdomain', 'is_wildcard')
@@ -0,0 +1,124 @@
+"""add domain counters
+
+Revision ID: a7c3e9d15f42
+Revises: 4d2f8e61a0b3
+Create Date: 2026-10-19 16:21:37.904115
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e9d15f42'
+down_revision: Union[str, Sequence[str], None] = '4d2f8e61a0b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'domain',
+        sa.Column(
+            'subdomain_count',
+            sa.Integer(),
+            server_default='0',
+            nullable=False,
+        ),
+    )
+    op.add_column(
+        'domain',
+        sa.Column(
+            'url_count',
+            sa.Integer(),
+            server_default='0',
+            nullable=False,
+        ),
+    )
+    op.create_table(
+        'domain_status_counts',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column(
+            'count', sa.Integer(), server_default='0', nullable=False
+        ),
+        sa.ForeignKeyConstraint(
+            ['user_id'], ['users.id'], ondelete='CASCADE'
+        ),
+        sa.PrimaryKeyConstraint('user_id', 'status'),
+    )
+
+    op.execute(
+        """
+        UPDATE domain d SET
+            subdomain_count = (
+                SELECT count(*) FROM subdomain s WHERE s.domain_id = d.id
+            ),
+            url_count = (
+                SELECT count(*) FROM discovered_urls u
+                WHERE u.domain_id = d.id
+            )
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO domain_status_counts (user_id, status, count)
+        SELECT user_id, status, count(*) FROM domain
+        GROUP BY user_id, status
+        """
+    )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION domain_status_counts_sync()
+        RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE domain_status_counts SET count = count - 1
+                WHERE user_id = OLD.user_id AND status = OLD.status;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO domain_status_counts (user_id, status, count)
+                VALUES (NEW.user_id, NEW.status, 1)
+                ON CONFLICT (user_id, status)
+                DO UPDATE SET count = domain_status_counts.count + 1;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER trg_domain_status_counts
+        AFTER INSERT OR DELETE ON domain
+        FOR EACH ROW EXECUTE FUNCTION domain_status_counts_sync()
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER trg_domain_status_counts_update
+        AFTER UPDATE OF status, user_id ON domain
+        FOR EACH ROW
+        WHEN (
+            OLD.status IS DISTINCT FROM NEW.status
+            OR OLD.user_id IS DISTINCT FROM NEW.user_id
+        )
+        EXECUTE FUNCTION domain_status_counts_sync()
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(
+        'DROP TRIGGER IF EXISTS trg_domain_status_counts_update ON domain'
+    )
+    op.execute('DROP TRIGGER IF EXISTS trg_domain_status_counts ON domain')
+    op.execute('DROP FUNCTION IF EXISTS domain_status_counts_sync()')
+    op.drop_table('domain_status_counts')
+    op.drop_column('domain', 'url_count')
+    op.drop_column('domain', 'subdomain_count')
@@ -0,0 +1,35 @@
+"""add discovered url tech index
+
+Revision ID: a91c5e37d2b4
+Revises: d4e8a2c61f07
+Create Date: 2026-10-19 22:48:12.604917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a91c5e37d2b4'
+down_revision: Union[str, Sequence[str], None] = 'd4e8a2c61f07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS '
+            'ix_discovered_urls_domain_tech ON discovered_urls '
+            'USING gin (domain_id, tech jsonb_path_ops)'
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute(
+            'DROP INDEX CONCURRENTLY IF EXISTS ix_discovered_urls_domain_tech'
+        )
@@ -0,0 +1,47 @@
+"""add discovered url keyset indexes
+
+Revision ID: b2d7f04c9a61
+Revises: f3b6a1d08e59
+Create Date: 2026-10-19 21:02:44.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2d7f04c9a61'
+down_revision: Union[str, Sequence[str], None] = 'f3b6a1d08e59'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# ix_discovered_urls_domain_created_id already exists on databases created
+# from 379fbba3bf18; IF NOT EXISTS keeps this safe on both.
+INDEXES = {
+    'ix_discovered_urls_domain_created_id': 'domain_id, created_at, id',
+    'ix_discovered_urls_domain_host_created_id': (
+        'domain_id, host, created_at, id'
+    ),
+    'ix_discovered_urls_domain_status_created_id': (
+        'domain_id, status_code, created_at, id'
+    ),
+}
+NEW_INDEXES = list(INDEXES)[1:]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES.items():
+            op.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} '
+                f'ON discovered_urls ({columns})'
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name in NEW_INDEXES:
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
@@ -0,0 +1,60 @@
+"""add subdomain runs
+
+Revision ID: c6f1d3a8e927
+Revises: a91c5e37d2b4
+Create Date: 2026-10-20 10:12:44.318205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6f1d3a8e927'
+down_revision: Union[str, Sequence[str], None] = 'a91c5e37d2b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Existing rows only know the first and last run that reported them, so
+# every finished run in between is the best approximation available.
+BACKFILL = """
+INSERT INTO subdomain_runs (run_id, subdomain_id)
+SELECT r.id, s.id
+FROM subdomain s
+JOIN domain_runs r ON r.domain_id = s.domain_id
+WHERE s.last_run_id IS NOT NULL
+  AND r.id BETWEEN coalesce(s.first_run_id, s.last_run_id) AND s.last_run_id
+  AND (r.status = 'done' OR r.id = s.last_run_id)
+ON CONFLICT DO NOTHING
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'subdomain_runs',
+        sa.Column('run_id', sa.Integer(), nullable=False),
+        sa.Column('subdomain_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ['run_id'], ['domain_runs.id'], ondelete='CASCADE'
+        ),
+        sa.ForeignKeyConstraint(
+            ['subdomain_id'], ['subdomain.id'], ondelete='CASCADE'
+        ),
+        sa.PrimaryKeyConstraint('run_id', 'subdomain_id'),
+    )
+    op.create_index(
+        'ix_subdomain_runs_subdomain',
+        'subdomain_runs',
+        ['subdomain_id'],
+        unique=False,
+    )
+    op.execute(BACKFILL)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_subdomain_runs_subdomain', table_name='subdomain_runs')
+    op.drop_table('subdomain_runs')
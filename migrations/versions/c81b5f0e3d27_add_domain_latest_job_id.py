@@ -0,0 +1,49 @@
+"""add domain latest job id
+
+Revision ID: c81b5f0e3d27
+Revises: a7c3e9d15f42
+Create Date: 2026-10-19 17:48:03.215577
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c81b5f0e3d27'
+down_revision: Union[str, Sequence[str], None] = 'a7c3e9d15f42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'domain',
+        sa.Column('latest_job_id', sa.String(length=64), nullable=True),
+    )
+    op.create_index(
+        'ix_domain_runs_domain_created',
+        'domain_runs',
+        ['domain_id', 'created_at'],
+        unique=False,
+    )
+    op.execute(
+        """
+        UPDATE domain d SET latest_job_id = r.job_id
+        FROM (
+            SELECT DISTINCT ON (domain_id) domain_id, job_id
+            FROM domain_runs
+            ORDER BY domain_id, created_at DESC, id DESC
+        ) r
+        WHERE r.domain_id = d.id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_domain_runs_domain_created', table_name='domain_runs')
+    op.drop_column('domain', 'latest_job_id')
@@ -0,0 +1,70 @@
+"""add domain url facets
+
+Revision ID: d4e8a2c61f07
+Revises: b2d7f04c9a61
+Create Date: 2026-10-19 22:10:31.502214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4e8a2c61f07'
+down_revision: Union[str, Sequence[str], None] = 'b2d7f04c9a61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# One GROUP BY per facet over the existing rows; from here on the
+# rollup is kept current by the URL workers.
+BACKFILL = """
+INSERT INTO domain_url_facets (domain_id, facet, value, count)
+SELECT domain_id, 'status_code', status_code::text, count(*)
+FROM discovered_urls WHERE status_code IS NOT NULL
+GROUP BY domain_id, status_code
+UNION ALL
+SELECT domain_id, 'host', host, count(*)
+FROM discovered_urls WHERE host IS NOT NULL
+GROUP BY domain_id, host
+UNION ALL
+SELECT domain_id, 'port', port::text, count(*)
+FROM discovered_urls WHERE port IS NOT NULL
+GROUP BY domain_id, port
+UNION ALL
+SELECT domain_id, 'ext', ext, count(*)
+FROM discovered_urls WHERE ext IS NOT NULL
+GROUP BY domain_id, ext
+UNION ALL
+SELECT u.domain_id, 'tech', t.name, count(*)
+FROM discovered_urls u
+CROSS JOIN LATERAL (
+    SELECT DISTINCT jsonb_array_elements_text(u.tech) AS name
+) t
+WHERE jsonb_typeof(u.tech) = 'array' AND t.name IS NOT NULL
+GROUP BY u.domain_id, t.name
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'domain_url_facets',
+        sa.Column('domain_id', sa.Integer(), nullable=False),
+        sa.Column('facet', sa.String(length=16), nullable=False),
+        sa.Column('value', sa.Text(), nullable=False),
+        sa.Column(
+            'count', sa.BigInteger(), server_default='0', nullable=False
+        ),
+        sa.ForeignKeyConstraint(
+            ['domain_id'], ['domain.id'], ondelete='CASCADE'
+        ),
+        sa.PrimaryKeyConstraint('domain_id', 'facet', 'value'),
+    )
+    op.execute(BACKFILL)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('domain_url_facets')
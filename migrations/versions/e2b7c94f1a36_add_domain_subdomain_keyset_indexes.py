@@ -0,0 +1,39 @@
+"""add domain and subdomain keyset indexes
+
+Revision ID: e2b7c94f1a36
+Revises: c6f1d3a8e927
+Create Date: 2026-10-20 11:02:37.915604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b7c94f1a36'
+down_revision: Union[str, Sequence[str], None] = 'c6f1d3a8e927'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = (
+    ('ix_domain_user_updated_id', 'domain', 'user_id, updated_at, id'),
+    ('ix_subdomain_domain_id', 'subdomain', 'domain_id, id'),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} '
+                f'ON {table} ({columns})'
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, _, _ in INDEXES:
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
@@ -0,0 +1,49 @@
+"""add trigram search indexes
+
+Revision ID: e5a9d2c47b18
+Revises: c81b5f0e3d27
+Create Date: 2026-10-19 19:02:44.610387
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a9d2c47b18'
+down_revision: Union[str, Sequence[str], None] = 'c81b5f0e3d27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gin')
+
+    # discovered_urls can hold tens of millions of rows; build without
+    # blocking ingest.
+    with op.get_context().autocommit_block():
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS '
+            'ix_domain_user_name_trgm ON domain '
+            'USING gin (user_id, name gin_trgm_ops)'
+        )
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS '
+            'ix_discovered_urls_domain_search_trgm ON discovered_urls '
+            'USING gin (domain_id, url gin_trgm_ops, host gin_trgm_ops)'
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute(
+            'DROP INDEX CONCURRENTLY IF EXISTS '
+            'ix_discovered_urls_domain_search_trgm'
+        )
+        op.execute(
+            'DROP INDEX CONCURRENTLY IF EXISTS ix_domain_user_name_trgm'
+        )
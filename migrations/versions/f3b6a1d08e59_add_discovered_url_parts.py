@@ -0,0 +1,105 @@
+"""add discovered url parts
+
+Revision ID: f3b6a1d08e59
+Revises: e5a9d2c47b18
+Create Date: 2026-10-19 20:15:09.337841
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b6a1d08e59'
+down_revision: Union[str, Sequence[str], None] = 'e5a9d2c47b18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH = 50_000
+
+# Same rules as auto_recon_api.tasks.urls.url_fields, applied to the
+# already normalized urls.
+BACKFILL = r"""
+WITH parsed AS (
+    SELECT
+        id,
+        split_part(url, '://', 1) AS scheme,
+        COALESCE(
+            NULLIF(substring(url FROM '^[^/]+//[^/?#]*([^?#]*)'), ''), '/'
+        ) AS path,
+        substring(url FROM '\?(.*)$') AS query
+    FROM discovered_urls
+    WHERE id >= :lo AND id < :hi
+)
+UPDATE discovered_urls u SET
+    scheme = p.scheme,
+    path = p.path,
+    ext = lower(substring(p.path FROM '\.([A-Za-z0-9]{1,16})$')),
+    query_keys = ARRAY(
+        SELECT DISTINCT lower(split_part(kv, '=', 1))
+        FROM unnest(string_to_array(p.query, '&')) AS kv
+        WHERE split_part(kv, '=', 1) <> ''
+        ORDER BY 1
+    )
+FROM parsed p
+WHERE u.id = p.id
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'discovered_urls',
+        sa.Column('scheme', sa.String(length=16), nullable=True),
+    )
+    op.add_column(
+        'discovered_urls', sa.Column('path', sa.Text(), nullable=True)
+    )
+    op.add_column(
+        'discovered_urls',
+        sa.Column('ext', sa.String(length=16), nullable=True),
+    )
+    op.add_column(
+        'discovered_urls',
+        sa.Column('query_keys', postgresql.ARRAY(sa.Text()), nullable=True),
+    )
+
+    # Batches commit one by one so a large table is not rewritten in a
+    # single transaction.
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        max_id = conn.scalar(sa.text('SELECT max(id) FROM discovered_urls'))
+        for lo in range(0, (max_id or 0) + 1, BACKFILL_BATCH):
+            conn.execute(
+                sa.text(BACKFILL), {'lo': lo, 'hi': lo + BACKFILL_BATCH}
+            )
+
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS '
+            'ix_discovered_urls_domain_ext ON discovered_urls '
+            '(domain_id, ext)'
+        )
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS '
+            'ix_discovered_urls_domain_query_keys ON discovered_urls '
+            'USING gin (domain_id, query_keys)'
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute(
+            'DROP INDEX CONCURRENTLY IF EXISTS '
+            'ix_discovered_urls_domain_query_keys'
+        )
+        op.execute(
+            'DROP INDEX CONCURRENTLY IF EXISTS ix_discovered_urls_domain_ext'
+        )
+    op.drop_column('discovered_urls', 'query_keys')
+    op.drop_column('discovered_urls', 'ext')
+    op.drop_column('discovered_urls', 'path')
+    op.drop_column('discovered_urls', 'scheme')
@@ -0,0 +1,101 @@
+"""add discovered url tech names
+
+Revision ID: f8d2a6b13c50
+Revises: e2b7c94f1a36
+Create Date: 2026-10-20 11:48:05.207391
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f8d2a6b13c50'
+down_revision: Union[str, Sequence[str], None] = 'e2b7c94f1a36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH = 50_000
+
+# Same rules as auto_recon_api.tasks.urls.tech_names.
+BACKFILL = """
+UPDATE discovered_urls SET tech_names = CASE
+    WHEN jsonb_typeof(tech) = 'array' THEN ARRAY(
+        SELECT DISTINCT lower(trim(split_part(t, ':', 1)))
+        FROM jsonb_array_elements_text(tech) AS t
+        WHERE trim(split_part(t, ':', 1)) <> ''
+        ORDER BY 1
+    )
+    ELSE '{}'
+END
+WHERE id >= :lo AND id < :hi
+"""
+
+# The tech facet rows were counted per raw (versioned) string; recount
+# them from the normalized names.
+RECOUNT_FACETS = """
+INSERT INTO domain_url_facets (domain_id, facet, value, count)
+SELECT domain_id, 'tech', name, count(*)
+FROM discovered_urls, unnest(tech_names) AS name
+GROUP BY domain_id, name
+"""
+RECOUNT_RAW_FACETS = """
+INSERT INTO domain_url_facets (domain_id, facet, value, count)
+SELECT u.domain_id, 'tech', t.name, count(*)
+FROM discovered_urls u
+CROSS JOIN LATERAL (
+    SELECT DISTINCT jsonb_array_elements_text(u.tech) AS name
+) t
+WHERE jsonb_typeof(u.tech) = 'array' AND t.name IS NOT NULL
+GROUP BY u.domain_id, t.name
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'discovered_urls',
+        sa.Column('tech_names', postgresql.ARRAY(sa.Text()), nullable=True),
+    )
+
+    # Batches commit one by one so a large table is not rewritten in a
+    # single transaction.
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        max_id = conn.scalar(sa.text('SELECT max(id) FROM discovered_urls'))
+        for lo in range(0, (max_id or 0) + 1, BACKFILL_BATCH):
+            conn.execute(
+                sa.text(BACKFILL), {'lo': lo, 'hi': lo + BACKFILL_BATCH}
+            )
+
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS '
+            'ix_discovered_urls_domain_tech_names ON discovered_urls '
+            'USING gin (domain_id, tech_names)'
+        )
+        op.execute(
+            'DROP INDEX CONCURRENTLY IF EXISTS ix_discovered_urls_domain_tech'
+        )
+
+    op.execute("DELETE FROM domain_url_facets WHERE facet = 'tech'")
+    op.execute(RECOUNT_FACETS)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS '
+            'ix_discovered_urls_domain_tech ON discovered_urls '
+            'USING gin (domain_id, tech jsonb_path_ops)'
+        )
+        op.execute(
+            'DROP INDEX CONCURRENTLY IF EXISTS '
+            'ix_discovered_urls_domain_tech_names'
+        )
+    op.execute("DELETE FROM domain_url_facets WHERE facet = 'tech'")
+    op.execute(RECOUNT_RAW_FACETS)
+    op.drop_column('discovered_urls', 'tech_names')
@@ -1,24 +1,41 @@
 import os
+import sys
+from pathlib import Path
 
 import factory
 import pytest
 import pytest_asyncio
 from fastapi.testclient import TestClient
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from testcontainers.postgres import PostgresContainer
 
 from auto_recon_api.app import app
-from auto_recon_api.db.session import get_db
+from auto_recon_api.core.config import get_settings
+from auto_recon_api.db.session import get_db, get_sessionmaker
 from auto_recon_api.models import Domain, User, table_registry
 from auto_recon_api.security import get_password_hash
 from auto_recon_api.settings import Settings
 
+# recon_tool (api_tools/) runs from its own directory and imports its
+# modules by bare name; its tests import them the same way.
+sys.path.append(str(Path(__file__).resolve().parents[1] / 'api_tools'))
+
 
 @pytest.fixture(scope='session', autouse=True)
 def set_testing_env():
     os.environ['TESTING'] = '1'
 
 
+@pytest.fixture(autouse=True)
+def fast_recon_retries(monkeypatch):
+    # Failing recon_tool fakes go through the worker retry loop.
+    monkeypatch.setattr(get_settings(), 'RECON_RETRY_BASE_DELAY', 0.0)
+
+
 @pytest.fixture
 def client(session):
     async def get_db_override():
@@ -31,6 +48,14 @@ def client(session):
     app.dependency_overrides.clear()
 
 
+@pytest.fixture
+def export_sessions(client, session):
+    # Export endpoints stream from their own session.
+    app.dependency_overrides[get_sessionmaker] = lambda: async_sessionmaker(
+        session.bind, expire_on_commit=False
+    )
+
+
 @pytest.fixture(scope='session')
 def engine():
     with PostgresContainer('postgres:16', driver='psycopg') as postgres:
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import io
+import json
+import time
+
+import app
+import pytest
+from tasks import ToolOutput
+
+DEADLINE = 0.2
+RECORDS = 5
+BATCH = 2
+
+
+@pytest.fixture
+def no_dns(monkeypatch):
+    monkeypatch.setattr(app, 'get_ip', lambda subs: subs)
+    monkeypatch.setattr(
+        app, 'flag_wildcards', lambda domain, subs, **kw: (subs, [])
+    )
+
+
+def test_collect_subdomains_reports_tools_past_the_deadline(
+    monkeypatch, no_dns
+):
+    monkeypatch.setattr(app, 'TOOL_TIMEOUT', 0)
+    monkeypatch.setattr(app.settings, 'TOOL_QUEUE_TIMEOUT', DEADLINE)
+
+    def run_subfinder(domain, force_refresh):
+        return [{'host': f'a.{domain}'}], False
+
+    def run_assetfinder(domain, force_refresh):
+        time.sleep(DEADLINE * 3)
+        return [{'host': f'b.{domain}'}], False
+
+    monkeypatch.setattr(app, 'run_subfinder', run_subfinder)
+    monkeypatch.setattr(app, 'run_assetfinder', run_assetfinder)
+
+    subdomains, _, partial_tools = app.collect_subdomains('example.com')
+
+    assert subdomains == [{'host': 'a.example.com'}]
+    assert partial_tools == ['assetfinder']
+
+
+def httpx_output(count: int) -> ToolOutput:
+    lines = b''.join(
+        json.dumps({
+            'url': f'https://a.example.com/{i}',
+            'host': 'a.example.com',
+            'port': '443',
+            'status_code': 200,
+        }).encode()
+        + b'\n'
+        for i in range(count)
+    )
+    return ToolOutput(io.BytesIO(lines), len(lines))
+
+
+def test_iter_host_results_streams_records_in_batches(monkeypatch):
+    output = httpx_output(RECORDS)
+    monkeypatch.setattr(
+        app, 'run_discover_urls', lambda host, force_refresh: (output, True)
+    )
+
+    batches = list(app.iter_host_results(['a.example.com'], batch_size=BATCH))
+
+    assert [len(b) for b in batches] == [BATCH, BATCH, 1, 1]
+    assert batches[0][0]['url'] == 'https://a.example.com/0'
+    assert batches[-1] == [{'host': 'a.example.com', 'partial': True}]
+    assert output.source.closed
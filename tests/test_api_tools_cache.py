@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import io
+import os
+import time
+from contextlib import nullcontext
+
+import pytest
+import tasks
+from cache import ToolCache
+
+TTL = 60
+ENTRY = b'a.example.com\n'
+MAX_BYTES = 2 * len(ENTRY) + 1
+
+
+def make_cache(tmp_path, max_bytes=1024):
+    return ToolCache(tmp_path, max_bytes=max_bytes, ttls={'subfinder': TTL})
+
+
+def put(cache, target, data=ENTRY):
+    cache.put('subfinder', ['subfinder'], target, io.BytesIO(data), len(data))
+
+
+def read(cache, target):
+    fh = cache.get('subfinder', ['subfinder'], target)
+    if fh is None:
+        return None
+    with fh:
+        return fh.read()
+
+
+def entry_path(cache, target):
+    return cache._path(cache.key('subfinder', ['subfinder'], target))
+
+
+def age(path, atime=None, mtime=None):
+    stat = path.stat()
+    os.utime(path, (atime or stat.st_atime, mtime or stat.st_mtime))
+
+
+def test_get_returns_stored_output(tmp_path):
+    cache = make_cache(tmp_path)
+    put(cache, 'a.com')
+
+    assert read(cache, 'a.com') == ENTRY
+    assert read(cache, 'b.com') is None
+
+
+def test_disabled_without_ttl(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put('gau', ['gau'], 'a.com', io.BytesIO(ENTRY), len(ENTRY))
+
+    assert cache.get('gau', ['gau'], 'a.com') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_entry_expires_by_mtime(tmp_path):
+    cache = make_cache(tmp_path)
+    put(cache, 'a.com')
+    path = entry_path(cache, 'a.com')
+
+    # A recent read does not extend the TTL; only the write time counts.
+    age(path, atime=time.time(), mtime=time.time() - TTL - 1)
+
+    assert read(cache, 'a.com') is None
+    assert not path.exists()
+
+
+def test_eviction_drops_least_recently_read(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=MAX_BYTES)
+    put(cache, 'old.com')
+    put(cache, 'new.com')
+    now = time.time()
+    age(entry_path(cache, 'old.com'), atime=now - 20)
+    age(entry_path(cache, 'new.com'), atime=now - 10)
+
+    # Reading old.com makes new.com the least recently used entry.
+    assert read(cache, 'old.com') == ENTRY
+    put(cache, 'third.com')
+
+    assert read(cache, 'new.com') is None
+    assert read(cache, 'old.com') == ENTRY
+    assert read(cache, 'third.com') == ENTRY
+    assert cache.stats()['bytes'] <= MAX_BYTES
+
+
+def test_entry_larger_than_cache_is_not_stored(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=len(ENTRY) - 1)
+    put(cache, 'a.com')
+
+    assert cache.stats()['entries'] == 0
+
+
+@pytest.fixture
+def tool_cache(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path)
+    monkeypatch.setattr(tasks, 'get_cache', lambda: cache)
+    monkeypatch.setattr(tasks, '_tool_slot', lambda tool: nullcontext())
+    return cache
+
+
+@pytest.mark.parametrize('partial', [False, True])
+def test_run_command_caches_only_complete_runs(
+    monkeypatch, tool_cache, partial
+):
+    def run_process(command, tool_name, timeout):
+        return tasks.ToolOutput(io.BytesIO(ENTRY), len(ENTRY), partial)
+
+    monkeypatch.setattr(tasks, 'run_process', run_process)
+
+    with tasks.run_command(['subfinder'], 'subfinder', target='a.com'):
+        pass
+
+    assert (read(tool_cache, 'a.com') is None) is partial
+
+
+def test_run_command_does_not_cache_timed_out_run(monkeypatch, tool_cache):
+    class S:
+        TOOL_OUTPUT_MEMORY_BYTES = 1024
+        TOOL_OUTPUT_MAX_BYTES = 1024
+        TOOL_SPOOL_DIR = None
+
+    monkeypatch.setattr(tasks, 'get_settings', S)
+    command = ['sh', '-c', 'echo a.example.com; sleep 10']
+
+    with tasks.run_command(
+        command, 'subfinder', timeout=1, target='a.com'
+    ) as output:
+        assert output.partial
+        assert list(output.lines()) == ['a.example.com']
+
+    assert tool_cache.get('subfinder', command, 'a.com') is None
+
+
+def test_run_command_force_refresh_skips_cached_output(
+    monkeypatch, tool_cache
+):
+    put(tool_cache, 'a.com', b'stale.example.com\n')
+    fresh = b'fresh.example.com\n'
+
+    def run_process(command, tool_name, timeout):
+        return tasks.ToolOutput(io.BytesIO(fresh), len(fresh))
+
+    monkeypatch.setattr(tasks, 'run_process', run_process)
+
+    with tasks.run_command(
+        ['subfinder'], 'subfinder', target='a.com', force_refresh=True
+    ) as output:
+        assert list(output.lines()) == ['fresh.example.com']
+
+    assert read(tool_cache, 'a.com') == fresh
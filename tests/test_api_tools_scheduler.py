@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+from scheduler import SchedulerTimeout, ToolScheduler
+
+WAIT = 2.0
+SHORT = 0.05
+QUEUED = 3
+GAU_LIMIT = 2
+
+
+def wait_until(predicate, timeout: float = WAIT) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError('condition not reached')
+        time.sleep(0.005)
+
+
+def start_waiter(scheduler, tool, started, timeout=WAIT):
+    # Takes a slot from a thread and keeps it until `release` is set.
+    release = threading.Event()
+
+    def run():
+        with scheduler.slot(tool, timeout=timeout):
+            started.append(tool)
+            release.wait(WAIT)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, release
+
+
+def queued(scheduler, tool=None) -> int:
+    snap = scheduler.snapshot()
+    if tool is None:
+        return snap['queued']
+    return snap['tools'].get(tool, {}).get('queued', 0)
+
+
+def test_global_cap_is_respected():
+    scheduler = ToolScheduler({'gau': 2, 'httpx': 2}, max_processes=2)
+    scheduler.acquire('gau')
+    scheduler.acquire('httpx')
+
+    # Both tools still have room; only the global budget is exhausted.
+    with pytest.raises(SchedulerTimeout):
+        scheduler.acquire('gau', timeout=SHORT)
+
+    scheduler.release('httpx')
+    scheduler.acquire('gau', timeout=WAIT)
+
+    snap = scheduler.snapshot()
+    assert snap['running'] == snap['max_processes']
+    assert snap['tools']['gau']['running'] == snap['max_processes']
+
+
+def test_busy_tool_does_not_starve_another():
+    scheduler = ToolScheduler(
+        {'gau': GAU_LIMIT, 'httpx': 2}, max_processes=GAU_LIMIT + 1
+    )
+    scheduler.acquire('gau')
+    scheduler.acquire('gau')
+
+    started = []
+    waiters = [start_waiter(scheduler, 'gau', started) for _ in range(QUEUED)]
+    wait_until(lambda: queued(scheduler, 'gau') == QUEUED)
+
+    # Younger than every queued gau request, but gau is at its own limit,
+    # so httpx gets the free global slot right away.
+    scheduler.acquire('httpx', timeout=SHORT)
+
+    assert started == []
+    assert queued(scheduler, 'gau') == QUEUED
+
+    scheduler.release('httpx')
+    scheduler.release('gau')
+    scheduler.release('gau')
+    wait_until(lambda: len(started) == GAU_LIMIT)
+    for thread, release in waiters:
+        release.set()
+        thread.join(WAIT)
+    assert started == ['gau'] * QUEUED
+
+
+def test_oldest_waiter_gets_the_next_global_slot():
+    scheduler = ToolScheduler({'gau': 1, 'httpx': 1}, max_processes=1)
+    scheduler.acquire('gau')
+
+    started = []
+    first, release_first = start_waiter(scheduler, 'httpx', started)
+    wait_until(lambda: queued(scheduler) == 1)
+    second, release_second = start_waiter(scheduler, 'gau', started)
+    wait_until(lambda: queued(scheduler, 'gau') == 1)
+
+    scheduler.release('gau')
+    wait_until(lambda: started == ['httpx'])
+    release_first.set()
+    wait_until(lambda: started == ['httpx', 'gau'])
+    release_second.set()
+    first.join(WAIT)
+    second.join(WAIT)
+
+    assert scheduler.snapshot()['running'] == 0
+
+
+def test_timed_out_waiter_leaves_the_queue():
+    scheduler = ToolScheduler({'gau': 1}, max_processes=1)
+    scheduler.acquire('gau')
+
+    with pytest.raises(SchedulerTimeout):
+        scheduler.acquire('gau', timeout=SHORT)
+
+    gau = scheduler.snapshot()['tools']['gau']
+    assert gau['queued'] == 0
+    assert gau['timed_out'] == 1
+
+    scheduler.release('gau')
+    with scheduler.slot('gau', timeout=SHORT):
+        assert scheduler.snapshot()['running'] == 1
+
+
+def test_slot_is_released_when_the_body_raises():
+    scheduler = ToolScheduler({'gau': 1}, max_processes=1)
+
+    with pytest.raises(RuntimeError), scheduler.slot('gau'):
+        raise RuntimeError('tool crashed')
+
+    snap = scheduler.snapshot()
+    assert snap['running'] == 0
+    assert snap['tools']['gau']['completed'] == 1
+    with scheduler.slot('gau', timeout=SHORT):
+        pass
+
+
+def test_unknown_tool_uses_default_limit():
+    scheduler = ToolScheduler({}, max_processes=4, default_limit=1)
+    scheduler.acquire('nuclei')
+
+    with pytest.raises(SchedulerTimeout):
+        scheduler.acquire('nuclei', timeout=SHORT)
+
+    assert scheduler.limit_for('nuclei') == 1
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import io
+
+import pytest
+import tasks
+from spool import OutputSpool, TailBuffer, iter_lines
+
+MEMORY_BYTES = 64
+MAX_BYTES = 1024
+LINES = 5000
+
+
+@pytest.fixture
+def small_spool(monkeypatch, tmp_path):
+    # Tiny in-memory threshold so every run below spills to disk.
+    class S:
+        TOOL_OUTPUT_MEMORY_BYTES = MEMORY_BYTES
+        TOOL_OUTPUT_MAX_BYTES = 16 * 1024 * 1024
+        TOOL_SPOOL_DIR = str(tmp_path)
+
+    monkeypatch.setattr(tasks, 'get_settings', S)
+
+
+def test_spool_rolls_over_to_disk_past_memory_threshold(tmp_path):
+    spool = OutputSpool(MEMORY_BYTES, MAX_BYTES, directory=str(tmp_path))
+    spool.write(b'x' * MEMORY_BYTES)
+    assert not spool._file._rolled
+
+    spool.write(b'y\n')
+
+    assert spool._file._rolled
+    assert spool.size == MEMORY_BYTES + 2
+    assert spool.raw().read() == b'x' * MEMORY_BYTES + b'y\n'
+    spool.close()
+
+
+def test_spool_stops_at_max_bytes():
+    spool = OutputSpool(MEMORY_BYTES, MAX_BYTES)
+    killed = []
+
+    spool.fill(io.BytesIO(b'z' * (MAX_BYTES * 3)), lambda: killed.append(1))
+
+    assert spool.truncated
+    assert spool.size == MAX_BYTES
+    assert killed == [1]
+    spool.close()
+
+
+def test_tail_buffer_keeps_last_bytes():
+    tail = TailBuffer(limit=4)
+    tail.fill(io.BytesIO(b'warning\nerror'))
+
+    assert tail.text() == 'rror'
+
+
+def test_iter_lines_drops_incomplete_last_line():
+    source = io.BytesIO(b'a\nb\npartial')
+
+    assert list(iter_lines(source)) == ['a\n', 'b\n', 'partial']
+    assert list(iter_lines(source, drop_incomplete=True)) == ['a\n', 'b\n']
+
+
+def test_run_process_spills_large_output(small_spool):
+    output = tasks.run_process(
+        ['sh', '-c', f'seq 1 {LINES}'], 'seq', timeout=10
+    )
+
+    with output:
+        assert not output.partial
+        assert output.source._rolled
+        assert list(output.lines()) == [str(i) for i in range(1, LINES + 1)]
+
+
+def test_run_process_keeps_partial_output_on_timeout(small_spool):
+    output = tasks.run_process(
+        ['sh', '-c', 'echo first; echo second; printf half; sleep 10'],
+        'slow',
+        timeout=1,
+    )
+
+    with output:
+        assert output.partial
+        # The record cut at the deadline is dropped, the others are kept.
+        assert list(output.lines()) == ['first', 'second']
+
+
+def test_run_process_failure_raises_with_stderr(small_spool):
+    with pytest.raises(RuntimeError, match='boom'):
+        tasks.run_process(['sh', '-c', 'echo boom >&2; exit 3'], 'bad', 10)
+
+
+def test_piped_input_reaches_the_tool_intact(small_spool):
+    urls = [
+        f'https://h{i}.example.com/p?q={i}&s=á{"x" * (i % 90)}'
+        for i in range(LINES)
+    ]
+    data = ''.join(f'{url}\n' for url in urls).encode()
+    source = OutputSpool(MEMORY_BYTES, len(data))
+    source.write(data)
+    gau = tasks.ToolOutput(source.raw(), source.size)
+
+    # cat stands in for httpx: whatever it reads must match what gau wrote.
+    with gau:
+        output = tasks.run_process(['cat'], 'httpx', timeout=10, input=gau)
+
+    with output:
+        assert output.size == len(data)
+        assert list(output.lines()) == urls
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import gzip
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from auto_recon_api.core.export import (
+    encode_csv,
+    encode_ndjson,
+    export_headers,
+    gzip_chunks,
+)
+
+COLUMNS = ('id', 'url', 'tech', 'created_at')
+CREATED = datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+BATCHES = [
+    [(1, 'http://a.com/', ['nginx'], CREATED)],
+    [(2, 'http://b.com/', None, CREATED), (3, 'http://c.com/x', [], None)],
+]
+
+
+async def batches():
+    for batch in BATCHES:
+        yield batch
+
+
+async def collect(chunks) -> bytes:
+    return b''.join([chunk async for chunk in chunks])
+
+
+@pytest.mark.asyncio
+async def test_encode_ndjson_one_line_per_row():
+    body = await collect(encode_ndjson(batches(), COLUMNS, backend='json'))
+
+    rows = [json.loads(line) for line in body.splitlines()]
+    assert [r['id'] for r in rows] == [1, 2, 3]
+    assert rows[0]['tech'] == ['nginx']
+    assert rows[0]['created_at'] == CREATED.isoformat()
+    assert body.endswith(b'\n')
+
+
+@pytest.mark.asyncio
+async def test_encode_csv_writes_header_once():
+    body = await collect(encode_csv(batches(), COLUMNS))
+
+    lines = body.decode().splitlines()
+    assert lines[0] == 'id,url,tech,created_at'
+    assert lines[1] == f'1,http://a.com/,"[""nginx""]",{CREATED.isoformat()}'
+    assert lines[3] == '3,http://c.com/x,[],'
+
+
+@pytest.mark.asyncio
+async def test_gzip_chunks_round_trip():
+    plain = await collect(encode_csv(batches(), COLUMNS))
+
+    compressed = await collect(gzip_chunks(encode_csv(batches(), COLUMNS)))
+
+    assert gzip.decompress(compressed) == plain
+
+
+def test_export_headers():
+    assert export_headers('a.com-urls', 'csv', False) == (
+        'text/csv',
+        {'Content-Disposition': 'attachment; filename="a.com-urls.csv"'},
+    )
+    media_type, headers = export_headers('a.com-urls', 'ndjson', True)
+    assert media_type == 'application/gzip'
+    assert headers['Content-Disposition'].endswith('a.com-urls.ndjson.gz"')
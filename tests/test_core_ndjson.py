@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from auto_recon_api.core import ndjson
+from auto_recon_api.core.ndjson import (
+    available_backends,
+    dumps,
+    get_backend,
+    iter_ndjson,
+    loads,
+)
+
+THREE = 3
+RECORD = {
+    'host': 'a.example.com',
+    'url': 'https://a.example.com/ç',
+    'port': 443,
+    'tech': ['nginx'],
+}
+
+
+def test_stdlib_backend_always_available():
+    assert 'json' in available_backends()
+    assert get_backend('json').name == 'json'
+
+
+def test_default_backend_follows_preference():
+    assert get_backend().name == available_backends()[0]
+
+
+@pytest.mark.parametrize('backend', available_backends())
+def test_roundtrip(backend):
+    encoded = dumps(RECORD, backend)
+    assert isinstance(encoded, bytes)
+    assert b'\n' not in encoded
+    assert loads(encoded, backend) == RECORD
+    assert loads(encoded.decode('utf-8'), backend) == RECORD
+
+
+@pytest.mark.parametrize('backend', available_backends())
+def test_invalid_input_raises_value_error(backend):
+    with pytest.raises(ValueError):  # noqa: PT011
+        loads('{not json', backend)
+
+
+def test_unknown_backend_raises():
+    with pytest.raises(RuntimeError):
+        get_backend('nope')
+
+
+def test_iter_ndjson_batches_records():
+    items = [{'i': i} for i in range(5)]
+
+    chunks = list(iter_ndjson(items, batch_size=2, backend='json'))
+
+    assert len(chunks) == THREE
+    body = b''.join(chunks)
+    assert body.endswith(b'\n')
+    assert [loads(line) for line in body.splitlines()] == items
+
+
+def test_iter_ndjson_empty():
+    assert list(iter_ndjson([], batch_size=10)) == []
+
+
+def test_missing_optional_backend(monkeypatch):
+    monkeypatch.setattr(ndjson, 'orjson', None)
+    monkeypatch.setattr(ndjson, 'msgspec', None)
+
+    assert available_backends() == ['json']
+
+
+def test_api_tools_copy_is_in_sync():
+    root = Path(__file__).resolve().parent.parent
+    core = root / 'auto_recon_api' / 'core' / 'ndjson.py'
+    tools = root / 'api_tools' / 'ndjson.py'
+
+    assert core.read_bytes() == tools.read_bytes()
@@ -1,11 +1,37 @@
 from __future__ import annotations
 
+from datetime import datetime, timezone
+
 import pytest
 
-from auto_recon_api.core.pagination import decode_cursor
+from auto_recon_api.core.pagination import (
+    decode_cursor,
+    decode_id_cursor,
+    encode_cursor,
+    encode_id_cursor,
+)
+
+CURSOR_ID = 42
 
 
 def test_decode_cursor_invalid_raises():
     with pytest.raises(ValueError):  # noqa: PT011
         # missing separator and invalid ISO timestamp
         decode_cursor("invalid-cursor")
+
+
+def test_cursor_round_trip_drops_timezone():
+    ts = datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+    assert decode_cursor(encode_cursor(ts, CURSOR_ID)) == (
+        ts.replace(tzinfo=None),
+        CURSOR_ID,
+    )
+
+
+def test_id_cursor_round_trip_and_rejects_garbage():
+    assert decode_id_cursor(encode_id_cursor(CURSOR_ID)) == CURSOR_ID
+
+    for bad in ('abc', '0', '-3'):
+        with pytest.raises(ValueError):  # noqa: PT011
+            decode_id_cursor(bad)
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import httpx
+import pytest
+
+from auto_recon_api.core import recon_tool as rt_mod
+from auto_recon_api.core.recon_tool import (
+    ReconToolJobError,
+    ToolRouter,
+    iter_job_records,
+)
+
+BASE = 'http://tools'
+URLS = ['http://tools-a', 'http://tools-b', 'http://tools-c']
+EJECT = 30
+
+
+class FakeResponse:
+    def __init__(self, lines, fail_after=None):
+        self._lines = lines
+        self._fail_after = fail_after
+
+    @staticmethod
+    def raise_for_status():
+        return None
+
+    @staticmethod
+    def json():
+        return {'id': 'job1'}
+
+    async def aiter_lines(self):
+        for i, line in enumerate(self._lines):
+            if i == self._fail_after:
+                raise httpx.RemoteProtocolError('connection dropped')
+            yield line
+
+
+class FakeStreamCtx:
+    def __init__(self, response):
+        self.response = response
+
+    async def __aenter__(self):
+        return self.response
+
+    async def __aexit__(self, *a):
+        return False
+
+
+class FakeClient:
+    def __init__(self, streams):
+        self._streams = list(streams)
+        self.posted = []
+        self.offsets = []
+
+    async def post(self, url, json=None, headers=None):
+        self.posted.append((url, json))
+        return FakeResponse([])
+
+    def stream(self, method, url, headers=None, params=None):
+        self.offsets.append(params['offset'])
+        lines = self._streams.pop(0)
+        if isinstance(lines, tuple):
+            return FakeStreamCtx(FakeResponse(*lines))
+        return FakeStreamCtx(FakeResponse(lines))
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    async def sleep(delay):
+        return None
+
+    monkeypatch.setattr(rt_mod.asyncio, 'sleep', sleep)
+
+
+async def collect(client, **kwargs):
+    return [
+        r
+        async for r in iter_job_records(
+            client, BASE, {'kind': 'hosts'}, **kwargs
+        )
+    ]
+
+
+@pytest.mark.asyncio
+async def test_iter_job_records_skips_heartbeats():
+    client = FakeClient([['{"url": "a"}', '', '{"url": "b"}']])
+
+    records = await collect(client)
+
+    assert [r['url'] for r in records] == ['a', 'b']
+    assert client.posted == [(f'{BASE}/jobs', {'kind': 'hosts'})]
+    assert client.offsets == [0]
+
+
+@pytest.mark.asyncio
+async def test_iter_job_records_resumes_from_offset_after_drop():
+    client = FakeClient([
+        (['{"url": "a"}', '{"url": "b"}', '{"url": "c"}'], 2),
+        ['{"url": "c"}'],
+    ])
+
+    records = await collect(client)
+
+    assert [r['url'] for r in records] == ['a', 'b', 'c']
+    assert client.offsets == [0, 2]
+
+
+@pytest.mark.asyncio
+async def test_iter_job_records_gives_up_after_max_reconnects():
+    client = FakeClient([(['{"url": "a"}'], 0), (['{"url": "a"}'], 0)])
+
+    with pytest.raises(httpx.RemoteProtocolError):
+        await collect(client, max_reconnects=1)
+
+
+@pytest.mark.asyncio
+async def test_iter_job_records_raises_job_error():
+    client = FakeClient([['{"url": "a"}', '{"job_error": "boom"}']])
+
+    with pytest.raises(ReconToolJobError, match='boom'):
+        await collect(client)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_router_is_sticky_per_key():
+    router = ToolRouter(URLS)
+
+    picks = {router.pick('example.com').url for _ in range(10)}
+
+    assert len(picks) == 1
+
+
+def test_router_spreads_keys():
+    router = ToolRouter(URLS)
+
+    picks = {router.pick(f'domain{i}.com').url for i in range(50)}
+
+    assert picks == set(URLS)
+
+
+def test_router_moves_off_busy_endpoint():
+    router = ToolRouter(URLS, slack=1)
+    preferred = router.pick('example.com')
+    preferred.outstanding = 2
+
+    assert router.pick('example.com') is not preferred
+
+    preferred.outstanding = 1
+    assert router.pick('example.com') is preferred
+
+
+@pytest.mark.asyncio
+async def test_router_ejects_failing_endpoint_and_recovers():
+    clock = Clock()
+    router = ToolRouter(URLS, max_failures=2, eject_seconds=EJECT, clock=clock)
+    preferred = router.pick('example.com')
+
+    for _ in range(2):
+        with pytest.raises(httpx.ConnectError):
+            async with router.use('example.com'):
+                raise httpx.ConnectError('down')
+
+    assert preferred not in router.healthy()
+    assert router.pick('example.com') is not preferred
+    assert preferred.outstanding == 0
+
+    clock.now = EJECT + 1
+    async with router.use('example.com') as url:
+        assert url == preferred.url
+    assert preferred.failures == 0
+
+
+@pytest.mark.asyncio
+async def test_router_ignores_client_errors():
+    router = ToolRouter(URLS, max_failures=1)
+    preferred = router.pick('example.com')
+
+    with pytest.raises(ValueError):  # noqa: PT011
+        async with router.use('example.com'):
+            raise ValueError('bad payload')
+
+    assert preferred in router.healthy()
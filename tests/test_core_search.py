@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from auto_recon_api.core.search import escape_like, search_clause
+from auto_recon_api.models import DiscoveredURL, Domain
+
+
+def compile_sql(clause) -> str:
+    return str(
+        clause.compile(
+            dialect=postgresql.dialect(),
+            compile_kwargs={'literal_binds': True},
+        )
+    )
+
+
+def test_escape_like_escapes_wildcards():
+    assert escape_like(r'50%_off\x') == r'50\%\_off\\x'
+
+
+def test_search_clause_uses_substring_match_on_raw_column():
+    sql = compile_sql(search_clause(Domain.name, 'corp'))
+
+    assert sql.startswith('domain.name ILIKE')
+    assert "'%%corp%%'" in sql
+    assert 'lower(' not in sql
+
+
+def test_search_clause_rejects_query_the_index_cannot_answer():
+    with pytest.raises(ValueError, match='at least 3'):
+        search_clause(DiscoveredURL.url, 'ap')
+
+    sql = compile_sql(search_clause(DiscoveredURL.url, 'api'))
+    assert "'%%api%%'" in sql
@@ -1,14 +1,26 @@
 from __future__ import annotations
 
+import csv
+import gzip
+import io
+import json
 from datetime import datetime, timedelta, timezone
 from http import HTTPStatus
 from typing import Any
 
 import pytest
 import pytest_asyncio
+from sqlalchemy.ext.asyncio import async_sessionmaker
 
 from auto_recon_api.core.pagination import decode_cursor, encode_cursor
 from auto_recon_api.models import DiscoveredURL, Domain
+from auto_recon_api.tasks.urls import (
+    _flush_urls,  # noqa: PLC2701
+    normalize_url,
+    tech_names,
+    url_fields,
+    url_hash,
+)
 
 
 def auth_headers(token: str) -> dict[str, str]:
@@ -106,6 +118,7 @@ async def urls_seeded(session, domain):
         status_code=HTTPStatus.OK,
         title='pdf',
         tech=None,
+        ext='pdf',
     )
     a.created_at = base - timedelta(hours=1)
     b = DiscoveredURL(
@@ -118,6 +131,8 @@ async def urls_seeded(session, domain):
         status_code=HTTPStatus.OK,
         title='pdf',
         tech=None,
+        ext='pdf',
+        query_keys=['x'],
     )
     b.created_at = base - timedelta(hours=1, seconds=1)
     extra.extend([a, b])
@@ -239,7 +254,15 @@ async def test_urls_host_status_q_ext(client, token, domain, urls_seeded):
     assert items
     assert all('/p1' in i['url'] for i in items)
 
-    # ext (regex \.ext(\?|$)) - deve pegar .pdf e .PDF?x=1
+    # q com menos de 3 caracteres não usaria o índice trigram
+    r = client.get(
+        f'/api/v1/domains/{domain.id}/urls',
+        headers=auth_headers(token),
+        params={'limit': 200, 'q': 'P1'},
+    )
+    assert r.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+    # ext (coluna preenchida na ingestão) - deve pegar .pdf e .PDF?x=1
     r = client.get(
         f'/api/v1/domains/{domain.id}/urls',
         headers=auth_headers(token),
@@ -253,6 +276,17 @@ async def test_urls_host_status_q_ext(client, token, domain, urls_seeded):
         for i in items
     )
 
+    # param (nomes dos parâmetros da query string)
+    r = client.get(
+        f'/api/v1/domains/{domain.id}/urls',
+        headers=auth_headers(token),
+        params={'limit': 200, 'param': 'X'},
+    )
+    assert r.status_code == HTTPStatus.OK
+    assert [i['url'] for i in r.json()['items']] == [
+        'https://rh.businesscorp.com.br/uploads/b.PDF?x=1'
+    ]
+
 
 def test_domain_urls_invalid_cursor_400(client, token, domain):
     r = client.get(
@@ -326,3 +360,164 @@ async def test_domain_urls_cursor_matches_last_item_and_next_page_is_older(
         first2_ts < last_ts
         or (first2_ts == last_ts and first2_id < last_id)
     )
+
+
+@pytest.mark.asyncio
+async def test_export_urls_ndjson_gzip_matches_filters(
+    client, token, domain, urls_seeded, export_sessions
+):
+    r = client.get(
+        f'/api/v1/domains/{domain.id}/urls/export',
+        headers=auth_headers(token),
+        params={'status_code': 404, 'gzip': True},
+    )
+
+    assert r.status_code == HTTPStatus.OK
+    assert r.headers['content-type'] == 'application/gzip'
+    assert 'teste.com-urls.ndjson.gz' in r.headers['content-disposition']
+    rows = [json.loads(line) for line in gzip.decompress(r.content).split()]
+    expected = 30
+    assert len(rows) == expected
+    assert all(row['status_code'] == HTTPStatus.NOT_FOUND for row in rows)
+
+
+@pytest.mark.asyncio
+async def test_export_urls_csv_has_every_row(
+    client, token, domain, urls_seeded, export_sessions
+):
+    r = client.get(
+        f'/api/v1/domains/{domain.id}/urls/export',
+        headers=auth_headers(token),
+        params={'format': 'csv'},
+    )
+
+    assert r.status_code == HTTPStatus.OK
+    rows = list(csv.DictReader(io.StringIO(r.text)))
+    assert len(rows) == urls_seeded['total']
+    assert {'id', 'url', 'host', 'ext', 'created_at'} <= set(rows[0])
+
+
+def test_export_urls_404_domain_not_owned(client, token):
+    r = client.get(
+        '/api/v1/domains/999/urls/export', headers=auth_headers(token)
+    )
+    assert r.status_code == HTTPStatus.NOT_FOUND
+
+
+def ingest_row(domain_id: int, raw: str, **extra) -> dict:
+    url = normalize_url(raw)
+    return {
+        'domain_id': domain_id,
+        'url': url,
+        'url_hash': url_hash(url),
+        **url_fields(url),
+        'tech_names': tech_names(extra.get('tech')),
+        **extra,
+    }
+
+
+@pytest.mark.asyncio
+async def test_facets_follow_ingested_batches(client, token, session, domain):
+    factory = async_sessionmaker(session.bind, expire_on_commit=False)
+    row = {
+        'host': 'a.teste.com',
+        'port': 443,
+        'status_code': 200,
+        'tech': ['Nginx:1.19.0'],
+    }
+    await _flush_urls(factory, [
+        ingest_row(domain.id, 'https://a.teste.com/x.php', **row),
+        ingest_row(domain.id, 'https://a.teste.com/y.php', **row),
+    ])
+    # Second batch repeats one URL, which must not be counted again.
+    await _flush_urls(factory, [
+        ingest_row(domain.id, 'https://a.teste.com/x.php', **row),
+        ingest_row(
+            domain.id,
+            'https://b.teste.com/',
+            host='b.teste.com',
+            port=80,
+            status_code=404,
+            tech=None,
+        ),
+    ])
+
+    r = client.get(
+        f'/api/v1/domains/{domain.id}/facets', headers=auth_headers(token)
+    )
+
+    assert r.status_code == HTTPStatus.OK
+    facets = r.json()['facets']
+    assert facets['host'] == [
+        {'value': 'a.teste.com', 'count': 2},
+        {'value': 'b.teste.com', 'count': 1},
+    ]
+    assert facets['tech'] == [{'value': 'nginx', 'count': 2}]
+    assert facets['ext'] == [{'value': 'php', 'count': 2}]
+    assert {f['value'] for f in facets['status_code']} == {'200', '404'}
+
+    r = client.get(
+        f'/api/v1/domains/{domain.id}/facets',
+        headers=auth_headers(token),
+        params={'facet': 'port', 'limit': 1},
+    )
+    assert r.json()['facets'] == {'port': [{'value': '443', 'count': 2}]}
+
+
+@pytest_asyncio.fixture
+async def tech_domain_id(session, domain):
+    stacks = {
+        'wp': ['WordPress:6.4.2', 'PHP', 'Nginx:1.19.0'],
+        'php': ['php:8.2'],
+        'none': None,
+    }
+    for name, tech in stacks.items():
+        row = DiscoveredURL(
+            domain_id=domain.id,
+            url=f'https://teste.com/{name}',
+            url_hash=f'hash_tech_{name}',
+            host='teste.com',
+            tech=tech,
+            tech_names=tech_names(tech),
+        )
+        session.add(row)
+    await session.commit()
+
+    return domain.id
+
+
+@pytest.mark.parametrize(
+    ('params', 'expected'),
+    [
+        ({'tech': 'WordPress'}, ['wp']),
+        ({'tech': 'WordPress,PHP'}, ['php', 'wp']),
+        ({'tech': 'WordPress,PHP', 'tech_match': 'all'}, ['wp']),
+        ({'tech': 'wordpress:5.0,nginx', 'tech_match': 'all'}, ['wp']),
+        ({'tech': 'PHP'}, ['php', 'wp']),
+        ({'tech': 'Drupal'}, []),
+    ],
+)
+def test_urls_tech_filter(client, token, tech_domain_id, params, expected):
+    r = client.get(
+        f'/api/v1/domains/{tech_domain_id}/urls',
+        headers=auth_headers(token),
+        params=params,
+    )
+
+    assert r.status_code == HTTPStatus.OK
+    names = sorted(i['url'].rsplit('/', 1)[-1] for i in r.json()['items'])
+    assert names == expected
+
+
+def test_export_urls_tech_filter(
+    client, token, tech_domain_id, export_sessions
+):
+    r = client.get(
+        f'/api/v1/domains/{tech_domain_id}/urls/export',
+        headers=auth_headers(token),
+        params={'tech': 'PHP,Nginx', 'tech_match': 'all'},
+    )
+
+    assert r.status_code == HTTPStatus.OK
+    rows = [json.loads(line) for line in r.content.splitlines()]
+    assert [row['url'] for row in rows] == ['https://teste.com/wp']
@@ -64,6 +64,7 @@ async def test_add_domains(client, token, session, user):
         args, kwargs = mock_enqueue.call_args
         assert isinstance(args[1], list)
         assert len(args[1]) == tasks
+        assert kwargs['force_refresh'] is False
 
     results = (
         await session.execute(
@@ -100,3 +101,29 @@ def test_delete_domain_with_error(client, token):
 
     assert response.status_code == HTTPStatus.NOT_FOUND
     assert response.json()['message'] == 'Domain not found'
+
+
+def test_domains_summary_follows_status_changes(client, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    with patch(
+        'auto_recon_api.api.v1.endpoints.domains.subdomains_queue.enqueue',
+        autospec=True,
+    ) as mock_enqueue:
+        mock_enqueue.return_value.id = 'job-summary'
+        client.post(
+            '/api/v1/domains/',
+            json={'domains': ['one.com', 'two.com']},
+            headers=headers,
+        )
+
+    summary = client.get('/api/v1/domains/summary', headers=headers).json()
+    assert summary == {'total': 2, 'by_status': {'queued': 2}}
+
+    listing = client.get('/api/v1/domains/', headers=headers).json()
+    assert listing['total'] == len(listing['items'])
+
+    client.delete(
+        f'/api/v1/domains/{listing["items"][0]["id"]}', headers=headers
+    )
+    summary = client.get('/api/v1/domains/summary', headers=headers).json()
+    assert summary == {'total': 1, 'by_status': {'queued': 1}}
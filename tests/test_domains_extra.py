@@ -1,17 +1,21 @@
 from __future__ import annotations
 
 from http import HTTPStatus
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from fastapi import HTTPException
+from rq.job import Job
 from sqlalchemy.exc import IntegrityError
 
+from auto_recon_api.api.v1.endpoints import domains as domains_mod
 from auto_recon_api.api.v1.endpoints.domains import (
     add_domains,
+    enqueue_subdomain_jobs,
     enqueue_subdomain_recon,
 )
 from auto_recon_api.schemas import EnterDomainSchema
+from auto_recon_api.workers.subdomains import subdomain_job_timeout
 
 
 @pytest.mark.asyncio
@@ -43,6 +47,85 @@ def test_enqueue_subdomain_recon_returns_job_id():
         assert out == 'sub-job-7'
 
 
+def test_add_domains_force_refresh_reaches_the_job(client, token):
+    with patch.object(
+        domains_mod, 'enqueue_subdomain_jobs', return_value='job-fresh'
+    ) as mock_enqueue:
+        response = client.post(
+            '/api/v1/domains/',
+            json={'domains': ['fresh.com']},
+            params={'force_refresh': True},
+            headers={'Authorization': f'Bearer {token}'},
+        )
+
+    assert response.status_code == HTTPStatus.CREATED
+    _, force_refresh = mock_enqueue.call_args.args
+    assert force_refresh is True
+
+
+class FakeQueue:
+    def __init__(self):
+        self.enqueued = []
+        self.prepared = []
+
+    def enqueue(self, func, *args, **kwargs):
+        self.enqueued.append((func, args, kwargs))
+        job = MagicMock(spec=Job)
+        job.id = kwargs.get('job_id') or 'single-job'
+        return job
+
+    def enqueue_many(self, job_datas):
+        self.prepared.extend(job_datas)
+        jobs = []
+        for i, _ in enumerate(job_datas):
+            job = MagicMock(spec=Job)
+            job.id = f'child-{i}'
+            jobs.append(job)
+        return jobs
+
+
+def fanout_settings(group_size):
+    class S:
+        SUBDOMAINS_FANOUT_GROUP_SIZE = group_size
+
+    return S
+
+
+def test_enqueue_subdomain_jobs_single_job_when_fanout_disabled(monkeypatch):
+    queue = FakeQueue()
+    monkeypatch.setattr(domains_mod, 'subdomains_queue', queue)
+    monkeypatch.setattr(domains_mod, 'get_settings', fanout_settings(0))
+
+    job_id = enqueue_subdomain_jobs([1, 2, 3])
+
+    assert job_id == 'single-job'
+    assert queue.prepared == []
+    assert queue.enqueued[0][1] == ([1, 2, 3],)
+    assert queue.enqueued[0][2]['force_refresh'] is False
+    assert queue.enqueued[0][2]['job_timeout'] == subdomain_job_timeout(3)
+
+
+def test_enqueue_subdomain_jobs_fans_out_groups(monkeypatch):
+    queue = FakeQueue()
+    monkeypatch.setattr(domains_mod, 'subdomains_queue', queue)
+    monkeypatch.setattr(domains_mod, 'get_settings', fanout_settings(2))
+
+    parent_id = enqueue_subdomain_jobs([1, 2, 3, 4, 5], force_refresh=True)
+
+    assert [d.args for d in queue.prepared] == [([1, 2],), ([3, 4],), ([5],)]
+    assert all(
+        d.kwargs == {'run_job_id': parent_id, 'force_refresh': True}
+        for d in queue.prepared
+    )
+
+    func, _, kwargs = queue.enqueued[0]
+    assert func is domains_mod.finalize_subdomain_fanout
+    assert kwargs['job_id'] == parent_id
+    assert kwargs['depends_on'].allow_failure is True
+    assert kwargs['meta']['child_job_ids'] == ['child-0', 'child-1', 'child-2']
+    assert kwargs['meta']['domain_ids'] == [1, 2, 3, 4, 5]
+
+
 @pytest.mark.asyncio
 async def test_add_domains_empty_input(session, user):
     domains = EnterDomainSchema(domains=[])
@@ -114,7 +197,8 @@ def test_get_domains_filters(client, token):
         assert r.status_code == HTTPStatus.CREATED
 
     response = client.get(
-        "/api/v1/domains/?q=%s&status=%s" % (name[:3], 'queued'),
+        "/api/v1/domains/?q=%s&status=%s&include_total=true"
+        % (name[:3], 'queued'),
         headers={"Authorization": f"Bearer {token}"},
     )
 
@@ -122,3 +206,61 @@ def test_get_domains_filters(client, token):
     data = response.json()
     assert data["total"] >= 1
     assert any(item["name"] == name for item in data["items"])
+
+
+def test_get_domains_rejects_short_query(client, token):
+    response = client.get(
+        '/api/v1/domains/',
+        params={'q': 'ex'},
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert 'at least 3' in response.json()['message']
+
+
+def test_create_snapshot_enqueues_job(client, token, domain):
+    with patch(
+        'auto_recon_api.api.v1.endpoints.domains.urls_queue.enqueue',
+        autospec=True,
+    ) as mock_enqueue:
+        mock_enqueue.return_value.id = 'snapshot-job-1'
+
+        response = client.post(
+            f'/api/v1/domains/{domain.id}/snapshots',
+            params={'format': 'arrow'},
+            headers={'Authorization': f'Bearer {token}'},
+        )
+
+    assert response.status_code == HTTPStatus.ACCEPTED
+    assert response.json()['data']['job_id'] == 'snapshot-job-1'
+    assert mock_enqueue.call_args.args[1:] == (domain.id, 'arrow')
+
+
+def test_download_snapshot_supports_range(
+    client, token, domain, monkeypatch, tmp_path
+):
+    monkeypatch.setattr(
+        domains_mod, 'snapshot_path', lambda *a: tmp_path / 'urls.parquet'
+    )
+    (tmp_path / 'urls.parquet').write_bytes(b'PAR1-data-PAR1')
+
+    response = client.get(
+        f'/api/v1/domains/{domain.id}/snapshots/urls',
+        headers={
+            'Authorization': f'Bearer {token}',
+            'Range': 'bytes=0-3',
+        },
+    )
+
+    assert response.status_code == HTTPStatus.PARTIAL_CONTENT
+    assert response.content == b'PAR1'
+
+
+def test_download_snapshot_missing(client, token, domain):
+    response = client.get(
+        f'/api/v1/domains/{domain.id}/snapshots/urls',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
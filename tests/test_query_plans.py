@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import select, text, tuple_
+from sqlalchemy.dialects import postgresql
+
+from auto_recon_api.api.v1.endpoints import domains as domains_mod
+from auto_recon_api.api.v1.endpoints import subdomains as subdomains_mod
+from auto_recon_api.core.search import search_clause
+from auto_recon_api.models import DiscoveredURL, Domain, DomainRun, Subdomain
+from auto_recon_api.schemas import FilterDomain, FilterPage, UrlListFilters
+
+# Enough rows, one in a hundred or fewer matching each filter, for the
+# planner to prefer the filter's own index over the domain_id btree.
+PLAN_ROWS = 50_000
+PLAN_DOMAINS = 100
+SEED_URLS = """
+INSERT INTO discovered_urls (
+    domain_id, url, url_hash, host, status_code, tech, tech_names, ext,
+    query_keys, created_at
+)
+SELECT
+    :domain_id,
+    'http://h' || i % 50 || '.teste.com/'
+        || CASE WHEN i % 500 = 0 THEN 'admin' ELSE 'p' || i END
+        || CASE WHEN i % 100 = 0 THEN '.php?redirect=1' ELSE '.html?q=1' END,
+    md5(i::text),
+    'h' || i % 50 || '.teste.com',
+    CASE WHEN i % 10 = 0 THEN 404 ELSE 200 END,
+    CASE
+        WHEN i % 200 = 0 THEN '["WordPress:6.4.2", "PHP"]'
+        ELSE '["Nginx:1.19.0"]'
+    END::jsonb,
+    CASE
+        WHEN i % 200 = 0 THEN ARRAY['php', 'wordpress']
+        ELSE ARRAY['nginx']
+    END,
+    CASE WHEN i % 100 = 0 THEN 'php' ELSE 'html' END,
+    CASE WHEN i % 100 = 0 THEN ARRAY['redirect'] ELSE ARRAY['q'] END,
+    timestamptz '2026-01-01' - i * interval '1 minute'
+FROM generate_series(1, :rows) AS i
+"""
+
+
+SEED_DOMAINS = """
+INSERT INTO domain (name, user_id, status, updated_at)
+SELECT
+    'd' || i || '.teste.com',
+    :user_id,
+    'done',
+    timestamp '2026-01-01' - i * interval '1 minute'
+FROM generate_series(1, :rows) AS i
+"""
+# The same number of hosts under every domain of the user.
+SEED_SUBDOMAINS = """
+INSERT INTO subdomain (host, ip, domain_id)
+SELECT 's' || i || '.' || d.name, '1.1.1.1', d.id
+FROM domain AS d, generate_series(1, :rows) AS i
+WHERE d.user_id = :user_id
+"""
+# Halfway through the seeded rows.
+CURSOR_TS = datetime(2026, 1, 1) - timedelta(minutes=PLAN_DOMAINS // 2)
+CURSOR_ID = PLAN_ROWS // 2
+
+
+async def seed(session, sql: str, table: str, **params) -> None:
+    await session.execute(text(sql), {'rows': PLAN_ROWS, **params})
+    await session.commit()
+    await session.execute(text(f'ANALYZE {table}'))
+
+
+async def seed_urls(session, domain_id: int) -> None:
+    await seed(session, SEED_URLS, 'discovered_urls', domain_id=domain_id)
+
+
+async def explain(session, query) -> str:
+    sql = query.compile(
+        dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True}
+    )
+    rows = await session.execute(text(f'EXPLAIN {sql}'))
+    return '\n'.join(row[0] for row in rows)
+
+
+@pytest.mark.asyncio
+async def test_domain_page_does_not_touch_domain_runs(session, user):
+    query = domains_mod._domain_page_query(
+        [Domain.user_id == user.id], FilterDomain()
+    )
+
+    plan = await explain(session, query)
+
+    assert 'domain_runs' not in plan
+    assert 'SubPlan' not in plan
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('cursor', [False, True])
+async def test_domain_page_is_index_scan(session, user, cursor):
+    await seed(
+        session, SEED_DOMAINS, 'domain', user_id=user.id, rows=PLAN_DOMAINS
+    )
+    where = [Domain.user_id == user.id]
+    if cursor:
+        where.append(
+            tuple_(Domain.updated_at, Domain.id) < (CURSOR_TS, CURSOR_ID)
+        )
+
+    plan = await explain(
+        session,
+        domains_mod._domain_page_query(
+            where, FilterDomain(cursor='c' if cursor else None)
+        ),
+    )
+
+    assert 'Index Scan Backward using ix_domain_user_updated_id' in plan
+    assert 'Sort' not in plan
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('cursor', [False, True])
+async def test_subdomain_page_is_index_scan(session, domain, cursor):
+    await seed(
+        session, SEED_DOMAINS, 'domain', user_id=domain.user_id, rows=99
+    )
+    await seed(
+        session,
+        SEED_SUBDOMAINS,
+        'subdomain',
+        user_id=domain.user_id,
+        rows=PLAN_ROWS // PLAN_DOMAINS,
+    )
+    where = [Subdomain.domain_id == domain.id]
+    if cursor:
+        where.append(Subdomain.id < CURSOR_ID)
+
+    plan = await explain(
+        session,
+        subdomains_mod._subdomain_page_query(
+            where, FilterPage(cursor='c' if cursor else None)
+        ),
+    )
+
+    assert 'Index Scan Backward using ix_subdomain_domain_id' in plan
+    assert 'Sort' not in plan
+
+
+@pytest.mark.asyncio
+async def test_latest_run_lookup_uses_composite_index(session, domain):
+    session.add_all([
+        DomainRun(domain_id=domain.id, job_id=f'job-{i}') for i in range(3)
+    ])
+    await session.commit()
+    await session.execute(text('SET enable_seqscan = off'))
+
+    plan = await explain(
+        session,
+        select(DomainRun.job_id)
+        .where(DomainRun.domain_id == domain.id)
+        .order_by(DomainRun.created_at.desc())
+        .limit(1),
+    )
+
+    assert 'ix_domain_runs_domain_created' in plan
+    assert 'Sort' not in plan
+
+
+def test_add_domains_records_latest_job_id(client, token, session):
+    with patch.object(
+        domains_mod, 'enqueue_subdomain_jobs', return_value='job-latest'
+    ):
+        client.post(
+            '/api/v1/domains/',
+            json={'domains': ['latest.com']},
+            headers={'Authorization': f'Bearer {token}'},
+        )
+
+    r = client.get(
+        '/api/v1/domains/', headers={'Authorization': f'Bearer {token}'}
+    )
+    assert r.json()['items'][0]['job_id'] == 'job-latest'
+
+
+@pytest.mark.asyncio
+async def test_url_search_uses_trigram_index(session, domain):
+    await seed_urls(session, domain.id)
+    await session.execute(text('SET enable_seqscan = off'))
+
+    plan = await explain(
+        session,
+        select(DiscoveredURL.id).where(
+            DiscoveredURL.domain_id == domain.id,
+            search_clause(DiscoveredURL.url, 'admin'),
+        ),
+    )
+
+    assert 'ix_discovered_urls_domain_search_trgm' in plan
+
+
+@pytest.mark.asyncio
+async def test_url_ext_and_param_filters_use_indexes(session, domain):
+    await seed_urls(session, domain.id)
+    await session.execute(text('SET enable_seqscan = off'))
+
+    ext_plan = await explain(
+        session,
+        select(DiscoveredURL.id).where(
+            DiscoveredURL.domain_id == domain.id,
+            DiscoveredURL.ext == 'php',
+        ),
+    )
+    param_plan = await explain(
+        session,
+        select(DiscoveredURL.id).where(
+            DiscoveredURL.domain_id == domain.id,
+            DiscoveredURL.query_keys.contains(['redirect']),
+        ),
+    )
+
+    assert 'ix_discovered_urls_domain_ext' in ext_plan
+    assert 'ix_discovered_urls_domain_query_keys' in param_plan
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ('params', 'index'),
+    [
+        ({}, 'ix_discovered_urls_domain_created_id'),
+        (
+            {'host': 'h1.teste.com'},
+            'ix_discovered_urls_domain_host_created_id',
+        ),
+        ({'status_code': 200}, 'ix_discovered_urls_domain_status_created_id'),
+    ],
+)
+async def test_url_cursor_page_is_index_range_scan(
+    session, domain, params, index
+):
+    await seed_urls(session, domain.id)
+    await session.execute(text('SET enable_seqscan = off'))
+    filters = UrlListFilters(**params)
+    where = domains_mod._url_filter_clauses(domain.id, filters)
+    where.append(
+        tuple_(DiscoveredURL.created_at, DiscoveredURL.id)
+        < (datetime(2026, 1, 1, tzinfo=timezone.utc), 100)
+    )
+
+    plan = await explain(session, domains_mod._url_page_query(where, filters))
+
+    assert f'Index Scan Backward using {index}' in plan
+    assert 'Sort' not in plan
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('match', ['any', 'all'])
+async def test_url_tech_filter_uses_gin_index(session, domain, match):
+    await seed_urls(session, domain.id)
+    await session.execute(text('SET enable_seqscan = off'))
+    filters = UrlListFilters(tech='WordPress,PHP', tech_match=match)
+
+    plan = await explain(
+        session,
+        select(DiscoveredURL.id).where(
+            *domains_mod._url_filter_clauses(domain.id, filters)
+        ),
+    )
+
+    assert 'ix_discovered_urls_domain_tech_names' in plan
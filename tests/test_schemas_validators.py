@@ -16,3 +16,12 @@ def test_url_list_filters_normalize_ext_and_host_and_q():
     assert f.ext == 'pdf'
     assert f.host == 'example.com'
     assert f.q == '/p1'
+
+
+def test_url_filters_tech_names_are_trimmed_and_deduped():
+    f = UrlListFilters(tech=' WordPress:6.4.2, PHP ,,wordpress')
+    assert f.tech == 'wordpress,php'
+    assert f.tech_names() == ['wordpress', 'php']
+    assert f.tech_match == 'any'
+
+    assert UrlListFilters(tech=' , ').tech_names() == []
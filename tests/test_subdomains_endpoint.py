@@ -1,11 +1,23 @@
 from __future__ import annotations
 
 import asyncio
+import csv
+import io
 from http import HTTPStatus
+from unittest.mock import patch
 
 import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
 
-from auto_recon_api.models import Domain, Subdomain
+from auto_recon_api.api.v1.endpoints import domains as domains_mod
+from auto_recon_api.models import Domain, DomainRun, Subdomain
+from auto_recon_api.workers import subdomains as sub_mod
+from auto_recon_api.workers.subdomains import (
+    _subdomain_rows,  # noqa: PLC2701
+    _upsert_subdomains,  # noqa: PLC2701
+)
+
+HOSTS_AFTER_RESCAN = 3
 
 
 def test_subdomains_404_if_domain_not_owned(client, token, session, user_2):
@@ -39,7 +51,7 @@ async def test_get_subdomains_returns_list(client, token, session, domain):
 
     _data = 2
     r = client.get(
-        f'/api/v1/domains/{domain.id}/subdomains',
+        f'/api/v1/domains/{domain.id}/subdomains?include_total=true',
         headers={'Authorization': f'Bearer {token}'}
     )
     assert r.status_code == HTTPStatus.OK
@@ -47,3 +59,346 @@ async def test_get_subdomains_returns_list(client, token, session, domain):
     assert data['total'] == _data
     assert any(d['host'] == 'a.example.com' for d in data['subdomains'])
     assert any(d['host'] == 'b.example.com' for d in data['subdomains'])
+
+
+@pytest.mark.asyncio
+async def test_subdomain_diff_between_runs(client, token, session, domain):
+    runs = [
+        DomainRun(domain_id=domain.id, job_id=f'job-{i}', status='done')
+        for i in range(2)
+    ]
+    session.add_all(runs)
+    await session.commit()
+    first, second = runs[0].id, runs[1].id
+
+    scans = [
+        (first, ['kept.teste.com', 'gone.teste.com']),
+        (second, ['kept.teste.com', 'new.teste.com']),
+    ]
+    for run_id, hosts in scans:
+        rows = _subdomain_rows(
+            domain.id, [{'host': h} for h in hosts], run_id
+        )
+        await _upsert_subdomains(session, rows)
+        await session.commit()
+
+    r = client.get(
+        f'/api/v1/domains/{domain.id}/subdomains/diff',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+    assert r.status_code == HTTPStatus.OK
+    data = r.json()
+    assert data['from_run_id'] == first
+    assert data['to_run_id'] == second
+    assert [d['host'] for d in data['added']] == ['new.teste.com']
+    assert [d['host'] for d in data['removed']] == ['gone.teste.com']
+
+    r = client.get(
+        f'/api/v1/domains/{domain.id}/subdomains',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+    kept = next(
+        d for d in r.json()['subdomains'] if d['host'] == 'kept.teste.com'
+    )
+    assert kept['first_run_id'] == first
+    assert kept['last_run_id'] == second
+
+
+async def _scan_runs(session, domain, scans, statuses=None):
+    statuses = statuses or ['done'] * len(scans)
+    runs = [
+        DomainRun(domain_id=domain.id, job_id=f'job-{i}', status=status)
+        for i, status in enumerate(statuses)
+    ]
+    session.add_all(runs)
+    await session.commit()
+
+    for run, hosts in zip(runs, scans):
+        rows = _subdomain_rows(domain.id, [{'host': h} for h in hosts], run.id)
+        await _upsert_subdomains(session, rows)
+        await session.commit()
+    return [run.id for run in runs]
+
+
+def _diff(client, token, domain, **params):
+    r = client.get(
+        f'/api/v1/domains/{domain.id}/subdomains/diff',
+        params=params,
+        headers={'Authorization': f'Bearer {token}'},
+    )
+    if r.status_code != HTTPStatus.OK:
+        return r.status_code, None
+    data = r.json()
+    return (
+        [d['host'] for d in data['added']],
+        [d['host'] for d in data['removed']],
+    )
+
+
+@pytest.mark.asyncio
+async def test_subdomain_diff_host_missing_from_a_run(
+    client, token, session, domain
+):
+    first, second, third = await _scan_runs(
+        session,
+        domain,
+        [
+            ['kept.teste.com', 'flaky.teste.com'],
+            ['kept.teste.com'],
+            ['kept.teste.com', 'flaky.teste.com'],
+        ],
+    )
+
+    assert _diff(client, token, domain, from_run=first, to_run=second) == (
+        [],
+        ['flaky.teste.com'],
+    )
+    # Present at both ends: the run in between does not matter.
+    assert _diff(client, token, domain, from_run=first, to_run=third) == (
+        [],
+        [],
+    )
+
+
+@pytest.mark.asyncio
+async def test_subdomain_diff_host_that_comes_back_is_added(
+    client, token, session, domain
+):
+    await _scan_runs(
+        session,
+        domain,
+        [
+            ['kept.teste.com', 'back.teste.com'],
+            ['kept.teste.com'],
+            ['kept.teste.com', 'back.teste.com'],
+        ],
+    )
+
+    assert _diff(client, token, domain) == (['back.teste.com'], [])
+
+
+@pytest.mark.asyncio
+async def test_subdomain_diff_skips_partial_and_failed_runs(
+    client, token, session, domain
+):
+    first, partial, failed, last = await _scan_runs(
+        session,
+        domain,
+        [
+            ['a.teste.com', 'b.teste.com'],
+            ['a.teste.com'],
+            [],
+            ['a.teste.com', 'b.teste.com', 'c.teste.com'],
+        ],
+        statuses=['done', 'done', 'failed', 'done'],
+    )
+    run = await session.get(DomainRun, partial)
+    run.error_message = 'partial: subfinder timed out'
+    await session.commit()
+
+    assert _diff(client, token, domain, to_run=last) == (['c.teste.com'], [])
+    assert _diff(client, token, domain, from_run=failed, to_run=last) == (
+        HTTPStatus.CONFLICT,
+        None,
+    )
+
+
+def test_subdomain_diff_needs_two_runs(client, token, domain):
+    r = client.get(
+        f'/api/v1/domains/{domain.id}/subdomains/diff',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+    assert r.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_get_subdomains_keyset_pages(client, token, session, domain):
+    hosts = [f'h{i}.teste.com' for i in range(5)]
+    session.add_all([
+        Subdomain(host=h, ip='1.1.1.1', domain_id=domain.id) for h in hosts
+    ])
+    await session.commit()
+
+    seen = []
+    cursor = None
+    pages = 0
+    while True:
+        url = f'/api/v1/domains/{domain.id}/subdomains?limit=2'
+        if cursor:
+            url += f'&cursor={cursor}'
+        r = client.get(url, headers={'Authorization': f'Bearer {token}'})
+        assert r.status_code == HTTPStatus.OK
+        data = r.json()
+        seen.extend(d['host'] for d in data['subdomains'])
+        pages += 1
+        cursor = data['next_cursor']
+        if not cursor:
+            break
+
+    assert sorted(seen) == hosts
+    assert pages == len(hosts) // 2 + 1
+
+
+def test_get_subdomains_rejects_bad_cursor(client, token, domain):
+    r = client.get(
+        f'/api/v1/domains/{domain.id}/subdomains?cursor=abc',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+    assert r.status_code == HTTPStatus.BAD_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_ingest_keeps_subdomain_count(client, token, session, domain):
+    scans = (
+        ['a.teste.com', 'b.teste.com'],
+        ['b.teste.com', 'c.teste.com'],
+    )
+    for hosts in scans:
+        rows = _subdomain_rows(domain.id, [{'host': h} for h in hosts], None)
+        await _upsert_subdomains(session, rows)
+        await session.commit()
+
+    r = client.get(
+        f'/api/v1/domains/{domain.id}/summary',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+    assert r.status_code == HTTPStatus.OK
+    assert r.json()['subdomain_count'] == HOSTS_AFTER_RESCAN
+
+    r = client.get(
+        f'/api/v1/domains/{domain.id}/subdomains',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+    assert r.json()['total'] == HOSTS_AFTER_RESCAN
+
+
+@pytest.mark.asyncio
+async def test_export_subdomains_csv(
+    client,
+    token,
+    session,
+    domain,
+    export_sessions,
+):
+    session.add_all([
+        Subdomain(host=f'h{i}.teste.com', ip='1.1.1.1', domain_id=domain.id)
+        for i in range(HOSTS_AFTER_RESCAN)
+    ])
+    await session.commit()
+
+    r = client.get(
+        f'/api/v1/domains/{domain.id}/subdomains/export',
+        headers={'Authorization': f'Bearer {token}'},
+        params={'format': 'csv'},
+    )
+
+    assert r.status_code == HTTPStatus.OK
+    assert r.headers['content-type'].startswith('text/csv')
+    rows = list(csv.DictReader(io.StringIO(r.text)))
+    assert sorted(row['host'] for row in rows) == [
+        f'h{i}.teste.com' for i in range(HOSTS_AFTER_RESCAN)
+    ]
+
+
+class ReconClient:
+    # Stands in for the httpx client of find_subdomains.
+    def __init__(self, hosts):
+        self.hosts = hosts
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *a):
+        return False
+
+    async def post(self, url, params=None):
+        hosts = self.hosts
+
+        class Response:
+            @staticmethod
+            def raise_for_status():
+                pass
+
+            @staticmethod
+            def json():
+                return {
+                    'subdomains': [{'host': h, 'ip': '1.1.1.1'} for h in hosts]
+                }
+
+        return Response()
+
+
+@pytest.mark.asyncio
+async def test_rescans_record_runs_the_diff_compares(
+    client, token, session, domain, monkeypatch
+):
+    monkeypatch.setattr(
+        sub_mod,
+        'get_sessionmaker',
+        lambda: async_sessionmaker(session.bind, expire_on_commit=False),
+    )
+    enqueued = []
+
+    class Queue:
+        @staticmethod
+        def enqueue(func, *args, **kwargs):
+            enqueued.append((args, kwargs))
+
+            class Job:
+                id = kwargs['job_id']
+
+            return Job()
+
+    monkeypatch.setattr(domains_mod, 'subdomains_queue', Queue)
+
+    scans = [['a.teste.com', 'b.teste.com'], ['a.teste.com', 'c.teste.com']]
+    job_ids = []
+    for hosts in scans:
+        r = client.post(
+            f'/api/v1/domains/{domain.id}/rescan',
+            headers={'Authorization': f'Bearer {token}'},
+        )
+        assert r.status_code == HTTPStatus.ACCEPTED
+        job_ids.append(r.json()['data']['job_id'])
+
+        # Run the queued job the way the worker would.
+        (domain_ids,), kwargs = enqueued[-1]
+        monkeypatch.setattr(
+            sub_mod.httpx, 'AsyncClient', lambda **k: ReconClient(hosts)
+        )
+        await sub_mod.find_subdomains(
+            domain_ids,
+            run_job_id=kwargs['run_job_id'],
+            force_refresh=kwargs['force_refresh'],
+        )
+
+    assert [kwargs['run_job_id'] for _, kwargs in enqueued] == job_ids
+    await session.refresh(domain)
+    assert domain.latest_job_id == job_ids[-1]
+    assert domain.status == 'done'
+    assert _diff(client, token, domain) == (['c.teste.com'], ['b.teste.com'])
+
+
+def test_rescan_force_refresh_reaches_the_job(client, token, domain):
+    with patch.object(
+        domains_mod, 'enqueue_subdomain_recon', return_value='job'
+    ) as mock_enqueue:
+        r = client.post(
+            f'/api/v1/domains/{domain.id}/rescan',
+            params={'force_refresh': True},
+            headers={'Authorization': f'Bearer {token}'},
+        )
+
+    assert r.status_code == HTTPStatus.ACCEPTED
+    assert mock_enqueue.call_args.args == (domain.id, True)
+    assert mock_enqueue.call_args.kwargs == {
+        'job_id': r.json()['data']['job_id']
+    }
+
+
+def test_rescan_404_if_domain_not_owned(client, token):
+    r = client.post(
+        '/api/v1/domains/999/rescan',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+    assert r.status_code == HTTPStatus.NOT_FOUND
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import asyncio
+import socket
+
+import pytest
+
+import auto_recon_api.tasks.urls as urls_mod
+from auto_recon_api.tasks.liveness import LivenessChecker
+from tests.test_tasks_urls import DummyClient, DummyCtx, DummyJob, DummySession
+
+TTL = 60
+HTTPS_PORT = 443
+HOSTS = 40
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *a):
+        return False
+
+    def set(self, key, value, ex=None):
+        self.redis.data[key] = value
+        self.redis.expires[key] = ex
+
+    async def execute(self):
+        pass
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+
+    async def mget(self, keys):
+        return [self.data.get(k) for k in keys]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def aclose(self):
+        pass
+
+
+def make_checker(redis=None, ports=(80,)):
+    return LivenessChecker(
+        redis, ports=ports, timeout=1.0, concurrency=5, ttl=TTL
+    )
+
+
+@pytest.mark.asyncio
+async def test_probe_detects_open_and_closed_ports():
+    server = await asyncio.start_server(lambda r, w: w.close(), '127.0.0.1', 0)
+    open_port = server.sockets[0].getsockname()[1]
+
+    async with server:
+        closed = await asyncio.start_server(
+            lambda r, w: w.close(), '127.0.0.1', 0
+        )
+        closed_port = closed.sockets[0].getsockname()[1]
+        closed.close()
+        await closed.wait_closed()
+
+        assert await make_checker(ports=[open_port]).probe('127.0.0.1')
+        assert not await make_checker(ports=[closed_port]).probe('127.0.0.1')
+
+
+@pytest.mark.asyncio
+async def test_probe_unresolvable_host_is_dead():
+    assert not await make_checker().probe('does-not-exist.invalid')
+
+
+@pytest.mark.asyncio
+async def test_probe_tries_every_resolved_address(monkeypatch):
+    checker = make_checker(ports=[80, 443])
+    loop = asyncio.get_running_loop()
+
+    async def getaddrinfo(host, port, **kwargs):
+        return [
+            (socket.AF_INET6, socket.SOCK_STREAM, 6, '', ('2001:db8::1', 0)),
+            (socket.AF_INET6, socket.SOCK_STREAM, 6, '', ('2001:db8::1', 0)),
+            (socket.AF_INET, socket.SOCK_STREAM, 6, '', ('192.0.2.1', 0)),
+        ]
+
+    tried = []
+
+    async def port_open(address, port):
+        tried.append((address, port))
+        return address == '192.0.2.1' and port == HTTPS_PORT
+
+    monkeypatch.setattr(loop, 'getaddrinfo', getaddrinfo)
+    monkeypatch.setattr(checker, '_port_open', port_open)
+
+    assert await checker.probe('dual.example.com')
+    assert tried == [
+        ('2001:db8::1', 80),
+        ('2001:db8::1', HTTPS_PORT),
+        ('192.0.2.1', 80),
+        ('192.0.2.1', HTTPS_PORT),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_split_probes_with_a_bounded_worker_pool(monkeypatch):
+    checker = make_checker()
+    hosts = [f'h{i}.example.com' for i in range(HOSTS)]
+    active = 0
+    peak = 0
+    started = []
+
+    async def probe(host):
+        nonlocal active, peak
+        started.append(host)
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0)
+        active -= 1
+        return host.startswith('h1')
+
+    monkeypatch.setattr(checker, 'probe', probe)
+
+    alive, dead = await checker.split(hosts)
+
+    assert peak == checker.concurrency
+    assert sorted(started) == sorted(hosts)
+    assert alive == [h for h in hosts if h.startswith('h1')]
+    assert dead == [h for h in hosts if not h.startswith('h1')]
+
+
+@pytest.mark.asyncio
+async def test_split_uses_cache_and_stores_probes(monkeypatch):
+    redis = FakeRedis()
+    redis.data['recon:liveness:cached.example.com'] = b'1'
+    checker = make_checker(redis)
+    probed = []
+
+    async def probe(host):
+        probed.append(host)
+        return False
+
+    monkeypatch.setattr(checker, 'probe', probe)
+
+    alive, dead = await checker.split([
+        'cached.example.com',
+        'new.example.com',
+        'new.example.com',
+    ])
+
+    assert alive == ['cached.example.com']
+    assert dead == ['new.example.com']
+    assert probed == ['new.example.com']
+    assert redis.data['recon:liveness:new.example.com'] == '0'
+    assert redis.expires['recon:liveness:new.example.com'] == TTL
+
+
+def test_scan_urls_skips_dead_hosts(monkeypatch):
+    rows = [
+        ('alive.example.com', '1.1.1.1'),
+        ('down.example.com', '2.2.2.2'),
+        ('nxdomain.example.com', '0.0.0.0'),
+    ]
+    sess = DummySession(scalar_return=rows)
+    monkeypatch.setattr(urls_mod, 'SessionLocal', lambda: DummyCtx(sess))
+
+    class Checker:
+        @staticmethod
+        async def split(hosts):
+            assert hosts == ['alive.example.com', 'down.example.com']
+            return ['alive.example.com'], ['down.example.com']
+
+        async def aclose(self):
+            pass
+
+    monkeypatch.setattr(urls_mod, 'open_liveness_checker', Checker)
+
+    client = DummyClient(lines=[])
+
+    class FakeX:
+        @staticmethod
+        def AsyncClient(*_a, **_k):
+            return client
+
+    monkeypatch.setattr(urls_mod, 'httpx', FakeX)
+
+    requested = []
+    original = urls_mod._iter_endpoint_records
+
+    def capture(client, base_url, hosts, force_refresh):
+        requested.extend(hosts)
+        return original(client, base_url, hosts, force_refresh)
+
+    monkeypatch.setattr(urls_mod, '_iter_endpoint_records', capture)
+
+    job = DummyJob()
+    monkeypatch.setattr(urls_mod, 'get_current_job', lambda: job)
+
+    urls_mod.scan_urls_for_domain(1, 2, check_liveness=True)
+
+    assert requested == ['alive.example.com']
+    assert job.meta['skipped_unresolved'] == 1
+    assert job.meta['skipped_unreachable'] == 1
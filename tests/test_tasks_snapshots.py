@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import auto_recon_api.tasks.snapshots as snap_mod
+from auto_recon_api.tasks.snapshots import snapshot_path
+
+CREATED = datetime(2026, 1, 2, tzinfo=timezone.utc)
+URL_ROWS = [
+    (
+        1,
+        'http://a.com/x.php?id=1',
+        'a.com',
+        'a.com',
+        80,
+        200,
+        't',
+        ['nginx'],
+        'http',
+        '/x.php',
+        'php',
+        ['id'],
+        CREATED,
+    ),
+    (
+        2,
+        'http://a.com/',
+        'a.com',
+        None,
+        None,
+        None,
+        None,
+        None,
+        'http',
+        '/',
+        None,
+        [],
+        CREATED,
+    ),
+]
+ROW_GROUPS = 2
+
+
+def fake_batches(partitions):
+    async def iter_batches(sessionmaker, query, batch_size):
+        for partition in partitions:
+            await asyncio.sleep(0)
+            yield partition
+
+    return iter_batches
+
+
+def test_snapshot_path(monkeypatch):
+    monkeypatch.setattr(snap_mod.settings, 'SNAPSHOT_DIR', '/data')
+
+    assert str(snapshot_path(7, 'urls', 'parquet')) == '/data/7/urls.parquet'
+
+
+@pytest.mark.asyncio
+async def test_write_parquet_snapshot_row_groups(monkeypatch, tmp_path):
+    monkeypatch.setattr(
+        snap_mod, 'iter_batches', fake_batches([URL_ROWS[:1], URL_ROWS[1:]])
+    )
+    query, schema, _, _ = snap_mod._tables()['urls']
+    path = tmp_path / 'urls.parquet'
+
+    rows = await snap_mod.write_snapshot(
+        None, query, schema, path, 'parquet', 1
+    )
+
+    assert rows == len(URL_ROWS)
+    parquet = pq.ParquetFile(path)
+    assert parquet.metadata.num_row_groups == ROW_GROUPS
+    table = parquet.read()
+    assert table.column('tech').to_pylist() == ['["nginx"]', None]
+    assert table.column('query_keys').to_pylist() == [['id'], []]
+    assert not list(tmp_path.glob('.*.tmp'))
+
+
+@pytest.mark.asyncio
+async def test_write_arrow_snapshot(monkeypatch, tmp_path):
+    monkeypatch.setattr(snap_mod, 'iter_batches', fake_batches([URL_ROWS]))
+    query, schema, _, _ = snap_mod._tables()['urls']
+    path = tmp_path / 'urls.arrow'
+
+    await snap_mod.write_snapshot(None, query, schema, path, 'arrow', 10)
+
+    with pa.memory_map(str(path)) as source:
+        table = pa.ipc.open_file(source).read_all()
+    assert table.column('id').to_pylist() == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_snapshots_use_separate_temp_files(
+    monkeypatch, tmp_path
+):
+    monkeypatch.setattr(
+        snap_mod, 'iter_batches', fake_batches([URL_ROWS[:1], URL_ROWS[1:]])
+    )
+    query, schema, _, _ = snap_mod._tables()['urls']
+    path = tmp_path / 'urls.parquet'
+
+    rows = await asyncio.gather(
+        snap_mod.write_snapshot(None, query, schema, path, 'parquet', 1),
+        snap_mod.write_snapshot(None, query, schema, path, 'parquet', 1),
+    )
+
+    assert rows == [len(URL_ROWS), len(URL_ROWS)]
+    assert pq.read_table(path).num_rows == len(URL_ROWS)
+    assert not list(tmp_path.glob('.*.tmp'))
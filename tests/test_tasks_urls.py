@@ -1,14 +1,18 @@
 from __future__ import annotations
 
 import json
+from contextlib import asynccontextmanager
 
 import pytest
 
 import auto_recon_api.tasks.urls as urls_mod
 from auto_recon_api.tasks.urls import (
     chunks,
+    facet_counts,
     normalize_url,
     scan_urls_for_domain,
+    tech_names,
+    url_fields,
     url_hash,
 )
 
@@ -110,7 +114,9 @@ class DummyClient:
     async def __aexit__(self, exc_type, exc, tb):
         return False
 
-    def stream(self, method, url, headers=None, json=None):
+    def stream(self, method, url, headers=None, params=None, json=None):
+        self.headers = headers
+        self.params = params
         return DummyCtx(DummyStream(self._lines))
 
 
@@ -128,6 +134,47 @@ def test_url_hash_is_stable():
     assert len(h1) == URL_HASH_LEN
 
 
+def test_url_fields_parses_path_ext_and_query_keys():
+    fields = url_fields('https://a.com/x/Y.PHP?Redirect=1&id=2&id=3&=x')
+
+    assert fields == {
+        'scheme': 'https',
+        'path': '/x/Y.PHP',
+        'ext': 'php',
+        'query_keys': ['id', 'redirect'],
+    }
+    assert url_fields('http://a.com/')['ext'] is None
+    assert url_fields('http://a.com/v1.2/app')['ext'] is None
+    assert url_fields('http://a.com/a.tar-gz')['query_keys'] == []
+
+
+def test_tech_names_are_lowercased_without_versions():
+    tech = ['WordPress:6.4.2', 'wordpress', 'Nginx:1.19.0', ' PHP ', None, '']
+
+    assert tech_names(tech) == ['nginx', 'php', 'wordpress']
+    assert tech_names(None) == []
+    assert tech_names({'not': 'a list'}) == []
+
+
+def test_facet_counts_per_domain_and_value():
+    counts = facet_counts([
+        (1, 'a.com', 443, 200, 'php', ['nginx', 'php']),
+        (1, 'a.com', 80, 200, None, None),
+        (2, 'b.com', None, None, None, []),
+    ])
+
+    assert counts == {
+        (1, 'host', 'a.com'): 2,
+        (1, 'status_code', '200'): 2,
+        (1, 'port', '443'): 1,
+        (1, 'port', '80'): 1,
+        (1, 'ext', 'php'): 1,
+        (1, 'tech', 'nginx'): 1,
+        (1, 'tech', 'php'): 1,
+        (2, 'host', 'b.com'): 1,
+    }
+
+
 def test_chunks():
     lst = list(range(7))
     parts = list(chunks(lst, 3))
@@ -224,9 +271,130 @@ def test_scan_urls_for_domain_exception_sets_failed(monkeypatch):
 
 @pytest.mark.asyncio
 async def test__flush_urls_returns_count(monkeypatch):
-    result = DummyResultFetchall([(1,), (2,)])
+    result = DummyResultFetchall([
+        (1, 'a.example.com', 443, 200, 'php', ['nginx']),
+        (2, 'b.example.com', None, None, None, None),
+    ])
     sess = DummySession(execute_return=result)
     monkeypatch.setattr(urls_mod, 'SessionLocal', lambda: DummyCtx(sess))
 
     out = await urls_mod._flush_urls(urls_mod.SessionLocal, [])
     assert out == TWO
+
+
+def test_scan_urls_for_domain_forwards_force_refresh(monkeypatch):
+    sess = DummySession(scalar_return=['a.example.com'])
+    monkeypatch.setattr(urls_mod, 'SessionLocal', lambda: DummyCtx(sess))
+
+    client = DummyClient(lines=[])
+
+    class FakeX:
+        @staticmethod
+        def AsyncClient(*_a, **_k):
+            return client
+
+    monkeypatch.setattr(urls_mod, 'httpx', FakeX)
+    monkeypatch.setattr(urls_mod, 'get_current_job', lambda: None)
+
+    scan_urls_for_domain(1, 2, force_refresh=True)
+
+    assert client.params == {'force_refresh': True}
+    assert client.headers['Accept-Encoding'] == (
+        urls_mod.settings.TOOLS_STREAM_ENCODING
+    )
+
+
+def test_scan_urls_for_domain_routes_by_domain_name(monkeypatch):
+    class NamedSession(DummySession):
+        async def scalar(self, *args, **kwargs):  # noqa: PLR6301
+            return 'example.com'
+
+    sess = NamedSession(scalar_return=['a.example.com'])
+    monkeypatch.setattr(urls_mod, 'SessionLocal', lambda: DummyCtx(sess))
+    monkeypatch.setattr(urls_mod, 'get_current_job', lambda: None)
+
+    client = DummyClient(lines=[])
+
+    class FakeX:
+        @staticmethod
+        def AsyncClient(*_a, **_k):
+            return client
+
+    monkeypatch.setattr(urls_mod, 'httpx', FakeX)
+
+    keys = []
+
+    class Router:
+        @staticmethod
+        @asynccontextmanager
+        async def use(key=None):
+            keys.append(key)
+            yield 'http://tool-1'
+
+    monkeypatch.setattr(urls_mod, 'get_tool_router', Router)
+
+    scan_urls_for_domain(1, 2)
+
+    assert keys == ['example.com']
+
+
+class CapturingSession(DummySession):
+    def __init__(self):
+        super().__init__(scalar_return=[])
+        self.statements = []
+
+    async def execute(self, stmt, *args, **kwargs):
+        self.statements.append(str(stmt))
+        return await super().execute(stmt, *args, **kwargs)
+
+
+@pytest.mark.parametrize(
+    ('include_wildcards', 'filtered'), [(False, True), (True, False)]
+)
+def test_scan_urls_for_domain_wildcard_filter(
+    monkeypatch, include_wildcards, filtered
+):
+    sess = CapturingSession()
+    monkeypatch.setattr(urls_mod, 'SessionLocal', lambda: DummyCtx(sess))
+    monkeypatch.setattr(urls_mod, 'get_current_job', lambda: None)
+
+    scan_urls_for_domain(1, 2, include_wildcards=include_wildcards)
+
+    assert ('is_wildcard' in sess.statements[0]) is filtered
+
+
+def test_scan_urls_for_domain_counts_partial_hosts(monkeypatch):
+    sess = DummySession(scalar_return=['a.example.com'])
+    monkeypatch.setattr(urls_mod, 'SessionLocal', lambda: DummyCtx(sess))
+
+    lines = [
+        json.dumps({
+            'url': 'https://a.example.com/p',
+            'host': 'a.example.com',
+        }),
+        json.dumps({'host': 'a.example.com', 'partial': True}),
+    ]
+
+    class FakeX:
+        @staticmethod
+        def AsyncClient(*_a, **_k):
+            return DummyClient(lines=lines)
+
+    monkeypatch.setattr(urls_mod, 'httpx', FakeX)
+
+    flushed = []
+
+    async def fake_flush(sessionmaker, rows):
+        flushed.extend(rows)
+        return len(rows)
+
+    monkeypatch.setattr(urls_mod, '_flush_urls', fake_flush)
+
+    job = DummyJob()
+    monkeypatch.setattr(urls_mod, 'get_current_job', lambda: job)
+
+    out = scan_urls_for_domain(1, 2)
+
+    assert out['seen'] == 1
+    assert [r['url'] for r in flushed] == ['https://a.example.com/p']
+    assert job.meta['partial_hosts'] == 1
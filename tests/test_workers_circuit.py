@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import pytest
+from redis.exceptions import RedisError
+
+from auto_recon_api.workers import circuit as circuit_mod
+from auto_recon_api.workers.circuit import CircuitBreaker, CircuitOpenError
+
+THRESHOLD = 3
+COOLDOWN = 30
+WINDOW = 60
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class BrokenRedis:
+    async def pttl(self, key):  # noqa: PLR6301
+        raise RedisError('down')
+
+    def pipeline(self, transaction=True):  # noqa: PLR6301
+        raise RedisError('down')
+
+    async def delete(self, *keys):  # noqa: PLR6301
+        raise RedisError('down')
+
+
+def make_breaker(clock, redis=None):
+    return CircuitBreaker(
+        redis,
+        threshold=THRESHOLD,
+        window=WINDOW,
+        cooldown=COOLDOWN,
+        clock=clock,
+    )
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    calls = []
+
+    async def sleep(delay):
+        calls.append(delay)
+
+    monkeypatch.setattr(circuit_mod.asyncio, 'sleep', sleep)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_breaker_opens_after_threshold_and_half_opens():
+    clock = Clock()
+    breaker = make_breaker(clock)
+
+    for _ in range(THRESHOLD - 1):
+        await breaker.record_failure()
+    assert await breaker.remaining() == 0
+
+    await breaker.record_failure()
+    assert await breaker.remaining() == COOLDOWN
+
+    # After the cooldown one more failure is enough to reopen.
+    clock.now = COOLDOWN + 1
+    assert await breaker.remaining() == 0
+    await breaker.record_failure()
+    assert await breaker.remaining() == COOLDOWN
+
+    await breaker.record_success()
+    assert await breaker.remaining() == 0
+
+
+@pytest.mark.asyncio
+async def test_breaker_failures_expire_after_window():
+    clock = Clock()
+    breaker = make_breaker(clock)
+
+    for _ in range(THRESHOLD - 1):
+        await breaker.record_failure()
+    clock.now = WINDOW + 1
+    await breaker.record_failure()
+
+    assert await breaker.remaining() == 0
+
+
+@pytest.mark.asyncio
+async def test_wait_closed_sleeps_through_cooldown(monkeypatch):
+    clock = Clock()
+    breaker = make_breaker(clock)
+    await breaker.wait_closed(max_wait=0)
+
+    for _ in range(THRESHOLD):
+        await breaker.record_failure()
+
+    sleeps = []
+
+    async def sleep(delay):
+        sleeps.append(delay)
+        clock.now += delay
+
+    monkeypatch.setattr(circuit_mod.asyncio, 'sleep', sleep)
+    await breaker.wait_closed(max_wait=COOLDOWN * 2)
+
+    assert sleeps == [COOLDOWN]
+
+
+@pytest.mark.asyncio
+async def test_wait_closed_gives_up_after_max_wait(sleeps):
+    breaker = make_breaker(Clock())
+    for _ in range(THRESHOLD):
+        await breaker.record_failure()
+
+    with pytest.raises(CircuitOpenError):
+        await breaker.wait_closed(max_wait=1)
+
+    assert sleeps == [1]
+
+
+@pytest.mark.asyncio
+async def test_breaker_falls_back_to_local_state_on_redis_errors():
+    breaker = make_breaker(Clock(), redis=BrokenRedis())
+
+    for _ in range(THRESHOLD):
+        await breaker.record_failure()
+    assert await breaker.remaining() == COOLDOWN
+
+    await breaker.record_success()
+    assert await breaker.remaining() == 0
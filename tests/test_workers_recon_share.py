@@ -0,0 +1,360 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+from redis.exceptions import RedisError
+
+from auto_recon_api.workers import recon_share as share_mod
+from auto_recon_api.workers import subdomains as sub_mod
+from auto_recon_api.workers.recon_share import (
+    ReconShare,
+    open_recon_share,
+    run_budget,
+)
+
+TTL = 60
+READ_TIMEOUT = 240.0
+RUN_BUDGET = 3 * (READ_TIMEOUT + 30.0) + 600.0
+
+
+class FakeLock:
+    def __init__(self, lock: asyncio.Lock):
+        self._lock = lock
+        self.renewals = 0
+
+    async def acquire(self):
+        await self._lock.acquire()
+        return True
+
+    async def reacquire(self):
+        self.renewals += 1
+
+    async def release(self):
+        self._lock.release()
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.locks = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+        self.expires[key] = ex
+
+    def lock(self, name, timeout=None, blocking_timeout=None):
+        self.last_lock = FakeLock(self.locks.setdefault(name, asyncio.Lock()))
+        return self.last_lock
+
+    async def aclose(self):
+        pass
+
+
+class BrokenRedis(FakeRedis):
+    async def get(self, key):  # noqa: PLR6301
+        raise RedisError('down')
+
+    def lock(self, name, timeout=None, blocking_timeout=None):  # noqa: PLR6301
+        class Lock:
+            @staticmethod
+            async def acquire():
+                raise RedisError('down')
+
+        return Lock()
+
+
+def make_share(redis):
+    return ReconShare(redis, ttl=TTL, lock_timeout=5, wait_timeout=5)
+
+
+@pytest.mark.asyncio
+async def test_get_or_run_returns_cached_without_calling_producer():
+    redis = FakeRedis()
+    payload = {'subdomains': [{'host': 'a.example.com', 'ip': '1.1.1.1'}]}
+    redis.data['recon:subdomains:example.com'] = json.dumps(payload)
+
+    async def producer():
+        raise AssertionError('should not run')
+
+    data, shared = await make_share(redis).get_or_run('Example.com', producer)
+
+    assert shared is True
+    assert data == payload
+
+
+@pytest.mark.asyncio
+async def test_get_or_run_stores_result_with_ttl():
+    redis = FakeRedis()
+    payload = {'subdomains': [{'host': 'a.example.com', 'ip': '1.1.1.1'}]}
+
+    async def producer():
+        return payload
+
+    data, shared = await make_share(redis).get_or_run('example.com', producer)
+
+    assert shared is False
+    assert data == payload
+    assert json.loads(redis.data['recon:subdomains:example.com']) == payload
+    assert redis.expires['recon:subdomains:example.com'] == TTL
+
+
+@pytest.mark.asyncio
+async def test_get_or_run_does_not_store_empty_result():
+    redis = FakeRedis()
+
+    async def producer():
+        return {'subdomains': []}
+
+    await make_share(redis).get_or_run('example.com', producer)
+
+    assert redis.data == {}
+
+
+@pytest.mark.asyncio
+async def test_get_or_run_does_not_store_partial_result():
+    redis = FakeRedis()
+
+    async def producer():
+        return {
+            'subdomains': [{'host': 'a.example.com', 'ip': '1.1.1.1'}],
+            'partial': True,
+        }
+
+    await make_share(redis).get_or_run('example.com', producer)
+
+    assert redis.data == {}
+
+
+@pytest.mark.asyncio
+async def test_get_or_run_is_single_flight():
+    redis = FakeRedis()
+    share = make_share(redis)
+    calls = []
+
+    async def producer():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {'subdomains': [{'host': 'a.example.com', 'ip': '1.1.1.1'}]}
+
+    results = await asyncio.gather(*[
+        share.get_or_run('example.com', producer) for _ in range(5)
+    ])
+
+    assert len(calls) == 1
+    assert sum(1 for _, shared in results if not shared) == 1
+
+
+@pytest.mark.asyncio
+async def test_get_or_run_force_skips_shared_result_and_replaces_it():
+    redis = FakeRedis()
+    stale = {'subdomains': [{'host': 'old.example.com', 'ip': '1.1.1.1'}]}
+    fresh = {'subdomains': [{'host': 'new.example.com', 'ip': '2.2.2.2'}]}
+    redis.data['recon:subdomains:example.com'] = json.dumps(stale)
+
+    async def producer():
+        return fresh
+
+    data, shared = await make_share(redis).get_or_run(
+        'example.com', producer, force=True
+    )
+
+    assert shared is False
+    assert data == fresh
+    assert json.loads(redis.data['recon:subdomains:example.com']) == fresh
+
+
+@pytest.mark.asyncio
+async def test_get_or_run_renews_lock_while_producer_runs():
+    redis = FakeRedis()
+    share = ReconShare(redis, ttl=TTL, lock_timeout=0.03, wait_timeout=5)
+
+    async def producer():
+        await asyncio.sleep(0.1)
+        return {'subdomains': [{'host': 'a.example.com', 'ip': '1.1.1.1'}]}
+
+    await share.get_or_run('example.com', producer)
+    renewals = redis.last_lock.renewals
+    await asyncio.sleep(0.05)
+
+    assert renewals > 1
+    assert redis.last_lock.renewals == renewals
+
+
+@pytest.mark.asyncio
+async def test_get_or_run_falls_back_when_redis_is_down():
+    async def producer():
+        return {'subdomains': [{'host': 'a.example.com', 'ip': '1.1.1.1'}]}
+
+    data, shared = await make_share(BrokenRedis()).get_or_run(
+        'example.com', producer
+    )
+
+    assert shared is False
+    assert data['subdomains'][0]['host'] == 'a.example.com'
+
+
+def test_run_budget_covers_retries_and_breaker_wait():
+    class S:
+        RECON_RETRY_ATTEMPTS = 3
+        RECON_RETRY_MAX_DELAY = 30.0
+        RECON_BREAKER_MAX_WAIT = 600.0
+
+    assert run_budget(S, READ_TIMEOUT) == RUN_BUDGET
+
+
+def test_job_timeout_outlasts_waiting_for_a_shared_run(monkeypatch):
+    class S:
+        RECON_RETRY_ATTEMPTS = 3
+        RECON_RETRY_MAX_DELAY = 30.0
+        RECON_BREAKER_MAX_WAIT = 600.0
+        RECON_SHARE_TTL = TTL
+        TOOLS_USE_JOBS = False
+
+    monkeypatch.setattr(sub_mod, 'get_settings', S)
+
+    # A waiter blocks for one run and may then run recon itself.
+    assert sub_mod.subdomain_job_timeout(1) == 2 * RUN_BUDGET
+    per_round = sub_mod.subdomain_job_timeout(sub_mod.RECON_CONCURRENCY)
+    assert per_round == 2 * RUN_BUDGET
+    assert (
+        sub_mod.subdomain_job_timeout(sub_mod.RECON_CONCURRENCY + 1)
+        == 2 * per_round
+    )
+
+    S.RECON_SHARE_TTL = 0
+    assert sub_mod.subdomain_job_timeout(1) == RUN_BUDGET
+
+
+def test_open_recon_share_waits_for_a_whole_run(monkeypatch):
+    monkeypatch.setenv('TESTING', '0')
+    monkeypatch.setattr(share_mod.Redis, 'from_url', lambda url: FakeRedis())
+
+    share = open_recon_share(READ_TIMEOUT)
+
+    assert share.wait_timeout == RUN_BUDGET
+    assert share.wait_timeout > share.lock_timeout
+
+
+def test_open_recon_share_disabled_when_testing(monkeypatch):
+    monkeypatch.setenv('TESTING', '1')
+    assert open_recon_share(READ_TIMEOUT) is None
+
+
+def test_open_recon_share_disabled_with_zero_ttl(monkeypatch):
+    monkeypatch.setenv('TESTING', '0')
+
+    class S:
+        RECON_SHARE_TTL = 0
+
+    monkeypatch.setattr(share_mod, 'get_settings', S)
+    assert open_recon_share(READ_TIMEOUT) is None
+
+
+class DomainObj:
+    id = 40
+    name = 'shared.com'
+    status = 'queued'
+
+
+class Sess:
+    def __init__(self, domain):
+        self.domain = domain
+        self.added = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *a):
+        return False
+
+    async def scalar(self, *a, **k):
+        return self.domain
+
+    def begin(self):  # noqa: PLR6301
+        class Tx:
+            async def __aenter__(self):
+                return None
+
+            async def __aexit__(self, *a):
+                return False
+
+        return Tx()
+
+
+def shared_domain(monkeypatch):
+    domain = DomainObj()
+    sess = Sess(domain)
+    monkeypatch.setattr(sub_mod, 'get_sessionmaker', lambda: (lambda: sess))
+
+    async def upsert(session, rows):
+        session.added.extend(rows)
+
+    monkeypatch.setattr(sub_mod, '_upsert_subdomains', upsert)
+
+    redis = FakeRedis()
+    redis.data['recon:subdomains:shared.com'] = json.dumps({
+        'subdomains': [{'host': 'a.shared.com', 'ip': '1.1.1.1'}]
+    })
+    return domain, sess, redis
+
+
+@pytest.mark.asyncio
+async def test_process_one_domain_uses_shared_result(monkeypatch):
+    domain, sess, redis = shared_domain(monkeypatch)
+
+    class Client:
+        async def post(self, *a, **k):  # noqa: PLR6301
+            raise AssertionError('recon_tool should not be called')
+
+    await sub_mod._process_one_domain(
+        domain_id=domain.id,
+        job_id=None,
+        client=Client(),
+        semaphore=asyncio.Semaphore(1),
+        share=make_share(redis),
+    )
+
+    assert domain.status == 'done'
+    assert [r['host'] for r in sess.added] == ['a.shared.com']
+
+
+@pytest.mark.asyncio
+async def test_process_one_domain_force_refresh_skips_shared_result(
+    monkeypatch,
+):
+    domain, sess, redis = shared_domain(monkeypatch)
+    requests = []
+
+    class Resp:
+        @staticmethod
+        def raise_for_status():
+            pass
+
+        @staticmethod
+        def json():
+            return {'subdomains': [{'host': 'b.shared.com', 'ip': '2.2.2.2'}]}
+
+    class Client:
+        async def post(self, url, params=None):  # noqa: PLR6301
+            requests.append(params)
+            return Resp()
+
+    await sub_mod._process_one_domain(
+        domain_id=domain.id,
+        job_id=None,
+        client=Client(),
+        semaphore=asyncio.Semaphore(1),
+        share=make_share(redis),
+        force_refresh=True,
+    )
+
+    assert requests == [{'domain': 'shared.com', 'force_refresh': True}]
+    assert [r['host'] for r in sess.added] == ['b.shared.com']
+    shared = json.loads(redis.data['recon:subdomains:shared.com'])
+    assert shared['subdomains'][0]['host'] == 'b.shared.com'
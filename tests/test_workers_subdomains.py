@@ -5,9 +5,13 @@ from unittest.mock import AsyncMock
 
 import httpx
 import pytest
+from sqlalchemy.dialects import postgresql
 
 from auto_recon_api.workers import subdomains as sub_mod
+from auto_recon_api.workers.circuit import CircuitBreaker
 from auto_recon_api.workers.subdomains import (
+    _call_with_retries,  # noqa: PLC2701
+    _classify_domain_error,  # noqa: PLC2701
     _init_job_meta,  # noqa: PLC2701
     _job_mark_done,  # noqa: PLC2701
     _job_mark_failed,  # noqa: PLC2701
@@ -15,8 +19,24 @@ from auto_recon_api.workers.subdomains import (
     _job_touch,  # noqa: PLC2701
     _normalize_domain_error,  # noqa: PLC2701
     _short_err,  # noqa: PLC2701
+    _subdomain_rows,  # noqa: PLC2701
+    _upsert_subdomains,  # noqa: PLC2701
 )
 
+BATCH = 2
+CONCURRENCY = 2
+MISSING = 3
+TOTAL = 7
+ATTEMPTS = 3
+
+
+class RowsResult:
+    def __init__(self, rows=()):
+        self._rows = list(rows)
+
+    def all(self):
+        return self._rows
+
 
 class DummyJob:
     def __init__(self):
@@ -156,8 +176,9 @@ async def test_process_one_domain_success(monkeypatch):
 
             return Tx()
 
-        def add(self, o):
-            self.added.append(o)
+        async def execute(self, stmt):
+            self.added.append(stmt)
+            return RowsResult()
 
     monkeypatch.setattr(sub_mod, 'get_sessionmaker', lambda: (lambda: Sess()))  # noqa: PLW0108
 
@@ -208,6 +229,11 @@ async def test_find_subdomains_marks_job_meta(monkeypatch):
 
     monkeypatch.setattr(sub_mod, '_process_one_domain', proc_wrapper)
 
+    async def batches(domain_ids):
+        yield [(did, f'd{did}.com') for did in domain_ids]
+
+    monkeypatch.setattr(sub_mod, '_iter_domain_batches', batches)
+
     job = DummyJob()
     job.id = 'job-1'
     monkeypatch.setattr(sub_mod, 'get_current_job', lambda: job)
@@ -230,3 +256,226 @@ def test_run_find_subdomains_uses_asyncio_run(monkeypatch):
 
     sub_mod.run_find_subdomains([1, 2])
     assert called.get('ok')
+
+
+@pytest.mark.asyncio
+async def test_find_subdomains_keeps_concurrency_bounded(monkeypatch):
+    active = 0
+    peak = 0
+    seen = []
+
+    async def proc(domain_id, domain_name, **kw):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0)
+        seen.append((domain_id, domain_name))
+        active -= 1
+        return []
+
+    async def batches(domain_ids):
+        for start in range(0, len(domain_ids), BATCH):
+            chunk = domain_ids[start : start + BATCH]
+            yield [
+                (did, None if did == MISSING else f'd{did}.com')
+                for did in chunk
+            ]
+
+    monkeypatch.setattr(sub_mod, '_process_one_domain', proc)
+    monkeypatch.setattr(sub_mod, '_iter_domain_batches', batches)
+
+    job = DummyJob()
+    job.id = 'job-1'
+    monkeypatch.setattr(sub_mod, 'get_current_job', lambda: job)
+
+    ids = list(range(1, TOTAL + 1))
+    await sub_mod.find_subdomains(ids, concurrency=CONCURRENCY)
+
+    assert peak <= CONCURRENCY
+    assert len(seen) == TOTAL - 1
+    assert MISSING not in {did for did, _ in seen}
+    assert job.meta['done'] == TOTAL
+
+
+@pytest.mark.asyncio
+async def test_iter_domain_batches_one_query_per_batch(monkeypatch):
+    queries = []
+
+    class Result:
+        def __init__(self, rows):
+            self._rows = rows
+
+        def all(self):
+            return self._rows
+
+    class Sess:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *a):
+            return False
+
+        async def execute(self, stmt):  # noqa: PLR6301
+            ids = stmt.whereclause.right.value
+            queries.append(ids)
+            return Result([(i, f'd{i}.com') for i in ids if i != MISSING])
+
+    monkeypatch.setattr(sub_mod, 'get_sessionmaker', lambda: Sess)
+
+    batches = [
+        b
+        async for b in sub_mod._iter_domain_batches(
+            [5, 3, 1, 2, 4, 3], batch_size=BATCH
+        )
+    ]
+
+    assert queries == [[1, 2], [3, 4], [5]]
+    assert batches[1] == [(3, None), (4, 'd4.com')]
+
+
+class StatusResp:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.text = ''
+
+
+def test_classify_domain_error_categories():
+    def status_error(code):
+        return httpx.HTTPStatusError(
+            'err', request=None, response=StatusResp(code)
+        )
+
+    assert _classify_domain_error(httpx.ReadTimeout('t')) == 'timeout'
+    assert _classify_domain_error(httpx.ConnectError('c')) == 'connect'
+    assert (
+        _classify_domain_error(httpx.RemoteProtocolError('p')) == 'network'
+    )
+    assert _classify_domain_error(status_error(503)) == 'server'
+    assert _classify_domain_error(status_error(429)) == 'server'
+    assert _classify_domain_error(status_error(404)) == 'client'
+    assert _classify_domain_error(ValueError('x')) == 'internal'
+
+
+def flaky(failures):
+    calls = []
+
+    async def call():
+        calls.append(1)
+        if len(calls) <= len(failures):
+            raise failures[len(calls) - 1]
+        return {'subdomains': []}
+
+    return call, calls
+
+
+@pytest.mark.asyncio
+async def test_call_with_retries_recovers_from_transient_errors():
+    call, calls = flaky([httpx.ConnectError('c'), httpx.ReadTimeout('t')])
+
+    result = await _call_with_retries(
+        call, attempts=ATTEMPTS, base_delay=0, max_delay=0
+    )
+
+    assert result == {'subdomains': []}
+    assert len(calls) == ATTEMPTS
+
+
+@pytest.mark.asyncio
+async def test_call_with_retries_gives_up_and_skips_permanent_errors():
+    call, calls = flaky([httpx.ConnectError('c')] * ATTEMPTS)
+    with pytest.raises(httpx.ConnectError):
+        await _call_with_retries(
+            call, attempts=ATTEMPTS, base_delay=0, max_delay=0
+        )
+    assert len(calls) == ATTEMPTS
+
+    not_found = httpx.HTTPStatusError(
+        'err', request=None, response=StatusResp(404)
+    )
+    call, calls = flaky([not_found])
+    with pytest.raises(httpx.HTTPStatusError):
+        await _call_with_retries(
+            call, attempts=ATTEMPTS, base_delay=0, max_delay=0
+        )
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_call_with_retries_feeds_circuit_breaker():
+    breaker = CircuitBreaker(None, threshold=2, window=60, cooldown=0)
+    breaker.record_failure = AsyncMock()
+    breaker.record_success = AsyncMock()
+    call, _ = flaky([httpx.ConnectError('c')])
+
+    await _call_with_retries(
+        call,
+        attempts=ATTEMPTS,
+        base_delay=0,
+        max_delay=0,
+        breaker=breaker,
+    )
+
+    breaker.record_failure.assert_awaited_once()
+    breaker.record_success.assert_awaited_once()
+
+
+def test_subdomain_rows_dedupes_hosts_and_tags_run():
+    rows = _subdomain_rows(
+        5,
+        [
+            {'host': 'a.example.com', 'ip': '1.1.1.1'},
+            {'host': 'a.example.com', 'ip': '2.2.2.2', 'wildcard': True},
+            {'host': 'b.example.com'},
+        ],
+        run_id=9,
+    )
+
+    assert [r['host'] for r in rows] == ['a.example.com', 'b.example.com']
+    assert rows[0]['ip'] == '2.2.2.2'
+    assert rows[0]['is_wildcard'] is True
+    assert rows[1]['ip'] == '0.0.0.0'
+    assert {r['first_run_id'] for r in rows} == {9}
+    assert {r['last_run_id'] for r in rows} == {9}
+
+
+@pytest.mark.asyncio
+async def test_upsert_subdomains_batches_and_counts_new_hosts(monkeypatch):
+    monkeypatch.setattr(sub_mod, 'UPSERT_BATCH_SIZE', BATCH)
+    statements = []
+
+    class Sess:
+        @staticmethod
+        async def execute(stmt):
+            statements.append(stmt)
+            # One host already known, every other one inserted.
+            return RowsResult([
+                (1, 1, 4, len(statements) > 1),
+                (len(statements) + 1, 1, 4, True),
+            ])
+
+    rows = _subdomain_rows(
+        1, [{'host': f'h{i}.example.com'} for i in range(MISSING)], 4
+    )
+    inserted = await _upsert_subdomains(Sess(), rows)
+
+    assert inserted == MISSING
+    sql = [str(s.compile(dialect=postgresql.dialect())) for s in statements]
+    # Per batch: the upsert, then the run membership of every host.
+    assert len(sql) == BATCH * 2 + 1
+    assert 'ON CONFLICT ON CONSTRAINT uq_host_per_domain DO UPDATE' in sql[0]
+    assert 'last_seen = now()' in sql[0]
+    assert 'first_run_id = ' not in sql[0]
+    assert (
+        'RETURNING subdomain.id, subdomain.domain_id, subdomain.last_run_id, '
+        '(xmax = 0)'
+    ) in sql[0]
+    assert 'INSERT INTO subdomain_runs' in sql[1]
+    assert 'ON CONFLICT DO NOTHING' in sql[1]
+    assert statements[1].compile().params == {
+        'run_id_m0': 4,
+        'subdomain_id_m0': 1,
+        'run_id_m1': 4,
+        'subdomain_id_m1': 2,
+    }
+    assert 'subdomain_count=(domain.subdomain_count +' in sql[-1]
+    assert statements[-1].compile().params['subdomain_count_1'] == MISSING
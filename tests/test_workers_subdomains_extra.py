@@ -6,8 +6,11 @@ import httpx
 import pytest
 
 from auto_recon_api.workers import subdomains as sub_mod
+from tests.test_workers_subdomains import RowsResult
 
 BEGIN_THRESHOLD = 2
+TWO = 2
+FOUR = 4
 
 
 @pytest.mark.asyncio
@@ -21,6 +24,7 @@ async def test_process_one_domain_http_status_error_marks_failed(monkeypatch):
 
     class RunObj:
         def __init__(self):
+            self.id = 7
             self.status = 'pending'
             self.started_at = None
             self.ended_at = None
@@ -110,6 +114,7 @@ async def test_process_one_domain_invalid_json_sets_failed(monkeypatch):
 
     class RunObj:
         def __init__(self):
+            self.id = 7
             self.status = 'pending'
             self.error_message = None
             self.ended_at = None
@@ -282,6 +287,7 @@ async def test_process_one_domain_success_with_job_updates_run(monkeypatch):
 
     class RunObj:
         def __init__(self):
+            self.id = 7
             self.status = 'pending'
             self.started_at = None
             self.ended_at = None
@@ -317,8 +323,8 @@ async def test_process_one_domain_success_with_job_updates_run(monkeypatch):
             return Tx()
 
         @staticmethod
-        def add(o):
-            return None
+        async def execute(stmt):
+            return RowsResult()
 
     monkeypatch.setattr(sub_mod, 'get_sessionmaker', lambda: (lambda: Sess()))  # noqa: PLW0108
 
@@ -434,3 +440,116 @@ async def test_invalid_json_triggers_http_exception(monkeypatch):
     assert captured.get('type') is not None
     # the exception forwarded to the normalizer should be an HTTPException
     assert captured.get('type').__name__ == 'HTTPException'
+
+
+@pytest.mark.asyncio
+async def test_process_one_domain_stores_wildcard_flag(monkeypatch):
+    class DomainObj:
+        id = 41
+        name = 'wild.com'
+        status = 'queued'
+
+    class Sess:
+        def __init__(self):
+            self.added = []
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *a):
+            return False
+
+        async def scalar(self, *a, **k):  # noqa: PLR6301
+            return DomainObj
+
+        def begin(self):  # noqa: PLR6301
+            class Tx:
+                async def __aenter__(self):
+                    return None
+
+                async def __aexit__(self, *a):
+                    return False
+
+            return Tx()
+
+    sess = Sess()
+    monkeypatch.setattr(sub_mod, 'get_sessionmaker', lambda: (lambda: sess))
+
+    async def upsert(session, rows):
+        session.added.extend(rows)
+
+    monkeypatch.setattr(sub_mod, '_upsert_subdomains', upsert)
+
+    class Resp:
+        @staticmethod
+        def raise_for_status():
+            return None
+
+        @staticmethod
+        def json():
+            return {
+                'subdomains': [
+                    {'host': 'www.wild.com', 'ip': '1.1.1.1'},
+                    {'host': 'x.wild.com', 'ip': '9.9.9.9', 'wildcard': True},
+                ]
+            }
+
+    class Client:
+        async def post(self, *a, **k):  # noqa: PLR6301
+            return Resp()
+
+    await sub_mod._process_one_domain(
+        domain_id=DomainObj.id,
+        job_id=None,
+        client=Client(),
+        semaphore=asyncio.Semaphore(1),
+    )
+
+    flags = {r['host']: r['is_wildcard'] for r in sess.added}
+    assert flags == {'www.wild.com': False, 'x.wild.com': True}
+
+
+class FakeChildJob:
+    def __init__(self, job_id, domain_ids, meta, status='finished'):
+        self.id = job_id
+        self.args = (domain_ids,)
+        self.meta = meta
+        self._status = status
+
+    def get_status(self, refresh=True):
+        return self._status
+
+
+def test_aggregate_child_meta_merges_children():
+    parent = {'domain_ids': [1, 2, 3, 4], 'total': 4, 'child_job_ids': []}
+    children = [
+        FakeChildJob(
+            'c1',
+            [1, 2],
+            {
+                'done': 1,
+                'failed': 1,
+                'done_domain_ids': [1],
+                'failed_domain_ids': [2],
+                'errors_by_domain': {'2': 'boom'},
+                'updated_at': '2024-01-01T00:00:00',
+            },
+        ),
+        FakeChildJob(
+            'c2',
+            [3, 4],
+            {'done': 1, 'done_domain_ids': [3]},
+            status='failed',
+        ),
+        None,
+    ]
+
+    merged = sub_mod.aggregate_child_meta(parent, children)
+
+    assert merged['total'] == FOUR
+    assert merged['done'] == TWO
+    assert merged['failed'] == TWO
+    assert merged['done_domain_ids'] == [1, 3]
+    assert merged['failed_domain_ids'] == [2, 4]
+    assert merged['errors_by_domain'] == {'2': 'boom', '4': 'job c2 failed'}
+    assert merged['updated_at'] == '2024-01-01T00:00:00'